@@ -0,0 +1 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
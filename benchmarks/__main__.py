@@ -0,0 +1,57 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+"""
+Measure the overhead of the decorators. Run from the root of the repository:
+
+    python -m benchmarks                 # Run everything and compare with the baseline
+    python -m benchmarks -k window       # Only benchmarks whose name contains "window"
+    python -m benchmarks --save          # Store the results as the new baseline
+
+Exits with status 1 if the overhead of any benchmark, i.e. the time a call takes on top of the undecorated call, regressed
+by more than the tolerance. Overheads are compared in iterations of a pure Python loop timed along with them, so that
+they carry over from one machine to another.
+"""
+import argparse
+import os
+import sys
+
+from . import bench_circuit_breaker, bench_fallback, bench_retryable, bench_stacked  # noqa: F401 (registers them)
+from .runner import BENCHMARKS, load_baseline, regressions, run, save_baseline
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Measure the overhead of the decorators.")
+    parser.add_argument("-k", dest="filter", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--save", action="store_true", help="Store the results as the baseline")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline file to compare with or save to")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Regression in overhead tolerated before failing, default 0.5 (50%%)")
+    parser.add_argument("--repeat", type=int, default=7, help="Number of timed repeats, the median is kept")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum number of seconds per repeat")
+    arguments = parser.parse_args()
+
+    results = []
+    print(f"{'benchmark':<48}{'ns/call':>12}{'bare ns/call':>14}{'overhead ns':>13}{'loops':>9}")
+    for name in sorted(BENCHMARKS):
+        if arguments.filter not in name:
+            continue
+        result = run(BENCHMARKS[name], repeat=arguments.repeat, min_time=arguments.min_time)
+        results.append(result)
+        print(f"{name:<48}{result.ns_per_call:>12.1f}{result.reference_ns_per_call:>14.1f}"
+              f"{result.overhead_ns:>13.1f}{result.overhead_loops:>9.2f}")
+
+    if arguments.save:
+        save_baseline(arguments.baseline, results)
+        print(f"Saved baseline to {arguments.baseline}")
+        return 0
+    if not os.path.exists(arguments.baseline):
+        return 0
+    regressed = regressions(results, load_baseline(arguments.baseline), arguments.tolerance)
+    for result, expected in regressed:
+        print(f"REGRESSION {result.name}: overhead of {result.overhead_loops:.2f} loops, baseline {expected:.2f}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+
+from src.resiliens.circuit_breaker import CircuitBreaker, CircuitBreakerException
+
+from .runner import benchmark
+
+
+def function():
+    return None
+
+
+def generator(length: int):
+    for i in range(0, length):
+        yield i
+
+
+@benchmark("circuit_breaker.closed")
+def closed():
+    return CircuitBreaker(name="bench_closed", metrics=False)(function), function
+
+
+@benchmark("circuit_breaker.closed_with_metrics")
+def closed_with_metrics():
+    return CircuitBreaker(name="bench_closed_with_metrics", metrics=True)(function), function
+
+
+@benchmark("circuit_breaker.open_fallback")
+def open_fallback():
+    circuit_breaker = CircuitBreaker(name="bench_open_fallback", fallback=function, metrics=False)
+    decorated = circuit_breaker(function)
+    circuit_breaker.force_open()
+    return decorated, function
+
+
+@benchmark("circuit_breaker.open_rejected")
+def open_rejected():
+    circuit_breaker = CircuitBreaker(name="bench_open_rejected", metrics=False)
+    decorated = circuit_breaker(function)
+    circuit_breaker.force_open()
+
+    def rejected():
+        try:
+            decorated()
+        except CircuitBreakerException:
+            pass
+
+    return rejected, function
+
+
+@benchmark("circuit_breaker.open_rejected_reused_exception")
+def open_rejected_reused_exception():
+    circuit_breaker = CircuitBreaker(name="bench_open_rejected_reused", reuse_rejection_exception=True, metrics=False)
+    decorated = circuit_breaker(function)
+    circuit_breaker.force_open()
+
+    def rejected():
+        try:
+            decorated()
+        except CircuitBreakerException:
+            pass
+
+    return rejected, function
+
+
+@benchmark("circuit_breaker.open_rejected_value")
+def open_rejected_value():
+    circuit_breaker = CircuitBreaker(name="bench_open_rejected_value", rejected_value=None, metrics=False)
+    decorated = circuit_breaker(function)
+    circuit_breaker.force_open()
+    return decorated, function
+
+
+@benchmark("circuit_breaker.half_open")
+def half_open():
+    # Enough trial calls that it never closes again while the benchmark runs
+    circuit_breaker = CircuitBreaker(name="bench_half_open",
+                                     reset_timeout=0,
+                                     permitted_calls_in_half_open=10**12,
+                                     metrics=False)
+    decorated = circuit_breaker(function)
+    circuit_breaker.force_open()
+    return decorated, function
+
+
+def _sliding_window(size: int):
+    return CircuitBreaker(name=f"bench_window_{size}", sliding_window_size=size, metrics=False)(function), function
+
+
+for _size in (10, 100, 10_000):
+    benchmark(f"circuit_breaker.sliding_window_{_size}")(lambda size=_size: _sliding_window(size))
+
+
+@benchmark("circuit_breaker.sliding_window_60s")
+def time_sliding_window():
+    return CircuitBreaker(name="bench_window_60s", sliding_window_seconds=60, metrics=False)(function), function
+
+
+@benchmark("circuit_breaker.slow_call_detection")
+def slow_call_detection():
+    return CircuitBreaker(name="bench_slow_calls",
+                          sliding_window_size=100,
+                          slow_call_duration_threshold=1000,
+                          metrics=False)(function), function
+
+
+def _generator(length: int):
+    decorated = CircuitBreaker(name=f"bench_generator_{length}", metrics=False)(generator)
+    return lambda: sum(decorated(length)), lambda: sum(generator(length))
+
+
+for _length in (10, 1000):
+    benchmark(f"circuit_breaker.generator_{_length}")(lambda length=_length: _generator(length))
+
+
+@benchmark("circuit_breaker.coroutine_closed", operations=1000)
+def coroutine_closed():
+
+    async def coroutine():
+        return None
+
+    decorated = CircuitBreaker(name="bench_coroutine", metrics=False)(coroutine)
+    loop = asyncio.new_event_loop()
+
+    async def run(call):
+        for _ in range(0, 1000):
+            await call()
+
+    return lambda: loop.run_until_complete(run(decorated)), lambda: loop.run_until_complete(run(coroutine))
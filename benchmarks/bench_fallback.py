@@ -0,0 +1,29 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from src.resiliens.fallback import WithFallback
+
+from .runner import benchmark
+
+
+def function():
+    return None
+
+
+def failing():
+    raise ConnectionError()
+
+
+@benchmark("fallback.success")
+def success():
+    return WithFallback(fallback=function)(function), function
+
+
+@benchmark("fallback.fallback")
+def fallback():
+
+    def reference():
+        try:
+            failing()
+        except ConnectionError:
+            return function()
+
+    return WithFallback(fallback=function)(failing), reference
@@ -0,0 +1,41 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from src.resiliens.retryable import Retryable, RetryBudget
+
+from .runner import benchmark
+
+
+def function():
+    return None
+
+
+@benchmark("retryable.success")
+def success():
+    return Retryable(metrics=False)(function), function
+
+
+@benchmark("retryable.success_with_metrics")
+def success_with_metrics():
+    return Retryable(name="bench_retryable")(function), function
+
+
+@benchmark("retryable.success_with_budget")
+def success_with_budget():
+    return Retryable(budget=RetryBudget(), metrics=False)(function), function
+
+
+@benchmark("retryable.retry_once")
+def retry_once():
+    failures = [0]
+
+    def fails_every_other_call():
+        failures[0] += 1
+        if failures[0] % 2:
+            raise ConnectionError()
+
+    def reference():
+        try:
+            fails_every_other_call()
+        except ConnectionError:
+            fails_every_other_call()
+
+    return Retryable(backoff=0, metrics=False)(fails_every_other_call), reference
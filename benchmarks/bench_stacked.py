@@ -0,0 +1,62 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from concurrent.futures import ThreadPoolExecutor
+
+from src.resiliens.bulkhead import Bulkhead
+from src.resiliens.circuit_breaker import CircuitBreaker
+from src.resiliens.fallback import WithFallback
+from src.resiliens.retryable import Retryable
+
+from .runner import benchmark
+
+THREADS = 8
+CALLS_PER_THREAD = 1000
+
+
+def function():
+    return None
+
+
+@benchmark("stacked.fallback_retryable_circuit_breaker")
+def fallback_retryable_circuit_breaker():
+    decorated = WithFallback(fallback=function)(
+        Retryable(metrics=False)(CircuitBreaker(name="bench_stacked", metrics=False)(function)))
+    return decorated, function
+
+
+@benchmark("stacked.bulkhead_circuit_breaker")
+def bulkhead_circuit_breaker():
+    circuit_breaker = CircuitBreaker(name="bench_stacked_bulkhead", metrics=False)
+    decorated = Bulkhead(max_concurrent_calls=10)(circuit_breaker(function))
+    return decorated, function
+
+
+def _threaded(call):
+    executor = ThreadPoolExecutor(max_workers=THREADS)
+
+    def work():
+        for _ in range(0, CALLS_PER_THREAD):
+            call()
+
+    def run():
+        for future in [executor.submit(work) for _ in range(0, THREADS)]:
+            future.result()
+
+    return run
+
+
+@benchmark("threads.circuit_breaker_closed", operations=THREADS * CALLS_PER_THREAD)
+def threads_circuit_breaker_closed():
+    decorated = CircuitBreaker(name="bench_threads", metrics=False)(function)
+    return _threaded(decorated), _threaded(function)
+
+
+@benchmark("threads.circuit_breaker_sliding_window", operations=THREADS * CALLS_PER_THREAD)
+def threads_circuit_breaker_sliding_window():
+    decorated = CircuitBreaker(name="bench_threads_window", sliding_window_size=100, metrics=False)(function)
+    return _threaded(decorated), _threaded(function)
+
+
+@benchmark("threads.circuit_breaker_with_metrics", operations=THREADS * CALLS_PER_THREAD)
+def threads_circuit_breaker_with_metrics():
+    decorated = CircuitBreaker(name="bench_threads_metrics")(function)
+    return _threaded(decorated), _threaded(function)
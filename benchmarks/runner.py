@@ -0,0 +1,137 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import json
+import os
+import timeit
+from statistics import median
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class Benchmark(NamedTuple):
+    name: str
+    # Returns the decorated callable to time and the undecorated callable
+    # doing the same work, both taking no arguments.
+    setup: Callable[[], Tuple[Callable[[], object], Callable[[], object]]]
+    # Number of calls through the decorator made by one run of the callable
+    operations: int
+
+
+class Result(NamedTuple):
+    name: str
+    ns_per_call: float
+    reference_ns_per_call: float
+    # Median over the repeats of the time a call takes on top of the same
+    # call undecorated, each repeat timing both back to back.
+    overhead_ns: float
+    # The same overhead in iterations of a pure Python loop timed along with
+    # it, see _calibration_loop().
+    overhead_loops: float
+
+    @property
+    def overhead_ratio(self) -> float:
+        """
+        Time of a decorated call relative to the same call undecorated. Only informative, as the undecorated call
+        takes so little time that the ratio is mostly noise.
+        """
+        return self.ns_per_call / self.reference_ns_per_call
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, operations: int = 1):
+    """
+    Register a benchmark. The decorated function sets it up and returns the decorated and the undecorated callable.
+    """
+
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, operations)
+        return setup
+
+    return register
+
+
+def _number(timer: timeit.Timer, min_time: float) -> int:
+    """
+    Number of runs that takes at least the minimum time, to drown out the timer.
+    """
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(int(number * min_time / elapsed), 1)
+    return number
+
+
+# Number of iterations of the calibration loop
+_CALIBRATION_LOOPS = 1000
+
+
+def _calibration_loop() -> None:
+    total = 0
+    for i in range(0, _CALIBRATION_LOOPS):
+        total += i
+
+
+def run(benchmark_: Benchmark, repeat: int = 7, min_time: float = 0.2) -> Result:
+    """
+    Time the benchmark. Every repeat times the decorated callable, the undecorated one with the same number of runs
+    and a pure Python loop right after each other, so that whatever slows the machine down during a repeat slows down
+    all three. Expressed in iterations of the loop, the overhead carries over from one machine or interpreter to
+    another, which is what baselines are compared by.
+    """
+    function, reference = benchmark_.setup()
+    function()  # Warm up, e.g. to create lazily initialized state
+    reference()
+    timer = timeit.Timer(function)
+    reference_timer = timeit.Timer(reference)
+    calibration_timer = timeit.Timer(_calibration_loop)
+    number = _number(timer, min_time)
+    calibration_number = _number(calibration_timer, min_time / 4)
+    seconds = []
+    reference_seconds = []
+    loop_seconds = []
+    for _ in range(0, repeat):
+        seconds.append(timer.timeit(number) / number)
+        reference_seconds.append(reference_timer.timeit(number) / number)
+        loop_seconds.append(calibration_timer.timeit(calibration_number) / calibration_number / _CALIBRATION_LOOPS)
+    overheads = [decorated - bare for decorated, bare in zip(seconds, reference_seconds)]
+    scale = 1e9 / benchmark_.operations
+    return Result(name=benchmark_.name,
+                  ns_per_call=median(seconds) * scale,
+                  reference_ns_per_call=median(reference_seconds) * scale,
+                  overhead_ns=median(overheads) * scale,
+                  overhead_loops=median(overhead / loop for overhead, loop in zip(overheads, loop_seconds))
+                  / benchmark_.operations)
+
+
+def load_baseline(path: str) -> Dict[str, dict]:
+    with open(path) as file:
+        return json.load(file)["benchmarks"]
+
+
+def save_baseline(path: str, results: List[Result]) -> None:
+    """
+    Store the results in the baseline, keeping the baseline of benchmarks that weren't run.
+    """
+    benchmarks = load_baseline(path) if os.path.exists(path) else {}
+    for result in results:
+        benchmarks[result.name] = {
+            "ns_per_call": round(result.ns_per_call, 1),
+            "overhead_ns": round(result.overhead_ns, 1),
+            "overhead_loops": round(result.overhead_loops, 2)
+        }
+    baseline = {"benchmarks": benchmarks}
+    with open(path, "w") as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def regressions(results: List[Result], baseline: Dict[str, dict], tolerance: float) -> List[Tuple[Result, float]]:
+    """
+    Results whose overhead in loop iterations exceeds the baseline by more than the tolerance (e.g. 0.25 for 25%), with
+    the overhead of the baseline.
+    """
+    regressed = []
+    for result in results:
+        expected: Optional[dict] = baseline.get(result.name)
+        if expected is not None and result.overhead_loops > expected["overhead_loops"] * (1 + tolerance):
+            regressed.append((result, expected["overhead_loops"]))
+    return regressed
@@ -1,4 +1,11 @@
 #  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
 from .fallback import WithFallback
-from .circuit_breaker import CircuitBreaker
-from .retryable import Retryable
+from .circuit_breaker import CircuitBreaker, KeyedCircuitBreaker
+from .retryable import Retryable, RetryBudget
+from .bulkhead import Bulkhead
+from .ratelimiter import RateLimiter
+from .concurrencylimiter import ConcurrencyLimiter
+from .timelimiter import TimeLimiter
+from .hedge import Hedge
+from .singleflight import SingleFlight
+from .metrics import export_prometheus
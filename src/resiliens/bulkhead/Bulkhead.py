@@ -0,0 +1,270 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+from collections import deque
+from functools import wraps
+from inspect import isgeneratorfunction, iscoroutinefunction, isasyncgenfunction
+from threading import Condition, Lock
+from time import monotonic
+from typing import Callable, Union, Optional, Any
+
+from .BulkheadFullException import BulkheadFullException
+from ..utils.Awaitables import await_if_needed, iterate_async
+
+
+class BulkheadClass:
+    """
+    Limits the number of concurrent calls to the decorated function. Regular functions, generators, coroutines and
+    async generators all draw from the same permits, so a bulkhead decorating both regular and async functions never
+    lets through more than "max_concurrent_calls" calls in total, whichever threads and event loops they come from.
+
+    Threads waiting for a permit wait on a condition. Coroutines waiting for a permit await a future that the call
+    releasing a permit resolves in the coroutine's event loop, so waiting never blocks the loop.
+    """
+    _max_concurrent_calls: int
+    _max_wait: Optional[float]
+    _fallback_function: Callable
+    _fallback_function_with_exception: Callable
+    _in_flight: int
+    _queued: int
+
+    def __init__(self,
+                 max_concurrent_calls: int = 10,
+                 max_wait: Union[float, int] = 0,
+                 name: str = None,
+                 fallback_function: Callable = None,
+                 fallback_function_with_exception: Callable = None):
+        """
+        :param max_concurrent_calls: Max number of calls that may run at the same time.
+        :param max_wait: Number of milliseconds a call may wait for a free slot before it is rejected. Default is 0,
+        i.e. reject right away. If None, calls wait for as long as it takes.
+        :param name: Name of the bulkhead instance, defaults to the name of the decorated function.
+        :param fallback_function: A function to use as fallback if a call is rejected.
+        :param fallback_function_with_exception: A function to use as fallback if a call is rejected. The first
+        argument supplied to it will be the BulkheadFullException (i.e. fallback_exception(exception, *args, **kwargs))
+        """
+        if max_concurrent_calls < 1:
+            raise ValueError("Bulkhead must allow at least 1 concurrent call")
+        self._max_concurrent_calls = max_concurrent_calls
+        self._max_wait = max_wait / 1000 if max_wait is not None else None  # From milliseconds to seconds
+        self._name = name
+        self._fallback_function = fallback_function
+        self._fallback_function_with_exception = fallback_function_with_exception
+        # Every counter below is only read and updated while holding the lock
+        self._lock = Lock()
+        self._released = Condition(self._lock)
+        self._async_waiters = deque()
+        self._in_flight = 0
+        self._queued = 0
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def max_concurrent_calls(self) -> int:
+        return self._max_concurrent_calls
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of calls currently running.
+        """
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        """
+        Number of calls currently waiting for a free slot.
+        """
+        return self._queued
+
+    def __call__(self, decorated_function):
+        return self.decorate(decorated_function)
+
+    def decorate(self, function_to_decorate: Callable) -> Callable:
+        if self._name is None:
+            self._name = function_to_decorate.__name__
+
+        if iscoroutinefunction(function_to_decorate):
+            return self._decorate_coroutine(function_to_decorate)
+        if isasyncgenfunction(function_to_decorate):
+            return self._decorate_async_generator(function_to_decorate)
+        if isgeneratorfunction(function_to_decorate):
+            return self._decorate_generator(function_to_decorate)
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            if not self._acquire():
+                return self._handle_rejected_call(*args, **kwargs)
+            try:
+                return function_to_decorate(*args, **kwargs)
+            finally:
+                self._release()
+
+        return wrapper
+
+    def _decorate_generator(self, function_to_decorate: Callable) -> Callable:
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            if not self._acquire():
+                for el in self._handle_rejected_call(*args, **kwargs):
+                    yield el
+                return
+            try:
+                for el in function_to_decorate(*args, **kwargs):
+                    yield el
+            finally:
+                self._release()
+
+        return wrapper
+
+    def _decorate_coroutine(self, function_to_decorate: Callable) -> Callable:
+
+        @wraps(function_to_decorate)
+        async def wrapper(*args, **kwargs):
+            if not await self._acquire_async():
+                return await await_if_needed(
+                    self._handle_rejected_call(*args, **kwargs))
+            try:
+                return await function_to_decorate(*args, **kwargs)
+            finally:
+                self._release()
+
+        return wrapper
+
+    def _decorate_async_generator(self,
+                                  function_to_decorate: Callable) -> Callable:
+
+        @wraps(function_to_decorate)
+        async def wrapper(*args, **kwargs):
+            if not await self._acquire_async():
+                results = self._handle_rejected_call(*args, **kwargs)
+                async for el in iterate_async(results):
+                    yield el
+                return
+            try:
+                async for el in function_to_decorate(*args, **kwargs):
+                    yield el
+            finally:
+                self._release()
+
+        return wrapper
+
+    def _try_acquire(self) -> bool:
+        # Called while holding the lock
+        if self._in_flight < self._max_concurrent_calls:
+            self._in_flight += 1
+            return True
+        return False
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self._try_acquire():
+                return True
+            if self._max_wait == 0:
+                return False
+            self._queued += 1
+            try:
+                return self._released.wait_for(self._try_acquire, timeout=self._max_wait)
+            finally:
+                self._queued -= 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._notify()
+
+    def _notify(self) -> None:
+        """
+        Wake a waiting thread and a waiting coroutine, if any, to compete for a permit that was just released. Called
+        while holding the lock.
+        """
+        self._released.notify()
+        while self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+                return
+            except RuntimeError:
+                # The loop has been closed, so nothing awaits the future anymore
+                continue
+
+    async def _acquire_async(self) -> bool:
+        with self._lock:
+            if self._try_acquire():
+                return True
+            if self._max_wait == 0:
+                return False
+            self._queued += 1
+        loop = asyncio.get_running_loop()
+        deadline = monotonic() + self._max_wait if self._max_wait is not None else None
+        try:
+            while True:
+                future = loop.create_future()
+                waiter = (loop, future)
+                with self._lock:
+                    if self._try_acquire():
+                        return True
+                    self._async_waiters.append(waiter)
+                timeout = deadline - monotonic() if deadline is not None else None
+                try:
+                    await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    self._stop_waiting(waiter)
+                    return False
+                except BaseException:
+                    self._stop_waiting(waiter)
+                    raise
+        finally:
+            with self._lock:
+                self._queued -= 1
+
+    def _stop_waiting(self, waiter: tuple) -> None:
+        with self._lock:
+            try:
+                self._async_waiters.remove(waiter)
+            except ValueError:
+                # Woken meanwhile, so the permit goes to another waiter instead
+                self._notify()
+
+    def _handle_rejected_call(self, *args, **kwargs) -> Any:
+        if self._fallback_function:
+            return self._fallback_function(*args, **kwargs)
+        exception = BulkheadFullException(self)
+        if self._fallback_function_with_exception:
+            return self._fallback_function_with_exception(exception, *args, **kwargs)
+        raise exception
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def Bulkhead(max_concurrent_calls: int = 10,
+             max_wait: Union[float, int] = 0,
+             name: str = None,
+             fallback: Callable = None,
+             fallback_exception: Callable = None):
+    """
+    :param max_concurrent_calls: Max number of calls that may run at the same time. Any call beyond that waits for
+    up to "max_wait" milliseconds for a free slot and is then rejected.
+    :param max_wait: Number of milliseconds a call may wait for a free slot before it is rejected. Default is 0,
+    i.e. reject right away. If None, calls wait for as long as it takes.
+    :param name: Name of the bulkhead instance, defaults to the name of the decorated function.
+    :param fallback: A function to use as fallback if a call is rejected.
+    :param fallback_exception: A function to use as fallback if a call is rejected. The first argument supplied to
+    it will be the BulkheadFullException (i.e. fallback_exception(exception, *args, **kwargs))
+    """
+
+    # To be able to use decorator without parentheses
+    # if no arguments are provided.
+    if callable(max_concurrent_calls):
+        return BulkheadClass().decorate(max_concurrent_calls)
+    else:
+        return BulkheadClass(max_concurrent_calls=max_concurrent_calls,
+                             max_wait=max_wait,
+                             name=name,
+                             fallback_function=fallback,
+                             fallback_function_with_exception=fallback_exception)
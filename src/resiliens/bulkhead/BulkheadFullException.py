@@ -0,0 +1,12 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+
+
+class BulkheadFullException(Exception):
+
+    def __init__(self, bulkhead, *args):
+        super(BulkheadFullException, self).__init__(*args)
+        self._bulkhead = bulkhead
+
+    def __str__(self, *args, **kwargs):
+        return f"[Bulkhead: {self._bulkhead.name}] Reached the limit of {self._bulkhead.max_concurrent_calls}" \
+               f" concurrent calls ({self._bulkhead.queued} waiting)"
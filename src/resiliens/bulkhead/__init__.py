@@ -0,0 +1,3 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from .Bulkhead import Bulkhead
+from .BulkheadFullException import BulkheadFullException
@@ -1,27 +1,60 @@
 #  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
 
+from asyncio import CancelledError
 from datetime import timedelta, datetime
 from functools import wraps
-from inspect import isgeneratorfunction
+from inspect import isgeneratorfunction, iscoroutinefunction, isasyncgenfunction
+from itertools import count
 from math import ceil, floor
-from time import monotonic
+from time import monotonic, time
 from types import TracebackType
 from typing import Union, Callable, Optional, Type, Any
 
 from .CircuitBreakerException import CircuitBreakerException
 from .CircuitBreakerState import CircuitBreakerState
 from .CircuitBreakerStatus import CircuitBreakerStatus
+from .ResultCache import ResultCache
+from .SharedCircuitBreakerState import SharedCircuitBreakerState
 from .SlidingWindow import SlidingWindow
+from .TimeSlidingWindow import TimeSlidingWindow
 from .manager.CircuitBreakerManager import CircuitBreakerManager
+from .store.StateStore import OutcomeCounter, RemoteState, StateStore, StateUpdate
+from ..metrics.Metrics import Metrics
+from ..utils.Awaitables import await_if_needed, iterate_async
+
+_CLOSED = CircuitBreakerStatus.closed
+_OPEN = CircuitBreakerStatus.open
+# Default of "rejected_value", as None is a value of its own
+_RAISE = object()
 
 
 class CircuitBreakerClass:
+    """
+    A circuit breaker instance may be shared by any number of threads. Every state transition (recording a success
+    or failure, opening and resetting) happens atomically while holding the state's lock, so no outcome is lost and
+    the breaker opens on exactly the call that reaches the threshold. The lock is only held for the transition itself,
+    never while the decorated function runs.
+    """
     _failure_threshold: int
     _reset_timeout: Union[float, int]
     _expected_exception: Type[BaseException]
     _fallback_function: Callable
     _fallback_function_with_exception: Callable
-    _sliding_window: SlidingWindow
+    _sliding_window: Union[SlidingWindow, TimeSlidingWindow]
+    _minimum_calls: int
+    _failure_rate_threshold: Optional[float]
+    _permitted_calls_in_half_open: int
+    _slow_call_duration_threshold: Optional[float]
+    _slow_call_rate_threshold: Optional[float]
+    _cache: Optional[ResultCache]
+    _metrics: Optional[Metrics]
+    _state_store: Optional[StateStore]
+    _rejected_value: Any
+    _rejection: Optional[CircuitBreakerException]
+
+    # How many calls of a regular function there are per call timed for the
+    # metrics alone, i.e. when nothing else needs its duration.
+    _DURATION_SAMPLE_INTERVAL: int = 16
 
     def __init__(self,
                  failures: int = 5,
@@ -30,7 +63,19 @@ class CircuitBreakerClass:
                  expected_exception: Type[BaseException] = Exception,
                  name: str = None,
                  fallback_function: Callable = None,
-                 fallback_function_with_exception: Callable = None):
+                 fallback_function_with_exception: Callable = None,
+                 sliding_window_seconds: int = None,
+                 minimum_calls: int = 1,
+                 failure_rate_threshold: float = None,
+                 permitted_calls_in_half_open: int = 1,
+                 slow_call_duration_threshold: Union[float, int] = None,
+                 slow_call_rate_threshold: float = 100,
+                 cache: ResultCache = None,
+                 metrics: bool = False,
+                 shared_memory_path: str = None,
+                 state_store: StateStore = None,
+                 rejected_value: Any = _RAISE,
+                 reuse_rejection_exception: bool = False):
         """
         :param failures: Number of failures that need to be reached for the circuit breaker to be opened. If the
         argument "sliding_window_size" is supplied, this will be the total number of failures in the window. If it is
@@ -44,24 +89,97 @@ class CircuitBreakerClass:
         :param fallback_function_with_exception: A function to use as fallback if the circuit breaker is opened. The first
         argument supplied to it will be the most recent exception (i.e. fallback_exception(
         last_exception, *args, **kwargs))
+        :param sliding_window_seconds: Makes the circuit breaker keep a sliding window of the results of the last N
+        seconds instead of the last N calls. Can't be combined with "sliding_window_size".
+        :param minimum_calls: Minimum number of calls that must be in the sliding window before it can open the circuit
+        breaker.
+        :param failure_rate_threshold: Percentage (0-100) of failed calls in the sliding window at which the circuit breaker
+        opens. If set, it is used instead of the "failures" count whenever a sliding window is used.
+        :param permitted_calls_in_half_open: Number of trial calls let through once the circuit breaker becomes half-open.
+        Any other call is rejected as if it was open. If all trial calls succeed the circuit breaker closes, and as soon
+        as one of them fails it opens again.
+        :param slow_call_duration_threshold: Number of milliseconds after which a call is considered slow, even if it
+        succeeds. Requires a sliding window. A slow trial call in half-open state opens the circuit breaker again.
+        :param slow_call_rate_threshold: Percentage (0-100) of slow calls in the sliding window at which the circuit
+        breaker opens. Only used if "slow_call_duration_threshold" is set.
+        :param cache: A ResultCache to keep the results of successful calls in. While the circuit breaker is open, or when
+        a call fails, the cached result for the same arguments is returned if there is one, before any fallback function
+        is tried. Can't be used on generator functions.
+        :param metrics: Whether to count calls and record their durations, see the "metrics" property. Off by default,
+        as recording a call costs about as much as the closed circuit breaker itself. Only one in 16 calls of a regular
+        function is timed, unless "slow_call_duration_threshold" is set.
+        :param shared_memory_path: Path of a file to keep the state in, shared by every process on the host using the
+        same path (e.g. all workers of a gunicorn server), so that they open and close together. Put it on a
+        memory-backed file system such as /dev/shm. Can't be combined with "sliding_window_seconds".
+        :param state_store: A StateStore to share the state with every node of a fleet, see StateStore. The circuit
+        breaker opens when any node opens, and when the outcomes across the fleet reach its thresholds. Calls never wait
+        for the store, which is synced in the background.
+        :param rejected_value: Value to return from calls rejected while open, instead of raising CircuitBreakerException.
+        Used when there is neither a cached result nor a fallback function. Can't be used on generator functions.
+        :param reuse_rejection_exception: Raise the same CircuitBreakerException for every rejected call instead of a new
+        one, so that rejecting allocates nothing. Its traceback and context start over every time it is raised, so
+        don't keep it around after handling it. As threads rejected at the same time raise the very same exception,
+        the traceback it has may be that of another thread.
         """
-
-        self._state = CircuitBreakerState(status=CircuitBreakerStatus.closed,
-                                          fail_count=0,
-                                          last_failure=None,
-                                          opened=monotonic())
+        if sliding_window_size and sliding_window_seconds:
+            raise TypeError(
+                "Arguments \"sliding_window_size\" and \"sliding_window_seconds\" can't be combined")
+        if slow_call_duration_threshold is not None and not (sliding_window_size or sliding_window_seconds):
+            raise TypeError(
+                "Argument \"slow_call_duration_threshold\" requires either \"sliding_window_size\" or "
+                "\"sliding_window_seconds\"")
+        if rejected_value is not _RAISE and reuse_rejection_exception:
+            raise TypeError(
+                "Arguments \"rejected_value\" and \"reuse_rejection_exception\" can't be combined")
+        if shared_memory_path is not None and sliding_window_seconds:
+            raise TypeError(
+                "Arguments \"shared_memory_path\" and \"sliding_window_seconds\" can't be combined")
+
+        if shared_memory_path is not None:
+            self._state = SharedCircuitBreakerState(shared_memory_path,
+                                                    window_length=sliding_window_size or 0)
+        else:
+            self._state = CircuitBreakerState(status=CircuitBreakerStatus.closed,
+                                              fail_count=0,
+                                              last_failure=None,
+                                              opened=monotonic())
         self._failure_threshold = failures
         self._reset_timeout = reset_timeout / 1000  # From milliseconds to seconds
         self._expected_exception = expected_exception
         self._fallback_function = fallback_function
         self._fallback_function_with_exception = fallback_function_with_exception
         self._name = name
-        self._sliding_window = SlidingWindow(
-            sliding_window_size) if sliding_window_size else None
+        if sliding_window_seconds:
+            self._sliding_window = TimeSlidingWindow(sliding_window_seconds)
+        elif sliding_window_size and shared_memory_path is not None:
+            self._sliding_window = self._state.sliding_window
+        elif sliding_window_size:
+            self._sliding_window = SlidingWindow(sliding_window_size)
+        else:
+            self._sliding_window = None
+        self._minimum_calls = minimum_calls
+        self._failure_rate_threshold = failure_rate_threshold
+        self._permitted_calls_in_half_open = permitted_calls_in_half_open
+        self._slow_call_duration_threshold = slow_call_duration_threshold / 1000 \
+            if slow_call_duration_threshold is not None else None  # From milliseconds to seconds
+        self._slow_call_rate_threshold = slow_call_rate_threshold
+        self._cache = cache
+        self._metrics = Metrics(name, "circuit_breaker") if metrics else None
+        self._state_store = state_store
+        self._outcomes = OutcomeCounter() if state_store is not None else None
+        # Monotonic time of the latest opening sent to or merged from the
+        # store, and the wall-clock time of the latest opening in the fleet.
+        self._published_opened = None
+        self._remote_opened_at = None
+        # Monotonic and wall-clock time of the opening sent in the update being
+        # synced, which only counts as published once the sync succeeds.
+        self._unsynced_opened = None
+        self._rejected_value = rejected_value
+        self._rejection = CircuitBreakerException(self) if reuse_rejection_exception else None
 
     @property
     def status(self):
-        if self._state.status == CircuitBreakerStatus.open and self.open_seconds_remaining <= 0:
+        if self._state.status == CircuitBreakerStatus.open and self.__open_expired():
             return CircuitBreakerStatus.half_open
         return self._state.status
 
@@ -100,6 +218,13 @@ class CircuitBreakerClass:
     def last_failure(self):
         return self._state.last_failure
 
+    @property
+    def metrics(self) -> Optional[Metrics]:
+        """
+        Counters and latency histogram of the calls made through the circuit breaker, or None if disabled.
+        """
+        return self._metrics
+
     @property
     def fallback_function(self):
         if self._fallback_function is not None:
@@ -115,87 +240,464 @@ class CircuitBreakerClass:
     def __exit__(self, exception_type: Optional[Type[BaseException]],
                  exception_value: Optional[BaseException],
                  exception_traceback: Optional[TracebackType]) -> bool:
+        self._record(exception_type, exception_value, None)
+        return False
+
+    def _record(self, exception_type: Optional[Type[BaseException]],
+                exception_value: Optional[BaseException],
+                duration: Optional[float]) -> None:
+        """
+        Record the outcome of a call. The duration is in seconds, or None if the call wasn't timed.
+        """
+        if exception_type and issubclass(exception_type, CancelledError):
+            # A cancelled call tells us nothing about the health of the dependency
+            self.__release_permission()
+            return
+        slow = duration is not None and self._slow_call_duration_threshold is not None \
+            and duration >= self._slow_call_duration_threshold
         if exception_type and issubclass(exception_type,
                                          self._expected_exception):
-            self._state.last_failure = exception_value
-            self.__call_failed()
+            self.__call_failed(exception_value, slow)
+            if self._metrics is not None:
+                self._metrics.record_failure(duration)
+            if self._outcomes is not None:
+                self._outcomes.add(False)
         else:
-            self.__call_succeeded()
-        return False
+            self.__call_succeeded(slow)
+            if self._metrics is not None:
+                self._metrics.record_success(duration)
+            if self._outcomes is not None:
+                self._outcomes.add(True)
 
     def decorate(self, function_to_decorate) -> Callable:
+        self._check_decoratable(function_to_decorate)
+
         if self._name is None:
             self._name = function_to_decorate.__name__
+        if self._metrics is not None:
+            self._metrics.name = self._name
 
         CircuitBreakerManager.register(self)
+        if self._state_store is not None:
+            self._state_store.register(self)
 
-        if isgeneratorfunction(function_to_decorate):
-            call = self.call_generator
-        else:
-            call = self.call
+        return self._wrap(function_to_decorate)
+
+    def _check_decoratable(self, function_to_decorate) -> None:
+        if self._cache is not None and (isgeneratorfunction(function_to_decorate)
+                                        or isasyncgenfunction(function_to_decorate)):
+            raise TypeError("A result cache can't be used on generator functions")
+        if self._rejected_value is not _RAISE and (isgeneratorfunction(function_to_decorate)
+                                                   or isasyncgenfunction(function_to_decorate)):
+            raise TypeError("A rejected value can't be used on generator functions")
+
+    def _wrap(self, function_to_decorate) -> Callable:
+        """
+        Wrap the function in the circuit breaker without registering it anywhere, see KeyedCircuitBreakerClass.
+        """
+        if iscoroutinefunction(function_to_decorate):
+            return self._decorate_coroutine(function_to_decorate)
+        if isasyncgenfunction(function_to_decorate):
+            return self._decorate_async_generator(function_to_decorate)
+
+        if not isgeneratorfunction(function_to_decorate):
+            return self._decorate_function(function_to_decorate)
+
+        state = self._state
 
         @wraps(function_to_decorate)
         def wrapper(*args, **kwargs):
-            if self.opened:
-                return self._handle_open_call(call, *args, **kwargs)
-            return self.try_catch_fallback(call, function_to_decorate, *args,
+            status = state.status
+            if status == _CLOSED:
+                return self.try_catch_fallback(self.call_generator, function_to_decorate, *args,
+                                               **kwargs)
+            if status == _OPEN and not self.__open_expired():
+                return self._handle_open_call(self._invoke_generator, *args, **kwargs)
+            return self.try_catch_fallback(self.call_trial_generator, function_to_decorate, *args,
                                            **kwargs)
 
         return wrapper
 
+    def _decorate_function(self, function_to_decorate) -> Callable:
+        # The closed state is the hot path, so everything it needs is looked up
+        # once here. A call then takes a single status check and a single
+        # try/except, and a success is only recorded if anything keeps track
+        # of it, or if it resets failures counted in a row. A success that
+        # only the metrics keep track of is counted without going through
+        # _record(), and only a sample of calls is timed for them.
+        state = self._state
+        metrics = self._metrics
+        timed = self._slow_call_duration_threshold is not None
+        track_successes = timed or self._sliding_window is not None or self._outcomes is not None \
+            or self._cache is not None
+        sampled = count() if metrics is not None and not timed else None
+        sample_interval = self._DURATION_SAMPLE_INTERVAL
+        record = self._record
+        cache = self._cache
+        reset_timeout = self._reset_timeout
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            status = state.status
+            if status != _CLOSED:
+                if status == _OPEN and state.opened + reset_timeout > monotonic():
+                    return self._handle_open_call(self._invoke, *args, **kwargs)
+                return self._call_not_closed(function_to_decorate, args, kwargs)
+            start = monotonic() if timed or (sampled is not None and not next(sampled) % sample_interval) else None
+            try:
+                result = function_to_decorate(*args, **kwargs)
+            except Exception as e:
+                record(type(e), e, None if start is None else monotonic() - start)
+                return self._recover(e, args, kwargs)
+            except BaseException as e:
+                record(type(e), e, None if start is None else monotonic() - start)
+                raise
+            if track_successes or state.fail_count:
+                record(None, None, None if start is None else monotonic() - start)
+                if cache is not None:
+                    cache.put(args, kwargs, result)
+            elif metrics is not None:
+                metrics.record_success(None if start is None else monotonic() - start)
+            return result
+
+        return wrapper
+
+    def _call_not_closed(self, function_to_decorate, args: tuple, kwargs: dict):
+        if not self._acquire_permission():
+            return self._handle_open_call(self._invoke, *args, **kwargs)
+        return self.try_catch_fallback(self.call, function_to_decorate, *args, **kwargs)
+
+    def _decorate_coroutine(self, function_to_decorate) -> Callable:
+
+        state = self._state
+
+        @wraps(function_to_decorate)
+        async def wrapper(*args, **kwargs):
+            if state.status != _CLOSED and not self._acquire_permission():
+                return await await_if_needed(
+                    self._handle_open_call(self._invoke, *args, **kwargs))
+            try:
+                result = await self.call_async(function_to_decorate, *args,
+                                               **kwargs)
+            except Exception as e:
+                if self._cache is not None and isinstance(e, self._expected_exception):
+                    hit, cached = self._cache.get(args, kwargs)
+                    if hit:
+                        return cached
+                if not self._has_fallback_for(e):
+                    raise
+                return await await_if_needed(
+                    self._call_fallback(self._invoke, e, *args, **kwargs))
+            if self._cache is not None:
+                self._cache.put(args, kwargs, result)
+            return result
+
+        return wrapper
+
+    def _decorate_async_generator(self, function_to_decorate) -> Callable:
+
+        state = self._state
+
+        @wraps(function_to_decorate)
+        async def wrapper(*args, **kwargs):
+            if state.status != _CLOSED and not self._acquire_permission():
+                results = self._handle_open_call(self._invoke, *args, **kwargs)
+                async for el in iterate_async(results):
+                    yield el
+                return
+            async for el in self.call_async_generator(function_to_decorate,
+                                                      *args, **kwargs):
+                yield el
+
+        return wrapper
+
+    def _acquire_permission(self) -> bool:
+        """
+        Decide whether a call may go through. While closed every call may, while open none may and while half-open
+        only the first "permitted_calls_in_half_open" trial calls may.
+        """
+        state = self._state
+        status = state.status
+        if status == _CLOSED:
+            return True
+        if status == _OPEN and not self.__open_expired():
+            # Rejecting is all an outage does, so it shouldn't contend for the lock
+            return False
+        with state.lock:
+            if state.status == CircuitBreakerStatus.open:
+                if not self.__open_expired():
+                    return False
+                state.status = CircuitBreakerStatus.half_open
+                state.half_open_calls = 0
+                state.half_open_successes = 0
+            if state.status == CircuitBreakerStatus.closed:
+                return True
+            if state.half_open_calls >= self._permitted_calls_in_half_open:
+                return False
+            state.half_open_calls += 1
+            return True
+
+    def __release_permission(self) -> None:
+        state = self._state
+        if state.status != CircuitBreakerStatus.half_open:
+            return
+        with state.lock:
+            if state.status == CircuitBreakerStatus.half_open and state.half_open_calls > 0:
+                state.half_open_calls -= 1
+
     def try_catch_fallback(self, call, function_to_decorate, *args, **kwargs):
         try:
-            return call(function_to_decorate, *args, **kwargs)
+            result = call(function_to_decorate, *args, **kwargs)
         except Exception as e:
-            if issubclass(e.__class__, self._expected_exception):
-                if self._fallback_function:
-                    return call(self.fallback_function, *args, **kwargs)
-                elif self._fallback_function_with_exception:
-                    return call(self._fallback_function_with_exception,
-                                (self.last_failure, *args), **kwargs)
-
-    def _handle_open_call(self, call, *args, **kwargs):
-        if self.fallback_function:
-            return call(self.fallback_function, *args, **kwargs)
-        elif self._fallback_function_with_exception:
-            return call(self._fallback_function_with_exception,
-                        (self.last_failure, *args), **kwargs)
+            return self._recover(e, args, kwargs)
+        if self._cache is not None:
+            self._cache.put(args, kwargs, result)
+        return result
+
+    def _recover(self, exception: Exception, args: tuple, kwargs: dict):
+        """
+        Return the cached result or the result of the fallback function for a failed call, or raise its exception if
+        there is neither.
+        """
+        if self._cache is not None and isinstance(exception, self._expected_exception):
+            hit, cached = self._cache.get(args, kwargs)
+            if hit:
+                return cached
+        if not self._has_fallback_for(exception):
+            raise exception
+        return self._call_fallback(self._invoke, exception, *args, **kwargs)
+
+    def _has_fallback_for(self, exception: BaseException) -> bool:
+        return self.fallback_function is not None and isinstance(
+            exception, self._expected_exception)
+
+    def _call_fallback(self, invoke, exception, *args, **kwargs):
+        if self._fallback_function:
+            return invoke(self._fallback_function, *args, **kwargs)
+        return invoke(self._fallback_function_with_exception, exception, *args,
+                      **kwargs)
+
+    def _handle_open_call(self, invoke, *args, **kwargs):
+        if self._metrics is not None:
+            self._metrics.record_rejection()
+        if self._cache is not None:
+            hit, cached = self._cache.get(args, kwargs)
+            if hit:
+                return cached
+        if self._fallback_function is not None or self._fallback_function_with_exception is not None:
+            return self._call_fallback(invoke, self._state.last_failure, *args,
+                                       **kwargs)
+        if self._rejected_value is not _RAISE:
+            return self._rejected_value
+        if self._rejection is not None:
+            # Raising an exception adds to its traceback and, within an except
+            # block, makes the exception being handled its context. Neither
+            # may pile up or keep the frames of earlier rejections alive.
+            rejection = self._rejection
+            rejection.__cause__ = None
+            rejection.__context__ = None
+            raise rejection.with_traceback(None) from None
         raise CircuitBreakerException(self)
 
     def call(self, func, *args, **kwargs) -> Any:
-        with self:
-            return func(*args, **kwargs)
+        start = monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._record(type(e), e, monotonic() - start)
+            raise
+        self._record(None, None, monotonic() - start)
+        return result
 
     def call_generator(self, func, *args, **kwargs):
-        with self:
+        start = monotonic()
+        try:
             for el in func(*args, **kwargs):
                 yield el
+        except BaseException as e:
+            self._record(type(e), e, monotonic() - start)
+            raise
+        self._record(None, None, monotonic() - start)
+
+    def call_trial_generator(self, func, *args, **kwargs):
+        # The half-open permit is only taken once the generator is started, as
+        # a generator that never is wouldn't record an outcome to give it back.
+        if not self._acquire_permission():
+            yield from self._handle_open_call(self._invoke_generator, *args, **kwargs)
+            return
+        yield from self.call_generator(func, *args, **kwargs)
+
+    async def call_async(self, func, *args, **kwargs) -> Any:
+        start = monotonic()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            self._record(type(e), e, monotonic() - start)
+            raise
+        self._record(None, None, monotonic() - start)
+        return result
+
+    async def call_async_generator(self, func, *args, **kwargs):
+        start = monotonic()
+        try:
+            async for el in func(*args, **kwargs):
+                yield el
+        except BaseException as e:
+            self._record(type(e), e, monotonic() - start)
+            raise
+        self._record(None, None, monotonic() - start)
+
+    @staticmethod
+    def _invoke(func, *args, **kwargs) -> Any:
+        return func(*args, **kwargs)
+
+    @staticmethod
+    def _invoke_generator(func, *args, **kwargs):
+        for el in func(*args, **kwargs):
+            yield el
+
+    def __call_succeeded(self, slow: bool = False) -> None:
+        state = self._state
+        if self._sliding_window is None and state.fail_count == 0 \
+                and state.status == _CLOSED:
+            # Nothing to transition, so don't contend for the lock
+            return
+        with state.lock:
+            if state.status == CircuitBreakerStatus.half_open:
+                if slow:
+                    # A slow trial call means the dependency hasn't recovered yet
+                    self.__open()
+                    return
+                state.half_open_successes += 1
+                if state.half_open_successes < self._permitted_calls_in_half_open:
+                    return
+                self.__close()
+                return
+            if state.status == CircuitBreakerStatus.open:
+                # The call was let through before it opened, which doesn't undo the opening
+                return
+            state.last_failure = None
+            state.fail_count = 0
+            if self._sliding_window is not None:
+                self._sliding_window.add(True, slow)
+                if slow and self.__window_exceeded():
+                    self.__open()
+
+    def __call_failed(self, exception: BaseException, slow: bool = False) -> None:
+        state = self._state
+        with state.lock:
+            state.last_failure = exception
+            state.fail_count += 1
+            if state.status == CircuitBreakerStatus.half_open:
+                # A failed trial call means the dependency hasn't recovered yet
+                self.__open()
+            elif self._sliding_window is not None:
+                self._sliding_window.add(False, slow)
+                if self.__window_exceeded():
+                    self.__open()
+            elif state.fail_count >= self._failure_threshold:
+                self.__open()
+
+    def __window_exceeded(self) -> bool:
+        window = self._sliding_window
+        calls = window.get_call_count()
+        if calls < self._minimum_calls:
+            return False
+        if self._slow_call_duration_threshold is not None and \
+                window.get_slow_call_count() * 100 >= self._slow_call_rate_threshold * calls:
+            return True
+        failures = window.get_failure_count()
+        if self._failure_rate_threshold is not None:
+            return failures * 100 >= self._failure_rate_threshold * calls
+        return failures >= self._failure_threshold
+
+    def _take_state_update(self, node: str) -> StateUpdate:
+        """
+        The outcomes counted and any opening since the previous sync with the state store. Followed by either
+        _merge_remote_state() or _state_update_failed(), depending on whether the sync succeeds.
+        """
+        successes, failures = self._outcomes.take()
+        state = self._state
+        opened_at = None
+        with state.lock:
+            if state.status != CircuitBreakerStatus.closed and state.opened != self._published_opened:
+                opened_at = time() - (monotonic() - state.opened)
+                self._unsynced_opened = (state.opened, opened_at)
+        return StateUpdate(node=node, successes=successes, failures=failures, opened_at=opened_at)
+
+    def _state_update_failed(self, update: StateUpdate) -> None:
+        """
+        Keep the outcomes and opening of an update the state store never got, to send them with the next sync instead.
+        """
+        self._outcomes.give_back(update.successes, update.failures)
+        self._unsynced_opened = None
+
+    def _merge_remote_state(self, remote: RemoteState) -> None:
+        """
+        Merge the state of the fleet, as returned by the state store, into the local state.
+        """
+        state = self._state
+        with state.lock:
+            if self._unsynced_opened is not None:
+                # The store has the opening now, and the fleet state includes it
+                self._published_opened, self._remote_opened_at = self._unsynced_opened
+                self._unsynced_opened = None
+            if remote.opened_at is not None and (self._remote_opened_at is None
+                                                 or remote.opened_at > self._remote_opened_at):
+                self._remote_opened_at = remote.opened_at
+                # Wall-clock times are comparable across nodes, monotonic ones aren't
+                opened = monotonic() - (time() - remote.opened_at)
+                if opened + self._reset_timeout > monotonic() and (
+                        state.status == CircuitBreakerStatus.closed or opened > state.opened):
+                    state.status = CircuitBreakerStatus.open
+                    state.opened = opened
+                    self._published_opened = opened
+                    CircuitBreakerManager.status_changed(self)
+                return
+            if state.status == CircuitBreakerStatus.closed and self.__fleet_exceeded(remote):
+                self.__open()
+
+    def __fleet_exceeded(self, remote: RemoteState) -> bool:
+        calls = remote.successes + remote.failures
+        if remote.failures == 0 or calls < self._minimum_calls:
+            return False
+        if self._failure_rate_threshold is not None:
+            return remote.failures * 100 >= self._failure_rate_threshold * calls
+        if isinstance(self._sliding_window, SlidingWindow):
+            window_length = self._sliding_window.window_length
+            if calls < window_length:
+                # Fewer calls than fit in one window, so their failures count as they are
+                return remote.failures >= self._failure_threshold
+            # Hold the fleet to the share of failures that fills the window
+            return remote.failures * window_length >= self._failure_threshold * calls
+        if self._sliding_window is not None:
+            return remote.failures >= self._failure_threshold
+        # Without a window the threshold is failures in a row, which any success breaks
+        return remote.successes == 0 and remote.failures >= self._failure_threshold
+
+    def __open_expired(self) -> bool:
+        return self._state.opened + self._reset_timeout <= monotonic()
+
+    def __open(self) -> None:
+        self._state.status = CircuitBreakerStatus.open
+        self._state.opened = monotonic()
+        CircuitBreakerManager.status_changed(self)
 
-    def __call_succeeded(self) -> None:
+    def __close(self) -> None:
         self._state.status = CircuitBreakerStatus.closed
         self._state.last_failure = None
         self._state.fail_count = 0
-        if self._sliding_window:
-            self._sliding_window.add(True)
-
-    def __call_failed(self) -> None:
-        self._state.fail_count += 1
-        if self._sliding_window:
-            self._sliding_window.add(False)
-            if self._sliding_window.get_failure_count(
-            ) >= self._failure_threshold:
-                self._state.status = CircuitBreakerStatus.open
-                self._state.opened = monotonic()
-        elif self._state.fail_count >= self._failure_threshold:
-            self._state.status = CircuitBreakerStatus.open
-            self._state.opened = monotonic()
+        if self._sliding_window is not None:
+            self._sliding_window.clear()
+        CircuitBreakerManager.status_changed(self)
 
     def force_open(self) -> None:
-        self._state.status = CircuitBreakerStatus.open
-        self._state.opened = monotonic()
+        with self._state.lock:
+            self.__open()
 
     def force_reset(self) -> None:
-        self.__call_succeeded()
+        with self._state.lock:
+            self.__close()
 
     def __str__(self, *args, **kwargs) -> str:
         return self._name
@@ -207,7 +709,19 @@ def CircuitBreaker(failures: int = 5,
                    expected_exception: Type[BaseException] = Exception,
                    name: str = None,
                    fallback: Callable = None,
-                   fallback_exception: Callable = None):
+                   fallback_exception: Callable = None,
+                   sliding_window_seconds: int = None,
+                   minimum_calls: int = 1,
+                   failure_rate_threshold: float = None,
+                   permitted_calls_in_half_open: int = 1,
+                   slow_call_duration_threshold: Union[float, int] = None,
+                   slow_call_rate_threshold: float = 100,
+                   cache: ResultCache = None,
+                   metrics: bool = False,
+                   shared_memory_path: str = None,
+                   state_store: StateStore = None,
+                   rejected_value: Any = _RAISE,
+                   reuse_rejection_exception: bool = False):
     """
     :param failures: Number of failures that need to be reached for the circuit breaker to be opened. If the
     argument "sliding_window_size" is supplied, this will be the total number of failures in the window. If it is
@@ -221,6 +735,36 @@ def CircuitBreaker(failures: int = 5,
     :param fallback_exception: A function to use as fallback if the circuit breaker is opened. The first
     argument supplied to it will be the most recent exception (i.e. fallback_exception(
     last_exception, *args, **kwargs))
+    :param sliding_window_seconds: Makes the circuit breaker keep a sliding window of the results of the last N
+    seconds instead of the last N calls. Can't be combined with "sliding_window_size".
+    :param minimum_calls: Minimum number of calls that must be in the sliding window before it can open the circuit breaker.
+    :param failure_rate_threshold: Percentage (0-100) of failed calls in the sliding window at which the circuit breaker
+    opens. If set, it is used instead of the "failures" count whenever a sliding window is used.
+    :param permitted_calls_in_half_open: Number of trial calls let through once the circuit breaker becomes half-open.
+    Any other call is rejected as if it was open. If all trial calls succeed the circuit breaker closes, and as soon
+    as one of them fails it opens again.
+    :param slow_call_duration_threshold: Number of milliseconds after which a call is considered slow, even if it
+    succeeds. Requires a sliding window. A slow trial call in half-open state opens the circuit breaker again.
+    :param slow_call_rate_threshold: Percentage (0-100) of slow calls in the sliding window at which the circuit
+    breaker opens. Only used if "slow_call_duration_threshold" is set.
+    :param cache: A ResultCache to keep the results of successful calls in. While the circuit breaker is open, or when a
+    call fails, the cached result for the same arguments is returned if there is one, before any fallback function is
+    tried. Can't be used on generator functions.
+    :param metrics: Whether to count calls and record their durations, see the "metrics" property of the circuit
+    breaker. Off by default, as recording a call costs about as much as the closed circuit breaker itself. Only one in
+    16 calls of a regular function is timed, unless "slow_call_duration_threshold" is set.
+    :param shared_memory_path: Path of a file to keep the state in, shared by every process on the host using the same
+    path (e.g. all workers of a gunicorn server), so that they open and close together. Put it on a memory-backed file
+    system such as /dev/shm. Can't be combined with "sliding_window_seconds".
+    :param state_store: A StateStore to share the state with every node of a fleet, see StateStore. The circuit breaker
+    opens when any node opens, and when the outcomes across the fleet reach its thresholds. Calls never wait for the
+    store, which is synced in the background.
+    :param rejected_value: Value to return from calls rejected while open, instead of raising CircuitBreakerException.
+    Used when there is neither a cached result nor a fallback function. Can't be used on generator functions.
+    :param reuse_rejection_exception: Raise the same CircuitBreakerException for every rejected call instead of a new
+    one, so that rejecting allocates nothing. Its traceback and context start over every time it is raised, so don't
+    keep it around after handling it. As threads rejected at the same time raise the very same exception, the traceback
+    it has may be that of another thread.
     """
 
     # We check this to be able to use decorator without parentheses
@@ -235,4 +779,16 @@ def CircuitBreaker(failures: int = 5,
             expected_exception=expected_exception,
             name=name,
             fallback_function=fallback,
-            fallback_function_with_exception=fallback_exception)
+            fallback_function_with_exception=fallback_exception,
+            sliding_window_seconds=sliding_window_seconds,
+            minimum_calls=minimum_calls,
+            failure_rate_threshold=failure_rate_threshold,
+            permitted_calls_in_half_open=permitted_calls_in_half_open,
+            slow_call_duration_threshold=slow_call_duration_threshold,
+            slow_call_rate_threshold=slow_call_rate_threshold,
+            cache=cache,
+            metrics=metrics,
+            shared_memory_path=shared_memory_path,
+            state_store=state_store,
+            rejected_value=rejected_value,
+            reuse_rejection_exception=reuse_rejection_exception)
@@ -4,13 +4,25 @@ strtimeformat = "%m/%d/%Y, %H:%M:%S"
 
 
 class CircuitBreakerException(Exception):
+    """
+    Raised by calls rejected while the circuit breaker is open. The message is formatted when the exception is turned
+    into a string, not when it is raised, and only formatted anew once what it says has changed.
+    """
 
     def __init__(self, circuit_breaker, *args):
         super(CircuitBreakerException, self).__init__(*args)
         self._circuit_breaker = circuit_breaker
+        self._message = None
+        self._message_key = None
 
     def __str__(self, *args, **kwargs):
-        return f"[Circuit breaker: {self._circuit_breaker.name}] Reached {self._circuit_breaker.failure_count}" \
-               f" failures and will be open until {self._circuit_breaker.open_until.strftime(strtimeformat)}" \
-               f" ({self._circuit_breaker.open_seconds_remaining} sec remaining)" \
-               f" (Last failure: {repr(self._circuit_breaker.last_failure)})"
+        circuit_breaker = self._circuit_breaker
+        seconds_remaining = circuit_breaker.open_seconds_remaining
+        key = (seconds_remaining, circuit_breaker.failure_count, circuit_breaker.last_failure)
+        if self._message is None or key != self._message_key:
+            self._message_key = key
+            self._message = f"[Circuit breaker: {circuit_breaker.name}] Reached {key[1]}" \
+                            f" failures and will be open until {circuit_breaker.open_until.strftime(strtimeformat)}" \
+                            f" ({seconds_remaining} sec remaining)" \
+                            f" (Last failure: {repr(key[2])})"
+        return self._message
@@ -1,5 +1,6 @@
 #  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
 
+from threading import Lock
 from typing import Any
 
 from .CircuitBreakerStatus import CircuitBreakerStatus
@@ -10,6 +11,11 @@ class CircuitBreakerState:
     fail_count: int
     last_failure: Any
     opened: float
+    half_open_calls: int
+    half_open_successes: int
+    lock: Lock
+    # Whether the state can change without going through this process, see CircuitBreakerManager
+    external: bool = False
 
     def __init__(self, status: str,
                  fail_count: int = 0,
@@ -19,6 +25,10 @@ class CircuitBreakerState:
         self.status = status
         self.last_failure = last_failure
         self.opened = opened
+        self.half_open_calls = 0
+        self.half_open_successes = 0
+        # Guards transitions of the fields above, see CircuitBreakerClass
+        self.lock = Lock()
 
     @property
     def status(self):
@@ -0,0 +1,193 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from collections import OrderedDict
+from functools import wraps
+from inspect import iscoroutinefunction, isasyncgenfunction
+from threading import Lock
+from time import monotonic
+from typing import Callable, Hashable, Optional, Union
+
+from .CircuitBreaker import CircuitBreaker, CircuitBreakerClass
+from ..metrics.Metrics import Metrics
+
+
+class _Entry:
+    __slots__ = ("circuit_breaker", "wrappers", "last_used")
+
+    def __init__(self, circuit_breaker: CircuitBreakerClass, last_used: float):
+        self.circuit_breaker = circuit_breaker
+        # The circuit breaker wrapped around each function decorated, as a
+        # keyed circuit breaker may decorate more than one.
+        self.wrappers = {}
+        self.last_used = last_used
+
+
+class KeyedCircuitBreakerClass:
+    """
+    A separate circuit breaker per key, e.g. per downstream host or tenant, so that one failing partition doesn't open
+    the circuit for the others. The key of a call is extracted from its arguments, and the circuit breaker of a key is
+    created the first time it is seen.
+
+    To keep memory bounded no matter how many keys come and go, at most "max_keys" circuit breakers are kept and the
+    least recently used one is evicted to make room. Circuit breakers that haven't been used for "idle_ttl" are evicted
+    as well. Open circuit breakers are only evicted when there is no other way to stay within "max_keys", as forgetting
+    them would let calls through to a partition known to be failing.
+
+    The circuit breakers of the keys aren't registered with the CircuitBreakerManager. Their metrics, if enabled, are
+    all recorded in the metrics of the keyed circuit breaker.
+    """
+    _key_function: Callable[..., Hashable]
+    _max_keys: int
+    _idle_ttl: Optional[float]
+    _metrics: Optional[Metrics]
+
+    def __init__(self,
+                 key: Callable[..., Hashable],
+                 max_keys: int = 10_000,
+                 idle_ttl: Union[float, int] = None,
+                 name: str = None,
+                 metrics: bool = False,
+                 **circuit_breaker_options):
+        """
+        :param key: Function that is given the arguments of a call and returns the key of the circuit breaker to use.
+        :param max_keys: Max number of circuit breakers to keep. The least recently used one is evicted first.
+        :param idle_ttl: Number of milliseconds a circuit breaker may go unused before it is evicted. If None, only
+        "max_keys" bounds the circuit breakers kept.
+        :param name: Name of the keyed circuit breaker, defaults to the name of the decorated function. The circuit
+        breaker of a key is named after it, e.g. "get_page[example.com]".
+        :param metrics: Whether to count calls and record their durations across all keys. Off by default.
+        :param circuit_breaker_options: Arguments of CircuitBreaker to create the circuit breaker of every key with,
+        e.g. failures=5.
+        """
+        if max_keys < 1:
+            raise ValueError("Keyed circuit breaker must keep at least 1 key")
+        for option in ("shared_memory_path", "state_store"):
+            if circuit_breaker_options.get(option) is not None:
+                raise TypeError(f"Argument \"{option}\" can't be used with a keyed circuit breaker")
+        self._key_function = key
+        self._max_keys = max_keys
+        self._idle_ttl = idle_ttl / 1000 if idle_ttl is not None else None  # From milliseconds to seconds
+        self._name = name
+        self._metrics = Metrics(name, "keyed_circuit_breaker") if metrics else None
+        self._options = circuit_breaker_options
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        # Raises for invalid options right away rather than on the first call
+        self._prototype = self._new_circuit_breaker(None)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def metrics(self) -> Optional[Metrics]:
+        return self._metrics
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[CircuitBreakerClass]:
+        """
+        The circuit breaker of the given key, or None if there is none (yet, or anymore).
+        """
+        entry = self._entries.get(key)
+        return entry.circuit_breaker if entry is not None else None
+
+    def __call__(self, decorated_function):
+        return self.decorate(decorated_function)
+
+    def _new_circuit_breaker(self, key: Hashable) -> CircuitBreakerClass:
+        circuit_breaker = CircuitBreaker(name=f"{self._name}[{key}]", metrics=False, **self._options)
+        circuit_breaker._metrics = self._metrics
+        return circuit_breaker
+
+    def decorate(self, function_to_decorate: Callable) -> Callable:
+        self._prototype._check_decoratable(function_to_decorate)
+        if self._name is None:
+            self._name = function_to_decorate.__name__
+        if self._metrics is not None:
+            self._metrics.name = self._name
+
+        if iscoroutinefunction(function_to_decorate):
+
+            @wraps(function_to_decorate)
+            async def async_wrapper(*args, **kwargs):
+                return await self._wrapper_for(function_to_decorate, args, kwargs)(*args, **kwargs)
+
+            return async_wrapper
+
+        if isasyncgenfunction(function_to_decorate):
+
+            @wraps(function_to_decorate)
+            async def async_generator_wrapper(*args, **kwargs):
+                async for el in self._wrapper_for(function_to_decorate, args, kwargs)(*args, **kwargs):
+                    yield el
+
+            return async_generator_wrapper
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            return self._wrapper_for(function_to_decorate, args, kwargs)(*args, **kwargs)
+
+        return wrapper
+
+    def _wrapper_for(self, function_to_decorate: Callable, args: tuple, kwargs: dict) -> Callable:
+        key = self._key_function(*args, **kwargs)
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(self._new_circuit_breaker(key), now)
+                self._evict(now)
+            else:
+                entry.last_used = now
+                self._entries.move_to_end(key)
+            wrapper = entry.wrappers.get(function_to_decorate)
+            if wrapper is None:
+                wrapper = entry.wrappers[function_to_decorate] = entry.circuit_breaker._wrap(function_to_decorate)
+        return wrapper
+
+    def _evict(self, now: float) -> None:
+        entries = self._entries
+        if self._idle_ttl is not None:
+            # Least recently used first, so the idle ones are all at the front
+            idle = []
+            for key, entry in entries.items():
+                if entry.last_used + self._idle_ttl > now:
+                    break
+                if not entry.circuit_breaker.opened:
+                    idle.append(key)
+            for key in idle:
+                del entries[key]
+        if len(entries) <= self._max_keys:
+            return
+        for key, entry in entries.items():
+            if not entry.circuit_breaker.opened:
+                del entries[key]
+                return
+        # Every circuit breaker is open, and memory must stay bounded regardless
+        entries.popitem(last=False)
+
+
+def KeyedCircuitBreaker(key: Callable[..., Hashable],
+                        max_keys: int = 10_000,
+                        idle_ttl: Union[float, int] = None,
+                        name: str = None,
+                        metrics: bool = False,
+                        **circuit_breaker_options):
+    """
+    Keep a separate circuit breaker per key, e.g. per downstream host, created the first time the key is seen.
+    :param key: Function that is given the arguments of a call and returns the key of the circuit breaker to use.
+    :param max_keys: Max number of circuit breakers to keep. The least recently used one is evicted first.
+    :param idle_ttl: Number of milliseconds a circuit breaker may go unused before it is evicted. If None, only
+    "max_keys" bounds the circuit breakers kept.
+    :param name: Name of the keyed circuit breaker, defaults to the name of the decorated function.
+    :param metrics: Whether to count calls and record their durations across all keys. Off by default.
+    :param circuit_breaker_options: Arguments of CircuitBreaker to create the circuit breaker of every key with, e.g.
+    failures=5.
+    """
+    return KeyedCircuitBreakerClass(key=key,
+                                    max_keys=max_keys,
+                                    idle_ttl=idle_ttl,
+                                    name=name,
+                                    metrics=metrics,
+                                    **circuit_breaker_options)
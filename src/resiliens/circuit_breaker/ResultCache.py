@@ -0,0 +1,99 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import sys
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Hashable, Optional, Tuple, Union
+
+_MISSING = object()
+# Separates the positional arguments of a key from the keyword arguments, so
+# that a call with keyword arguments never has the key of a call without.
+_KWARGS_MARK = object()
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of the last known good results of a function, keyed by the arguments it was called with. Pass
+    one to a CircuitBreaker and it serves cached results while the circuit breaker is open or when a call fails,
+    before falling back to the fallback function. Calls with arguments that can't be hashed are never cached.
+    """
+    _max_entries: int
+    _ttl: Optional[float]
+    _max_memory: Optional[int]
+    _memory: int
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 ttl: Union[float, int] = None,
+                 max_memory: int = None):
+        """
+        :param max_entries: Max number of results to keep. The least recently used result is evicted first.
+        :param ttl: Number of milliseconds a result may be served for after it was cached. If None, results don't
+        expire.
+        :param max_memory: Max number of bytes the cached results may take up, as estimated by sys.getsizeof (which
+        doesn't include objects referenced by a result). If None, only "max_entries" bounds the cache.
+        """
+        if max_entries < 1:
+            raise ValueError("Result cache must hold at least 1 entry")
+        self._max_entries = max_entries
+        self._ttl = ttl / 1000 if ttl is not None else None  # From milliseconds to seconds
+        self._max_memory = max_memory
+        self._entries = OrderedDict()
+        self._memory = 0
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(args: tuple, kwargs: dict) -> Optional[Hashable]:
+        key = args + (_KWARGS_MARK, ) + tuple(sorted(kwargs.items())) if kwargs else args
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, args: tuple, kwargs: dict) -> Tuple[bool, Any]:
+        """
+        Look up the result of a call with the given arguments. Returns a tuple of whether there was a result and the
+        result itself.
+        """
+        key = self._key(args, kwargs)
+        if key is None:
+            return False, None
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return False, None
+            value, expires, size = entry
+            if expires is not None and expires <= monotonic():
+                del self._entries[key]
+                self._memory -= size
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(self, args: tuple, kwargs: dict, value: Any) -> None:
+        key = self._key(args, kwargs)
+        if key is None:
+            return
+        size = sys.getsizeof(value) if self._max_memory is not None else 0
+        if self._max_memory is not None and size > self._max_memory:
+            return
+        expires = monotonic() + self._ttl if self._ttl is not None else None
+        with self._lock:
+            previous = self._entries.pop(key, _MISSING)
+            if previous is not _MISSING:
+                self._memory -= previous[2]
+            self._entries[key] = (value, expires, size)
+            self._memory += size
+            while len(self._entries) > self._max_entries or (
+                    self._max_memory is not None and self._memory > self._max_memory):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._memory -= evicted_size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._memory = 0
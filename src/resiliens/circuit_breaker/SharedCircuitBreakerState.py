@@ -0,0 +1,217 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import mmap
+import os
+import struct
+from threading import Lock
+from time import monotonic
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not a POSIX system
+    fcntl = None
+
+from .CircuitBreakerState import CircuitBreakerState
+from .CircuitBreakerStatus import CircuitBreakerStatus
+from .SharedSlidingWindow import SharedSlidingWindow
+
+# Layout of the shared memory: a header, the integer fields, the time the
+# circuit breaker was opened and then the ring buffer of the sliding window.
+_HEADER = struct.Struct("<4sBBxxI")
+_MAGIC = b"RSCB"
+_VERSION = 1
+_STATUS_OFFSET = 5
+_INTS_OFFSET = 16
+_FAIL_COUNT = 0
+_HALF_OPEN_CALLS = 1
+_HALF_OPEN_SUCCESSES = 2
+_WINDOW_COUNTERS = 3  # Followed by the four counters of the sliding window
+_INT_COUNT = 7
+_OPENED_OFFSET = _INTS_OFFSET + 8 * _INT_COUNT
+_BUFFER_OFFSET = _OPENED_OFFSET + 8
+
+_STATUS_CODES = {
+    CircuitBreakerStatus.closed: 0,
+    CircuitBreakerStatus.open: 1,
+    CircuitBreakerStatus.half_open: 2
+}
+_STATUSES = {code: status for status, code in _STATUS_CODES.items()}
+
+
+class _ProcessLock:
+    """
+    Lock held by at most one thread of all processes. Record locks are held by a process as a whole, so the threads of
+    a process take turns through a regular lock first.
+    """
+
+    def __init__(self, fd: int):
+        self._fd = fd
+        self._lock = Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+        return False
+
+
+class _Segment:
+    __slots__ = ("fd", "memory", "window_length", "lock")
+
+    def __init__(self, fd: int, memory: mmap.mmap, window_length: int):
+        self.fd = fd
+        self.memory = memory
+        self.window_length = window_length
+        self.lock = _ProcessLock(fd)
+
+
+# Closing any descriptor of a file releases every record lock the process
+# holds on it, so each file is opened once per process and its segment shared.
+_segments: Dict[str, _Segment] = {}
+_segments_lock = Lock()
+
+
+def _after_fork_in_child() -> None:
+    # A thread of the parent may have held a lock while forking, and that
+    # thread doesn't exist in the child to release it.
+    global _segments_lock
+    _segments_lock = Lock()
+    for segment in _segments.values():
+        segment.lock = _ProcessLock(segment.fd)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _open_segment(path: str, window_length: int) -> _Segment:
+    path = os.path.realpath(path)
+    with _segments_lock:
+        segment = _segments.get(path)
+        if segment is None:
+            segment = _segments[path] = _map(path, window_length)
+    if segment.window_length != window_length:
+        raise ValueError(
+            f"Shared state at {path} has a sliding window of {segment.window_length} calls, not {window_length}")
+    return segment
+
+
+def _map(path: str, window_length: int) -> _Segment:
+    length = _BUFFER_OFFSET + window_length
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(fd).st_size
+            if size == 0:
+                os.ftruncate(fd, length)
+            memory = mmap.mmap(fd, max(size, length))
+            if size == 0:
+                memoryview(memory)[_OPENED_OFFSET:_BUFFER_OFFSET].cast("d")[0] = monotonic()
+                _HEADER.pack_into(memory, 0, _MAGIC, _VERSION, _STATUS_CODES[CircuitBreakerStatus.closed],
+                                  window_length)
+            magic, version, _, existing_window_length = _HEADER.unpack_from(memory, 0)
+            if magic != _MAGIC or version != _VERSION or size not in (0, _BUFFER_OFFSET + existing_window_length):
+                raise ValueError(f"{path} doesn't hold the shared state of a circuit breaker")
+            opened = memoryview(memory)[_OPENED_OFFSET:_BUFFER_OFFSET].cast("d")
+            if opened[0] > monotonic():
+                # Left behind before a reboot, when the monotonic clock started over
+                memory[_STATUS_OFFSET] = _STATUS_CODES[CircuitBreakerStatus.closed]
+                opened[0] = monotonic()
+            opened.release()
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+    except BaseException:
+        os.close(fd)
+        raise
+    return _Segment(fd, memory, existing_window_length)
+
+
+class SharedCircuitBreakerState(CircuitBreakerState):
+    """
+    Circuit breaker state kept in a memory-mapped file, so that every process on the host mapping the same file
+    shares a single circuit breaker. The status, the failure count, the half-open trial calls and the sliding window
+    are all shared, and the lock is held across processes, so transitions stay atomic no matter which process makes
+    them.
+
+    The time the circuit breaker was opened is taken from the monotonic clock, which all processes on a host share.
+    The last failure is an exception object and stays local to the process that saw it.
+
+    The file is created on first use and never removed, so that processes that come and go keep seeing the same state.
+    Mapping it before forking (e.g. with gunicorn's --preload) works as well as mapping it from every process.
+    """
+    _segment: _Segment
+    _ints: memoryview
+    _opened: memoryview
+    sliding_window: Optional[SharedSlidingWindow]
+    external = True
+
+    def __init__(self, path: str, window_length: int = 0):
+        """
+        :param path: Path of the file to keep the state in. Put it on a memory-backed file system such as /dev/shm.
+        :param window_length: Length of the shared sliding window, or 0 if the circuit breaker doesn't use one. Every
+        process sharing the file must use the same length.
+        """
+        if fcntl is None:
+            raise NotImplementedError("Shared circuit breaker state requires a POSIX system")
+        self._segment = _open_segment(path, window_length)
+        view = memoryview(self._segment.memory)
+        self._ints = view[_INTS_OFFSET:_OPENED_OFFSET].cast("q")
+        self._opened = view[_OPENED_OFFSET:_BUFFER_OFFSET].cast("d")
+        self.sliding_window = SharedSlidingWindow(
+            self._ints[_WINDOW_COUNTERS:], view[_BUFFER_OFFSET:_BUFFER_OFFSET + window_length]) \
+            if window_length else None
+        self.last_failure = None
+
+    @property
+    def lock(self) -> _ProcessLock:
+        return self._segment.lock
+
+    @property
+    def status(self):
+        return _STATUSES[self._segment.memory[_STATUS_OFFSET]]
+
+    @status.setter
+    def status(self, new_status: str):
+        if CircuitBreakerStatus.is_valid_status(new_status):
+            self._segment.memory[_STATUS_OFFSET] = _STATUS_CODES[new_status]
+
+    @property
+    def fail_count(self) -> int:
+        return self._ints[_FAIL_COUNT]
+
+    @fail_count.setter
+    def fail_count(self, value: int):
+        self._ints[_FAIL_COUNT] = value
+
+    @property
+    def half_open_calls(self) -> int:
+        return self._ints[_HALF_OPEN_CALLS]
+
+    @half_open_calls.setter
+    def half_open_calls(self, value: int):
+        self._ints[_HALF_OPEN_CALLS] = value
+
+    @property
+    def half_open_successes(self) -> int:
+        return self._ints[_HALF_OPEN_SUCCESSES]
+
+    @half_open_successes.setter
+    def half_open_successes(self, value: int):
+        self._ints[_HALF_OPEN_SUCCESSES] = value
+
+    @property
+    def opened(self) -> float:
+        return self._opened[0]
+
+    @opened.setter
+    def opened(self, value: float):
+        self._opened[0] = value
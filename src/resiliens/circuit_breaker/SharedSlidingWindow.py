@@ -0,0 +1,59 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from .SlidingWindow import SlidingWindow
+
+# Order of the counters in the shared memory
+_POSITION = 0
+_SIZE = 1
+_FAILURES = 2
+_SLOW_CALLS = 3
+
+
+class SharedSlidingWindow(SlidingWindow):
+    """
+    SlidingWindow whose ring buffer and counters live in shared memory, see SharedCircuitBreakerState. It doesn't lock
+    anything itself, so it must only be changed while holding the lock of the state it belongs to.
+    """
+    _counters: memoryview
+
+    def __init__(self, counters: memoryview, buffer: memoryview):
+        """
+        :param counters: View of four signed 64-bit integers holding the position, size, failures and slow calls.
+        :param buffer: View of the ring buffer, one byte per slot.
+        """
+        if len(buffer) < 1:
+            raise ValueError("Sliding window length must be at least 1")
+        self._counters = counters
+        self._buffer = buffer
+        self._window_length = len(buffer)
+
+    @property
+    def _position(self) -> int:
+        return self._counters[_POSITION]
+
+    @_position.setter
+    def _position(self, value: int):
+        self._counters[_POSITION] = value
+
+    @property
+    def _size(self) -> int:
+        return self._counters[_SIZE]
+
+    @_size.setter
+    def _size(self, value: int):
+        self._counters[_SIZE] = value
+
+    @property
+    def _failures(self) -> int:
+        return self._counters[_FAILURES]
+
+    @_failures.setter
+    def _failures(self, value: int):
+        self._counters[_FAILURES] = value
+
+    @property
+    def _slow_calls(self) -> int:
+        return self._counters[_SLOW_CALLS]
+
+    @_slow_calls.setter
+    def _slow_calls(self, value: int):
+        self._counters[_SLOW_CALLS] = value
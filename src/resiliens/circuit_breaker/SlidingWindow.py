@@ -1,19 +1,66 @@
 #  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
-from typing import List
+
+_FAILURE = 1
+_SLOW = 2
 
 
 class SlidingWindow:
-    _internal_list: List[bool]
+    """
+    Fixed-size ring buffer of the most recent results, one byte per slot holding a failure and a slow call flag. The
+    number of failures and slow calls in the window are kept up to date as results are added, so adding a result and
+    counting are all O(1).
+    """
+    _buffer: bytearray
     _window_length: int
+    _position: int
+    _size: int
+    _failures: int
+    _slow_calls: int
 
     def __init__(self, window_length: int):
-        self._internal_list = []
+        if window_length < 1:
+            raise ValueError("Sliding window length must be at least 1")
+        self._buffer = bytearray(window_length)
         self._window_length = window_length
+        self._position = 0
+        self._size = 0
+        self._failures = 0
+        self._slow_calls = 0
+
+    def clear(self):
+        self._position = 0
+        self._size = 0
+        self._failures = 0
+        self._slow_calls = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def window_length(self) -> int:
+        return self._window_length
+
+    def add(self, result: bool, slow: bool = False):
+        value = (0 if result else _FAILURE) | (_SLOW if slow else 0)
+        position = self._position
+        if self._size < self._window_length:
+            self._size += 1
+        else:
+            previous = self._buffer[position]
+            self._failures -= previous & _FAILURE
+            self._slow_calls -= previous >> 1
+        self._buffer[position] = value
+        self._failures += value & _FAILURE
+        self._slow_calls += value >> 1
+        position += 1
+        self._position = 0 if position == self._window_length else position
+
+    def get_failure_count(self) -> int:
+        return self._failures
 
-    def add(self, result: bool):
-        if len(self._internal_list) >= self._window_length:
-            self._internal_list.pop(0)
-        self._internal_list.append(result)
+    def get_slow_call_count(self) -> int:
+        return self._slow_calls
 
-    def get_failure_count(self):
-        return sum(map(lambda result: not result, self._internal_list))
+    def get_call_count(self) -> int:
+        return self._size
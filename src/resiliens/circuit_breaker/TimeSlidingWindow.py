@@ -0,0 +1,84 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from time import monotonic
+from typing import Callable, List
+
+
+class TimeSlidingWindow:
+    """
+    Sliding window over the results of the last N seconds. Calls, failures and slow calls are aggregated into one
+    bucket per second, so memory stays constant no matter how many calls are made, and totals are kept up to date
+    as buckets expire.
+    """
+    _window_seconds: int
+    _calls: List[int]
+    _failures: List[int]
+    _slow_calls: List[int]
+    _call_total: int
+    _failure_total: int
+    _slow_call_total: int
+    _second: int
+
+    def __init__(self,
+                 window_seconds: int,
+                 clock: Callable[[], float] = monotonic):
+        if window_seconds < 1:
+            raise ValueError("Sliding window must span at least 1 second")
+        self._window_seconds = window_seconds
+        self._clock = clock
+        self._calls = [0] * window_seconds
+        self._failures = [0] * window_seconds
+        self._slow_calls = [0] * window_seconds
+        self._call_total = 0
+        self._failure_total = 0
+        self._slow_call_total = 0
+        self._second = int(clock())
+
+    def _advance(self) -> int:
+        """
+        Expire the buckets of the seconds that have passed since the last call and return the current bucket.
+        """
+        now = int(self._clock())
+        elapsed = now - self._second
+        if elapsed > 0:
+            for second in range(self._second + 1,
+                                self._second + 1 + min(elapsed, self._window_seconds)):
+                index = second % self._window_seconds
+                self._call_total -= self._calls[index]
+                self._failure_total -= self._failures[index]
+                self._slow_call_total -= self._slow_calls[index]
+                self._calls[index] = 0
+                self._failures[index] = 0
+                self._slow_calls[index] = 0
+            self._second = now
+        return self._second % self._window_seconds
+
+    def clear(self):
+        self._calls = [0] * self._window_seconds
+        self._failures = [0] * self._window_seconds
+        self._slow_calls = [0] * self._window_seconds
+        self._call_total = 0
+        self._failure_total = 0
+        self._slow_call_total = 0
+
+    def add(self, result: bool, slow: bool = False):
+        index = self._advance()
+        self._calls[index] += 1
+        self._call_total += 1
+        if not result:
+            self._failures[index] += 1
+            self._failure_total += 1
+        if slow:
+            self._slow_calls[index] += 1
+            self._slow_call_total += 1
+
+    def get_failure_count(self) -> int:
+        self._advance()
+        return self._failure_total
+
+    def get_slow_call_count(self) -> int:
+        self._advance()
+        return self._slow_call_total
+
+    def get_call_count(self) -> int:
+        self._advance()
+        return self._call_total
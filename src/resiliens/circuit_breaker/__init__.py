@@ -1,4 +1,7 @@
 from .manager import CircuitBreakerManager
 from .CircuitBreaker import CircuitBreaker
 from .CircuitBreakerException import CircuitBreakerException
+from .KeyedCircuitBreaker import KeyedCircuitBreaker
 from .CircuitBreakerStatus import CircuitBreakerStatus
+from .ResultCache import ResultCache
+from .store import StateStore, InMemoryStateStore, TcpStateStore, TcpStateStoreServer
@@ -1,28 +1,153 @@
 #  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import warnings
+from threading import RLock
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Set
+from weakref import ref
+
+
+class _RegisteredCircuitBreakers:
+    """
+    Read-only mapping of the registered circuit breakers by name, as of when it is looked up. Kept for code that reads
+    CircuitBreakerManager.circuit_breakers, which used to be the registry itself.
+    """
+
+    def __get__(self, instance, owner) -> Mapping[str, Any]:
+        with owner._lock:
+            names = list(owner._circuit_breakers)
+            circuits = {name: owner._get(name) for name in names}
+        return MappingProxyType({name: circuit for name, circuit in circuits.items() if circuit is not None})
 
 
 class CircuitBreakerManager:
-    circuit_breakers = {}
+    """
+    Registry of every decorated circuit breaker, by name. It only holds weak references, so a circuit breaker is
+    dropped from it once nothing else uses it, e.g. when it decorated a function that was created on the fly.
+
+    Circuit breakers report every transition to and from the closed state, so the manager keeps an index of those that
+    aren't closed and answers all_closed() without looking at any circuit breaker, and get_open() by only looking at
+    those that aren't closed. Circuit breakers whose state is shared with other processes can change without any local
+    transition, so they are always looked at.
+
+    Registering a circuit breaker under a name that a different circuit breaker already has follows "name_collision":
+    WARN (the default) replaces the registered one and warns, REPLACE replaces it silently and RAISE raises a
+    ValueError.
+    """
+    WARN = "warn"
+    REPLACE = "replace"
+    RAISE = "raise"
+    name_collision: str = WARN
+
+    # Every mutation and every read of the indexes below happens while holding
+    # this lock. Circuit breakers report transitions while holding their own
+    # lock, so it must never be held while acquiring the lock of a circuit
+    # breaker, e.g. while forcing one open.
+    _lock = RLock()
+    _circuit_breakers: Dict[str, ref] = {}
+    _not_closed: Set[str] = set()
+    _external: Set[str] = set()
+    circuit_breakers = _RegisteredCircuitBreakers()
 
     @classmethod
-    def register(cls, circuit_breaker):
-        cls.circuit_breakers[circuit_breaker.name] = circuit_breaker
+    def register(cls, circuit_breaker) -> None:
+        name = circuit_breaker.name
+        with cls._lock:
+            registered = cls._get(name)
+            if registered is circuit_breaker:
+                return
+            if registered is not None:
+                if cls.name_collision == cls.RAISE:
+                    raise ValueError(f"A circuit breaker named \"{name}\" is already registered")
+                if cls.name_collision == cls.WARN:
+                    warnings.warn(
+                        f"Replacing the registered circuit breaker named \"{name}\" with another one of the same name",
+                        RuntimeWarning, stacklevel=4)
+            cls._circuit_breakers[name] = ref(circuit_breaker, lambda reference: cls._unregister(name, reference))
+            if circuit_breaker._state.external:
+                cls._external.add(name)
+            else:
+                cls._external.discard(name)
+            cls._index(name, circuit_breaker)
+
+    @classmethod
+    def unregister(cls, circuit_breaker) -> None:
+        with cls._lock:
+            reference = cls._circuit_breakers.get(circuit_breaker.name)
+            if reference is not None and reference() is circuit_breaker:
+                cls._unregister(circuit_breaker.name, reference)
+
+    @classmethod
+    def _unregister(cls, name: str, reference: ref) -> None:
+        with cls._lock:
+            # The name may have been taken over by another circuit breaker since
+            if cls._circuit_breakers.get(name) is reference:
+                del cls._circuit_breakers[name]
+                cls._not_closed.discard(name)
+                cls._external.discard(name)
+
+    @classmethod
+    def _get(cls, name: str):
+        reference = cls._circuit_breakers.get(name)
+        return reference() if reference is not None else None
+
+    @classmethod
+    def _index(cls, name: str, circuit_breaker) -> None:
+        if circuit_breaker.closed:
+            cls._not_closed.discard(name)
+        else:
+            cls._not_closed.add(name)
+
+    @classmethod
+    def status_changed(cls, circuit_breaker) -> None:
+        """
+        Called by a circuit breaker whenever it transitions to or from the closed state.
+        """
+        name = circuit_breaker.name
+        with cls._lock:
+            if cls._get(name) is circuit_breaker:
+                cls._index(name, circuit_breaker)
 
     @classmethod
     def all_closed(cls) -> bool:
-        return len(list(cls.get_open())) == 0
+        with cls._lock:
+            if cls._not_closed:
+                return False
+            external = cls._circuits(cls._external)
+        return all(circuit.closed for circuit in external)
 
     @classmethod
-    def get_circuits(cls):
-        return cls.circuit_breakers.values()
+    def get_circuits(cls) -> List:
+        with cls._lock:
+            return cls._circuits(cls._circuit_breakers)
+
+    @classmethod
+    def _circuits(cls, names) -> List:
+        # Copied first, as a circuit breaker being garbage collected meanwhile
+        # unregisters itself.
+        circuits = [cls._get(name) for name in list(names)]
+        return [circuit for circuit in circuits if circuit is not None]
 
     @classmethod
     def get(cls, name: str):
-        return cls.circuit_breakers.get(name)
+        with cls._lock:
+            return cls._get(name)
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        """
+        Snapshot of the metrics of every circuit breaker that keeps metrics, by name.
+        """
+        return {
+            circuit.name: circuit.metrics.snapshot()
+            for circuit in cls.get_circuits()
+            if circuit.metrics is not None
+        }
 
     @classmethod
     def get_open(cls):
-        for circuit in cls.get_circuits():
+        with cls._lock:
+            candidates = cls._circuits(cls._not_closed | cls._external)
+        for circuit in candidates:
             if circuit.opened:
                 yield circuit
 
@@ -34,20 +159,20 @@ class CircuitBreakerManager:
 
     @classmethod
     def force_open(cls, name: str) -> None:
-        circuit_breaker = cls.circuit_breakers.get(name)
+        circuit_breaker = cls.get(name)
         circuit_breaker.force_open()
 
     @classmethod
     def force_reset(cls, name: str) -> None:
-        circuit_breaker = cls.circuit_breakers.get(name)
+        circuit_breaker = cls.get(name)
         circuit_breaker.force_reset()
 
     @classmethod
     def force_all_open(cls) -> None:
-        for circuit_breaker in cls.circuit_breakers.values():
+        for circuit_breaker in cls.get_circuits():
             circuit_breaker.force_open()
 
     @classmethod
     def force_all_reset(cls) -> None:
-        for circuit_breaker in cls.circuit_breakers.values():
+        for circuit_breaker in cls.get_circuits():
             circuit_breaker.force_reset()
@@ -0,0 +1,53 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from threading import Lock
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+from .StateStore import RemoteState, StateStore, StateUpdate
+
+
+class _Entry:
+    __slots__ = ("opened_at", "nodes")
+
+    def __init__(self):
+        self.opened_at: Optional[float] = None
+        # Latest successes and failures of every node, with when they were received
+        self.nodes: Dict[str, Tuple[int, int, float]] = {}
+
+
+class InMemoryStateStore(StateStore):
+    """
+    State store kept in the memory of this process, e.g. for TcpStateStoreServer to serve to other processes. It is also
+    the reference for how a store merges updates: the latest opening of any node wins, and the outcomes of the fleet
+    are the sum of the latest update of every node that has synced recently.
+    """
+    _node_ttl: float
+
+    def __init__(self, sync_interval: int = 1000, node_ttl: int = 5000):
+        """
+        :param sync_interval: Number of milliseconds between two syncs of the registered circuit breakers.
+        :param node_ttl: Number of milliseconds after which the outcomes of a node that has stopped syncing are no
+        longer part of the state of the fleet.
+        """
+        super().__init__(sync_interval=sync_interval)
+        self._node_ttl = node_ttl / 1000  # From milliseconds to seconds
+        self._entries: Dict[str, _Entry] = {}
+        self._entries_lock = Lock()
+
+    def sync(self, name: str, update: StateUpdate) -> RemoteState:
+        now = monotonic()
+        with self._entries_lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = _Entry()
+            if update.opened_at is not None and (entry.opened_at is None or update.opened_at > entry.opened_at):
+                entry.opened_at = update.opened_at
+            entry.nodes[update.node] = (update.successes, update.failures, now)
+            successes = failures = 0
+            for node, (node_successes, node_failures, received) in list(entry.nodes.items()):
+                if received + self._node_ttl < now:
+                    del entry.nodes[node]
+                    continue
+                successes += node_successes
+                failures += node_failures
+            return RemoteState(successes=successes, failures=failures, opened_at=entry.opened_at)
@@ -0,0 +1,178 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import logging
+import os
+import socket
+from abc import ABC, abstractmethod
+from itertools import count
+from threading import Event, Lock, Thread
+from typing import NamedTuple, Optional, Tuple
+from weakref import WeakSet
+
+_logger = logging.getLogger(__name__)
+
+
+class StateUpdate(NamedTuple):
+    # Identifies the process the update comes from, so that the store can
+    # replace its previous update rather than adding to it.
+    node: str
+    # Outcomes of the calls made since the previous update
+    successes: int
+    failures: int
+    # Wall-clock time the circuit breaker last opened on this node, if it has
+    # opened since the previous update.
+    opened_at: Optional[float]
+
+
+class RemoteState(NamedTuple):
+    # Outcomes of the calls made across the fleet in the latest update of
+    # every node
+    successes: int
+    failures: int
+    # Wall-clock time the circuit breaker last opened on any node
+    opened_at: Optional[float]
+
+
+class OutcomeCounter:
+    """
+    Counts the successes and failures of calls between two syncs without taking a lock. A step of itertools.count is
+    atomic, so increments from any number of threads are never lost.
+    """
+
+    def __init__(self):
+        self._successes = count()
+        self._failures = count()
+        self._taken_successes = 0
+        self._taken_failures = 0
+
+    def add(self, success: bool) -> None:
+        next(self._successes if success else self._failures)
+
+    def take(self) -> Tuple[int, int]:
+        """
+        Return the number of successes and failures counted since the previous call and start over. Only one thread
+        may take at a time.
+        """
+        # Reading steps the counters as well, which the next take accounts for
+        successes = next(self._successes)
+        failures = next(self._failures)
+        taken = (successes - self._taken_successes, failures - self._taken_failures)
+        self._taken_successes = successes + 1
+        self._taken_failures = failures + 1
+        return taken
+
+    def give_back(self, successes: int, failures: int) -> None:
+        """
+        Count the successes and failures of a previous take() again, e.g. when they couldn't be sent. Only the thread
+        that takes may give back.
+        """
+        self._taken_successes -= successes
+        self._taken_failures -= failures
+
+
+def node_id() -> str:
+    """
+    Identifier of this process across the fleet. Read anew on every sync, as forked workers get their own.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class StateStore(ABC):
+    """
+    Store of circuit breaker state shared by every node of a fleet. Circuit breakers keep making every decision
+    locally, so a call never waits for the store. Instead, a background thread syncs each registered circuit breaker
+    with the store on an interval: it sends the outcomes counted locally since the previous sync and any time it
+    opened, and merges the state of the fleet it gets back into the local state.
+
+    Circuit breakers are matched by name, so they must have the same name on every node.
+
+    Subclasses implement sync() against whatever backs the store.
+    """
+    _instances = WeakSet()
+
+    def __init__(self, sync_interval: int = 1000):
+        """
+        :param sync_interval: Number of milliseconds between two syncs of the registered circuit breakers.
+        """
+        self._sync_interval = sync_interval / 1000  # From milliseconds to seconds
+        # Weakly referenced, so that a circuit breaker nothing else uses any
+        # longer, e.g. one decorating a function created on the fly, stops
+        # syncing.
+        self._circuit_breakers = WeakSet()
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread: Optional[Thread] = None
+        StateStore._instances.add(self)
+
+    @abstractmethod
+    def sync(self, name: str, update: StateUpdate) -> RemoteState:
+        """
+        Add the update of a node to the state of the circuit breaker with the given name, and return the state of the
+        fleet.
+        """
+
+    def register(self, circuit_breaker) -> None:
+        """
+        Sync the given circuit breaker with the store from now on. Starts the background thread if needed.
+        """
+        with self._lock:
+            self._circuit_breakers.add(circuit_breaker)
+            self._start()
+
+    def sync_all(self) -> None:
+        """
+        Sync every registered circuit breaker with the store once. A circuit breaker that fails to sync keeps going on
+        its local state, and sends what it couldn't with the next sync. Failures other than the store being unreachable
+        are logged as warnings.
+        """
+        with self._lock:
+            circuit_breakers = list(self._circuit_breakers)
+        for circuit_breaker in circuit_breakers:
+            update = circuit_breaker._take_state_update(node_id())
+            try:
+                remote = self.sync(circuit_breaker.name, update)
+            except OSError:
+                circuit_breaker._state_update_failed(update)
+                continue
+            except Exception:
+                circuit_breaker._state_update_failed(update)
+                _logger.warning("Failed to sync circuit breaker \"%s\" with %s", circuit_breaker.name,
+                                type(self).__name__, exc_info=True)
+                continue
+            circuit_breaker._merge_remote_state(remote)
+
+    def close(self) -> None:
+        """
+        Stop syncing in the background.
+        """
+        self._stopped.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _start(self) -> None:
+        if self._thread is None and not self._stopped.is_set():
+            self._thread = Thread(target=self._run,
+                                  name=f"resiliens-{type(self).__name__}",
+                                  daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._sync_interval):
+            self.sync_all()
+
+    def _after_fork_in_child(self) -> None:
+        self._lock = Lock()
+        self._thread = None
+        if self._circuit_breakers:
+            self._start()
+
+
+def _after_fork_in_child() -> None:
+    # Threads don't survive a fork, so workers forked after circuit breakers
+    # were registered need a sync thread of their own.
+    for store in list(StateStore._instances):
+        store._after_fork_in_child()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
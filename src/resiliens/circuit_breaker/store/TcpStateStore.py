@@ -0,0 +1,73 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import json
+import socket
+from threading import Lock
+from typing import Optional
+
+from .StateStore import RemoteState, StateStore, StateUpdate
+
+
+class TcpStateStore(StateStore):
+    """
+    State store served by a TcpStateStoreServer. Every sync is a single line of JSON sent over a connection that is
+    kept open, and reopened on the next sync if it breaks.
+    """
+    _address: tuple
+    _timeout: float
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 7878,
+                 sync_interval: int = 1000,
+                 timeout: int = 1000):
+        """
+        :param host: Host the server listens on.
+        :param port: Port the server listens on.
+        :param sync_interval: Number of milliseconds between two syncs of the registered circuit breakers.
+        :param timeout: Number of milliseconds to wait for the server to connect or answer before a sync fails.
+        """
+        super().__init__(sync_interval=sync_interval)
+        self._address = (host, port)
+        self._timeout = timeout / 1000  # From milliseconds to seconds
+        self._connection: Optional[socket.socket] = None
+        self._reader = None
+        self._connection_lock = Lock()
+
+    def sync(self, name: str, update: StateUpdate) -> RemoteState:
+        request = json.dumps({"name": name, **update._asdict()}) + "\n"
+        with self._connection_lock:
+            try:
+                if self._connection is None:
+                    self._connection = socket.create_connection(self._address, timeout=self._timeout)
+                    self._reader = self._connection.makefile("r", encoding="utf-8")
+                self._connection.sendall(request.encode("utf-8"))
+                response = self._reader.readline()
+                if not response:
+                    raise ConnectionError("State store server closed the connection")
+            except BaseException:
+                self._disconnect()
+                raise
+        return RemoteState(**json.loads(response))
+
+    def close(self) -> None:
+        super().close()
+        with self._connection_lock:
+            self._disconnect()
+
+    def _after_fork_in_child(self) -> None:
+        # The connection is shared with the parent, whose requests and
+        # responses would interleave with the child's on the same stream. It is
+        # only let go of, as closing it here could affect the parent's copy.
+        if self._connection is not None:
+            self._connection.detach()
+        self._connection = None
+        self._reader = None
+        self._connection_lock = Lock()
+        super()._after_fork_in_child()
+
+    def _disconnect(self) -> None:
+        if self._connection is not None:
+            self._reader.close()
+            self._connection.close()
+            self._connection = None
+            self._reader = None
@@ -0,0 +1,62 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import json
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from threading import Thread
+from typing import Optional
+
+from .InMemoryStateStore import InMemoryStateStore
+from .StateStore import StateStore, StateUpdate
+
+
+class _Handler(StreamRequestHandler):
+
+    def handle(self):
+        store: StateStore = self.server.store
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                name = request.pop("name")
+                remote = store.sync(name, StateUpdate(**request))
+            except (ValueError, TypeError, KeyError):
+                # Not a request we understand, so drop the connection
+                return
+            self.wfile.write((json.dumps(remote._asdict()) + "\n").encode("utf-8"))
+
+
+class TcpStateStoreServer(ThreadingTCPServer):
+    """
+    Serves a state store to TcpStateStore clients over TCP, one line of JSON per sync. Meant as a stand-in for a
+    shared store such as a database, e.g. in tests or on a single host.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    store: StateStore
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 7878, store: StateStore = None):
+        """
+        :param host: Host to listen on.
+        :param port: Port to listen on. Pass 0 to pick a free port, see the "port" property.
+        :param store: The store to serve. Defaults to a new InMemoryStateStore.
+        """
+        super().__init__((host, port), _Handler)
+        self.store = store if store is not None else InMemoryStateStore()
+        self._thread: Optional[Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "TcpStateStoreServer":
+        """
+        Serve in a background thread.
+        """
+        self._thread = Thread(target=self.serve_forever, name="resiliens-TcpStateStoreServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
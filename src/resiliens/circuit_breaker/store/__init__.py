@@ -0,0 +1,4 @@
+from .StateStore import StateStore, StateUpdate, RemoteState
+from .InMemoryStateStore import InMemoryStateStore
+from .TcpStateStore import TcpStateStore
+from .TcpStateStoreServer import TcpStateStoreServer
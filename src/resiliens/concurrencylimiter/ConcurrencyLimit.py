@@ -0,0 +1,141 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from abc import ABC, abstractmethod
+from typing import Union
+
+
+class ConcurrencyLimit(ABC):
+    """
+    Base class of limit algorithms, which decide how many concurrent calls ConcurrencyLimiter allows. Unlike backoff
+    strategies, limits are stateful and learn from every call, so each limiter needs a limit of its own. The limiter
+    holds its lock while calling update, so a limit needs no locking of its own.
+    """
+
+    @property
+    @abstractmethod
+    def limit(self) -> int:
+        """
+        Number of concurrent calls currently allowed.
+        """
+
+    @abstractmethod
+    def update(self, duration: float, in_flight: int, failed: bool) -> None:
+        """
+        :param duration: Duration of the call in seconds.
+        :param in_flight: Number of calls in flight when the call started, including itself.
+        :param failed: Whether the call failed with an expected exception.
+        """
+
+
+class AIMDLimit(ConcurrencyLimit):
+    """
+    Additive increase, multiplicative decrease, like TCP congestion control: the limit grows by 1 for every successful
+    call made while at least half of it was in use, and shrinks by "backoff_ratio" for every failed call, or call that
+    took longer than "timeout".
+    """
+
+    def __init__(self,
+                 initial_limit: int = 20,
+                 min_limit: int = 1,
+                 max_limit: int = 200,
+                 backoff_ratio: float = 0.9,
+                 timeout: Union[int, float] = None):
+        """
+        :param initial_limit: Limit to start out with.
+        :param min_limit: The limit never shrinks below this.
+        :param max_limit: The limit never grows beyond this.
+        :param backoff_ratio: Ratio to multiply the limit with on every failed call.
+        :param timeout: Number of milliseconds after which a successful call counts as failed. If None, only failed
+        calls shrink the limit.
+        """
+        if not 0 < backoff_ratio < 1:
+            raise ValueError("Backoff ratio must be between 0 and 1")
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial_limit <= max_limit")
+        self._limit = initial_limit
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._backoff_ratio = backoff_ratio
+        self._timeout = timeout / 1000 if timeout is not None else None  # From milliseconds to seconds
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def update(self, duration: float, in_flight: int, failed: bool) -> None:
+        limit = self._limit
+        if failed or (self._timeout is not None and duration > self._timeout):
+            limit *= self._backoff_ratio
+        elif in_flight * 2 >= limit:
+            limit += 1
+        else:
+            # The limit isn't in use, so the call says nothing about whether it could be higher
+            return
+        self._limit = min(self._max_limit, max(self._min_limit, limit))
+
+
+class GradientLimit(ConcurrencyLimit):
+    """
+    Adjusts the limit by the gradient of the latency, in the spirit of TCP Vegas: the latency of every call is
+    compared to the long-term average. While calls are about as fast as usual, the limit grows by "queue_size". Once
+    calls queue up in the dependency and slow down, the limit shrinks in proportion, by up to half. Failed calls shrink
+    it by half as well, and don't count towards the average.
+
+    The long-term average slowly drifts down when the latency stays far below it, so that it recovers after an outage.
+    """
+
+    def __init__(self,
+                 initial_limit: int = 20,
+                 min_limit: int = 1,
+                 max_limit: int = 200,
+                 smoothing: float = 0.2,
+                 tolerance: float = 1.5,
+                 queue_size: int = 4,
+                 long_window: int = 600):
+        """
+        :param initial_limit: Limit to start out with.
+        :param min_limit: The limit never shrinks below this.
+        :param max_limit: The limit never grows beyond this.
+        :param smoothing: How much of each new limit to take on, from 0 (none) to 1 (all of it).
+        :param tolerance: How much slower than the long-term average calls may be before the limit shrinks, e.g. 1.5
+        for 50% slower.
+        :param queue_size: Number of calls the limit grows by while calls are as fast as usual.
+        :param long_window: Number of calls the long-term average latency is taken over.
+        """
+        if not 0 < smoothing <= 1:
+            raise ValueError("Smoothing must be greater than 0 and at most 1")
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial_limit <= max_limit")
+        self._limit = initial_limit
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._smoothing = smoothing
+        self._tolerance = tolerance
+        self._queue_size = queue_size
+        self._long_factor = 2 / (long_window + 1)
+        self._long_latency = None
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def update(self, duration: float, in_flight: int, failed: bool) -> None:
+        limit = self._limit
+        if failed:
+            gradient = 0.5
+        else:
+            latency = max(duration, 1e-9)
+            long_latency = self._long_latency
+            if long_latency is None:
+                long_latency = latency
+            else:
+                long_latency += (latency - long_latency) * self._long_factor
+                if long_latency > 2 * latency:
+                    long_latency *= 0.95
+            self._long_latency = long_latency
+            if in_flight * 2 < limit:
+                # The limit isn't in use, so the call says nothing about whether it could be higher
+                return
+            gradient = max(0.5, min(1.0, self._tolerance * long_latency / latency))
+        new_limit = limit * gradient + self._queue_size
+        limit = limit * (1 - self._smoothing) + new_limit * self._smoothing
+        self._limit = min(self._max_limit, max(self._min_limit, limit))
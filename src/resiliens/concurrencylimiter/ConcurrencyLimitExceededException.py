@@ -0,0 +1,12 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+
+
+class ConcurrencyLimitExceededException(Exception):
+
+    def __init__(self, concurrency_limiter, *args):
+        super(ConcurrencyLimitExceededException, self).__init__(*args)
+        self._concurrency_limiter = concurrency_limiter
+
+    def __str__(self, *args, **kwargs):
+        return f"[Concurrency limiter: {self._concurrency_limiter.name}] Reached the limit of" \
+               f" {self._concurrency_limiter.limit} concurrent calls"
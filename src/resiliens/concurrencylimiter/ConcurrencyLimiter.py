@@ -0,0 +1,243 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from asyncio import CancelledError
+from functools import wraps
+from inspect import isgeneratorfunction, iscoroutinefunction, isasyncgenfunction
+from threading import Lock
+from time import monotonic
+from typing import Callable, Type, Optional, Any
+
+from .ConcurrencyLimit import ConcurrencyLimit, AIMDLimit
+from .ConcurrencyLimitExceededException import ConcurrencyLimitExceededException
+from ..metrics.Metrics import Metrics
+from ..utils.Awaitables import await_if_needed, iterate_async
+
+
+class ConcurrencyLimiterClass:
+    """
+    Limits the number of concurrent calls to the decorated function like a bulkhead, except that the limit adapts to
+    how the dependency copes, as decided by a ConcurrencyLimit learning from the duration and outcome of every call.
+    Outcomes are told apart like a circuit breaker does: exceptions of "expected_exception" are failures, cancelled
+    calls are ignored and anything else is a success.
+
+    Calls beyond the limit are rejected right away rather than made to wait, as waiting would only add the latency the
+    limit is there to avoid. Threads and event loops share one count of calls in flight, kept under a lock that is
+    never held while calling the decorated function.
+    """
+    _limit: ConcurrencyLimit
+    _expected_exception: Type[BaseException]
+    _fallback_function: Callable
+    _fallback_function_with_exception: Callable
+    _in_flight: int
+    _metrics: Optional[Metrics]
+
+    def __init__(self,
+                 limit: ConcurrencyLimit = None,
+                 expected_exception: Type[BaseException] = Exception,
+                 name: str = None,
+                 fallback_function: Callable = None,
+                 fallback_function_with_exception: Callable = None,
+                 metrics: bool = False):
+        """
+        :param limit: The ConcurrencyLimit deciding the number of concurrent calls allowed, e.g. GradientLimit().
+        Defaults to AIMDLimit().
+        :param expected_exception: Exceptions that count as failed calls and shrink the limit. Any other exception
+        counts as a successful call.
+        :param name: Name of the concurrency limiter instance, defaults to the name of the decorated function.
+        :param fallback_function: A function to use as fallback if a call is rejected.
+        :param fallback_function_with_exception: A function to use as fallback if a call is rejected. The first
+        argument supplied to it will be the ConcurrencyLimitExceededException (i.e. fallback_exception(exception,
+        *args, **kwargs))
+        :param metrics: Whether to count calls, rejections and their durations. Off by default.
+        """
+        self._limit = limit if limit is not None else AIMDLimit()
+        self._expected_exception = expected_exception
+        self._name = name
+        self._fallback_function = fallback_function
+        self._fallback_function_with_exception = fallback_function_with_exception
+        self._lock = Lock()
+        self._in_flight = 0
+        self._metrics = Metrics(name, "concurrency_limiter") if metrics else None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def limit(self) -> int:
+        """
+        Number of concurrent calls currently allowed.
+        """
+        return self._limit.limit
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of calls currently running.
+        """
+        return self._in_flight
+
+    @property
+    def metrics(self) -> Optional[Metrics]:
+        return self._metrics
+
+    def __call__(self, decorated_function):
+        return self.decorate(decorated_function)
+
+    def decorate(self, function_to_decorate: Callable) -> Callable:
+        if self._name is None:
+            self._name = function_to_decorate.__name__
+            if self._metrics is not None:
+                self._metrics.name = self._name
+
+        if iscoroutinefunction(function_to_decorate):
+            return self._decorate_coroutine(function_to_decorate)
+        if isasyncgenfunction(function_to_decorate):
+            return self._decorate_async_generator(function_to_decorate)
+        if isgeneratorfunction(function_to_decorate):
+            return self._decorate_generator(function_to_decorate)
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            in_flight = self._acquire()
+            if in_flight is None:
+                return self._handle_rejected_call(*args, **kwargs)
+            start = monotonic()
+            try:
+                result = function_to_decorate(*args, **kwargs)
+            except BaseException as e:
+                self._record(type(e), monotonic() - start, in_flight)
+                raise
+            self._record(None, monotonic() - start, in_flight)
+            return result
+
+        return wrapper
+
+    def _decorate_generator(self, function_to_decorate: Callable) -> Callable:
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            in_flight = self._acquire()
+            if in_flight is None:
+                for el in self._handle_rejected_call(*args, **kwargs):
+                    yield el
+                return
+            start = monotonic()
+            try:
+                for el in function_to_decorate(*args, **kwargs):
+                    yield el
+            except BaseException as e:
+                self._record(type(e), monotonic() - start, in_flight)
+                raise
+            self._record(None, monotonic() - start, in_flight)
+
+        return wrapper
+
+    def _decorate_coroutine(self, function_to_decorate: Callable) -> Callable:
+
+        @wraps(function_to_decorate)
+        async def wrapper(*args, **kwargs):
+            in_flight = self._acquire()
+            if in_flight is None:
+                return await await_if_needed(
+                    self._handle_rejected_call(*args, **kwargs))
+            start = monotonic()
+            try:
+                result = await function_to_decorate(*args, **kwargs)
+            except BaseException as e:
+                self._record(type(e), monotonic() - start, in_flight)
+                raise
+            self._record(None, monotonic() - start, in_flight)
+            return result
+
+        return wrapper
+
+    def _decorate_async_generator(self,
+                                  function_to_decorate: Callable) -> Callable:
+
+        @wraps(function_to_decorate)
+        async def wrapper(*args, **kwargs):
+            in_flight = self._acquire()
+            if in_flight is None:
+                results = self._handle_rejected_call(*args, **kwargs)
+                async for el in iterate_async(results):
+                    yield el
+                return
+            start = monotonic()
+            try:
+                async for el in function_to_decorate(*args, **kwargs):
+                    yield el
+            except BaseException as e:
+                self._record(type(e), monotonic() - start, in_flight)
+                raise
+            self._record(None, monotonic() - start, in_flight)
+
+        return wrapper
+
+    def _acquire(self) -> Optional[int]:
+        """
+        Number of calls in flight including this one, or None if the call is rejected.
+        """
+        with self._lock:
+            in_flight = self._in_flight + 1
+            if in_flight > self._limit.limit:
+                in_flight = None
+            else:
+                self._in_flight = in_flight
+        if in_flight is None and self._metrics is not None:
+            self._metrics.record_rejection()
+        return in_flight
+
+    def _record(self, exception_type: Optional[Type[BaseException]], duration: float, in_flight: int) -> None:
+        if exception_type is not None and issubclass(exception_type, CancelledError):
+            # A cancelled call tells us nothing about how the dependency copes
+            with self._lock:
+                self._in_flight -= 1
+            return
+        failed = exception_type is not None and issubclass(exception_type, self._expected_exception)
+        with self._lock:
+            self._in_flight -= 1
+            self._limit.update(duration, in_flight, failed)
+        if self._metrics is not None:
+            if failed:
+                self._metrics.record_failure(duration)
+            else:
+                self._metrics.record_success(duration)
+
+    def _handle_rejected_call(self, *args, **kwargs) -> Any:
+        if self._fallback_function:
+            return self._fallback_function(*args, **kwargs)
+        exception = ConcurrencyLimitExceededException(self)
+        if self._fallback_function_with_exception:
+            return self._fallback_function_with_exception(exception, *args, **kwargs)
+        raise exception
+
+
+def ConcurrencyLimiter(limit: ConcurrencyLimit = None,
+                       expected_exception: Type[BaseException] = Exception,
+                       name: str = None,
+                       fallback: Callable = None,
+                       fallback_exception: Callable = None,
+                       metrics: bool = False):
+    """
+    :param limit: The ConcurrencyLimit deciding the number of concurrent calls allowed, e.g. GradientLimit(). Defaults
+    to AIMDLimit(). Calls beyond the limit are rejected right away.
+    :param expected_exception: Exceptions that count as failed calls and shrink the limit. Any other exception counts
+    as a successful call.
+    :param name: Name of the concurrency limiter instance, defaults to the name of the decorated function.
+    :param fallback: A function to use as fallback if a call is rejected.
+    :param fallback_exception: A function to use as fallback if a call is rejected. The first argument supplied to
+    it will be the ConcurrencyLimitExceededException (i.e. fallback_exception(exception, *args, **kwargs))
+    :param metrics: Whether to count calls, rejections and their durations. Off by default.
+    """
+
+    # To be able to use decorator without parentheses
+    # if no arguments are provided.
+    if callable(limit):
+        return ConcurrencyLimiterClass().decorate(limit)
+    else:
+        return ConcurrencyLimiterClass(limit=limit,
+                                       expected_exception=expected_exception,
+                                       name=name,
+                                       fallback_function=fallback,
+                                       fallback_function_with_exception=fallback_exception,
+                                       metrics=metrics)
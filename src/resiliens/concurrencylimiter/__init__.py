@@ -0,0 +1,4 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from .ConcurrencyLimiter import ConcurrencyLimiter
+from .ConcurrencyLimit import ConcurrencyLimit, AIMDLimit, GradientLimit
+from .ConcurrencyLimitExceededException import ConcurrencyLimitExceededException
@@ -0,0 +1,253 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+from collections import deque
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from functools import partial, wraps
+from inspect import isgeneratorfunction, iscoroutinefunction, isasyncgenfunction
+from math import ceil
+from threading import Lock
+from time import monotonic
+from typing import Callable, Union, Optional
+
+from ..utils.Executors import new_executor
+
+
+class HedgeClass:
+    """
+    Fires another attempt of a call if the previous attempts haven't returned after a delay, returns the result of
+    whichever attempt succeeds first and cancels the rest. An attempt that fails doesn't cause another attempt, that
+    is what Retryable is for, but the call only fails once all attempts it has made have failed.
+
+    Coroutine attempts are cancelled with Task.cancel(). Regular functions run in an executor, where only attempts
+    that haven't started yet can be cancelled. The others run to completion and their results are discarded.
+
+    Unless an executor is given, every hedge runs attempts in a thread pool of its own with at most "max_workers"
+    threads, so that attempts that hang only hold up the calls of the same hedge.
+    """
+    _delay: float
+    _max_hedges: int
+    _delay_percentile: Optional[float]
+    _max_hedge_ratio: float
+    _executor: Executor
+
+    # Number of call durations the delay percentile is computed from, and the
+    # minimum needed before it is used instead of the fixed delay.
+    _SAMPLE_SIZE: int = 100
+    _MIN_SAMPLES: int = 20
+    # How many calls may reuse a computed percentile before it is recomputed
+    _RECOMPUTE_INTERVAL: int = 10
+
+    def __init__(self,
+                 delay: Union[float, int] = 100,
+                 max_hedges: int = 1,
+                 delay_percentile: float = None,
+                 max_hedge_ratio: float = 0.1,
+                 executor: Executor = None,
+                 name: str = None,
+                 max_workers: int = 10):
+        """
+        :param delay: Number of milliseconds to wait for an attempt before firing another one.
+        :param max_hedges: Max number of extra attempts per call.
+        :param delay_percentile: If set (e.g. 95), the delay is the given percentile of the durations of the most recent
+        first attempts, successful or not, instead of the fixed "delay", which is only used until enough calls have
+        been made.
+        :param max_hedge_ratio: Max number of extra attempts as a share of all calls, so that hedging can't multiply
+        the load on a dependency that is slow across the board. Default is 0.1, i.e. one extra attempt per ten calls.
+        :param executor: Executor to run attempts of regular (non-async) functions in. Defaults to a thread pool of the
+        hedge's own.
+        :param name: Name of the hedge instance, defaults to the name of the decorated function.
+        :param max_workers: Max number of threads of the hedge's own thread pool. A call takes up to "max_hedges" + 1
+        of them, and an attempt that lost keeps its thread until it returns, so size it to the concurrent calls
+        expected times the attempts they make. Ignored if an executor is given.
+        """
+        if max_hedges < 1:
+            raise ValueError("Hedge must allow at least 1 extra attempt")
+        if max_workers < 1:
+            raise ValueError("Hedge must allow at least 1 worker")
+        self._delay = delay / 1000  # From milliseconds to seconds
+        self._max_hedges = max_hedges
+        self._delay_percentile = delay_percentile
+        self._max_hedge_ratio = max_hedge_ratio
+        self._executor = executor if executor is not None else new_executor(max_workers, "hedge")
+        self._name = name
+        self._lock = Lock()
+        # Allow a single extra attempt right away, later ones are earned by calls
+        self._hedge_tokens = 1.0
+        self._durations = deque(maxlen=self._SAMPLE_SIZE)
+        self._percentile_delay = None
+        self._calls_since_recompute = 0
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def delay(self) -> float:
+        """
+        The current delay in milliseconds before another attempt is fired.
+        """
+        return self._current_delay() * 1000
+
+    def __call__(self, decorated_function):
+        return self.decorate(decorated_function)
+
+    def decorate(self, function_to_decorate: Callable) -> Callable:
+        if self._name is None:
+            self._name = function_to_decorate.__name__
+
+        if isgeneratorfunction(function_to_decorate) or isasyncgenfunction(
+                function_to_decorate):
+            raise TypeError("Hedge can't be used on generator functions")
+
+        if iscoroutinefunction(function_to_decorate):
+
+            @wraps(function_to_decorate)
+            async def async_wrapper(*args, **kwargs):
+                return await self.call_async(function_to_decorate, *args,
+                                             **kwargs)
+
+            return async_wrapper
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            return self.call(function_to_decorate, *args, **kwargs)
+
+        return wrapper
+
+    def call(self, func, *args, **kwargs):
+        executor = self._executor
+        start = monotonic()
+        futures = [executor.submit(func, *args, **kwargs)]
+        if self._delay_percentile is not None:
+            futures[0].add_done_callback(partial(self._first_attempt_done, start))
+        hedges = self._max_hedges
+        delay = self._current_delay()
+        last_failure = None
+        try:
+            while futures:
+                done, _ = wait(futures,
+                               timeout=delay if hedges > 0 else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    futures.remove(future)
+                    if future.exception() is None:
+                        self._succeeded()
+                        return future.result()
+                    last_failure = future.exception()
+                if not done:
+                    if self._may_hedge():
+                        hedges -= 1
+                        futures.append(executor.submit(func, *args, **kwargs))
+                    else:
+                        hedges = 0
+            raise last_failure
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def call_async(self, func, *args, **kwargs):
+        start = monotonic()
+        tasks = [asyncio.ensure_future(func(*args, **kwargs))]
+        if self._delay_percentile is not None:
+            tasks[0].add_done_callback(partial(self._first_attempt_done, start))
+        hedges = self._max_hedges
+        delay = self._current_delay()
+        last_failure = None
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks,
+                    timeout=delay if hedges > 0 else None,
+                    return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        self._succeeded()
+                        return task.result()
+                    last_failure = task.exception()
+                if not done:
+                    if self._may_hedge():
+                        hedges -= 1
+                        tasks.append(
+                            asyncio.ensure_future(func(*args, **kwargs)))
+                    else:
+                        hedges = 0
+            raise last_failure
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self._hedge_tokens < 1:
+                return False
+            self._hedge_tokens -= 1
+            return True
+
+    def _current_delay(self) -> float:
+        if self._percentile_delay is not None:
+            return self._percentile_delay
+        return self._delay
+
+    def _succeeded(self) -> None:
+        with self._lock:
+            self._hedge_tokens = min(self._hedge_tokens + self._max_hedge_ratio,
+                                     self._max_hedges)
+
+    def _first_attempt_done(self, start: float, attempt) -> None:
+        # The delay follows the latency of first attempts on their own, as the
+        # duration of a call shrinks whenever a hedge wins it. A first attempt
+        # cancelled after running for longer than the delay took at least that
+        # long, which still counts. One cancelled sooner tells nothing.
+        duration = monotonic() - start
+        if attempt.cancelled() and duration < self._current_delay():
+            return
+        self._record_duration(duration)
+
+    def _record_duration(self, duration: float) -> None:
+        with self._lock:
+            self._durations.append(duration)
+            self._calls_since_recompute += 1
+            if len(self._durations) < self._MIN_SAMPLES or \
+                    self._calls_since_recompute < self._RECOMPUTE_INTERVAL:
+                return
+            self._calls_since_recompute = 0
+            durations = sorted(self._durations)
+            index = ceil(len(durations) * self._delay_percentile / 100) - 1
+            self._percentile_delay = durations[min(max(index, 0), len(durations) - 1)]
+
+
+def Hedge(delay: Union[float, int] = 100,
+          max_hedges: int = 1,
+          delay_percentile: float = None,
+          max_hedge_ratio: float = 0.1,
+          executor: Executor = None,
+          name: str = None,
+          max_workers: int = 10):
+    """
+    :param delay: Number of milliseconds to wait for an attempt before firing another one.
+    :param max_hedges: Max number of extra attempts per call.
+    :param delay_percentile: If set (e.g. 95), the delay is the given percentile of the durations of the most recent
+    first attempts, successful or not, instead of the fixed "delay", which is only used until enough calls have been
+    made.
+    :param max_hedge_ratio: Max number of extra attempts as a share of all calls, so that hedging can't multiply the
+    load on a dependency that is slow across the board. Default is 0.1, i.e. one extra attempt per ten calls.
+    :param executor: Executor to run attempts of regular (non-async) functions in. Defaults to a thread pool of the
+    hedge's own.
+    :param name: Name of the hedge instance, defaults to the name of the decorated function.
+    :param max_workers: Max number of threads of the hedge's own thread pool. A call takes up to "max_hedges" + 1 of
+    them. Ignored if an executor is given.
+    """
+
+    # To be able to use decorator without parentheses
+    # if no arguments are provided.
+    if callable(delay):
+        return HedgeClass().decorate(delay)
+    else:
+        return HedgeClass(delay=delay,
+                          max_hedges=max_hedges,
+                          delay_percentile=delay_percentile,
+                          max_hedge_ratio=max_hedge_ratio,
+                          executor=executor,
+                          name=name,
+                          max_workers=max_workers)
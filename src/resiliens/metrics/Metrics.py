@@ -0,0 +1,172 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from bisect import bisect_left
+from threading import Lock, local
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from weakref import WeakSet, finalize, ref
+
+# Default histogram bucket upper bounds in seconds, same as the Prometheus clients use
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Layout of a shard: the counters, the sum of durations and then one count per histogram bucket
+_SUCCESSES = 0
+_FAILURES = 1
+_REJECTIONS = 2
+_RETRIES = 3
+_DURATION_SUM = 4
+_BUCKETS = 5
+
+
+class MetricsSnapshot(NamedTuple):
+    name: str
+    kind: str
+    successes: int
+    failures: int
+    rejections: int
+    retries: int
+    duration_sum: float
+    duration_count: int
+    # Cumulative (upper bound, count) pairs, ending with float("inf")
+    buckets: Tuple[Tuple[float, int], ...]
+
+    @property
+    def calls(self) -> int:
+        """
+        Number of calls that went through, i.e. that weren't rejected.
+        """
+        return self.successes + self.failures
+
+
+class _ShardHolder:
+    __slots__ = ("__weakref__", )
+
+
+class Metrics:
+    """
+    Call counters and a fixed-bucket latency histogram of a decorator. Every thread counts into its own shard, so
+    recording takes no lock and threads never contend. A snapshot adds up the shards of all threads.
+
+    Once a thread has finished, its shard is folded into the shard of retired threads, so that the shards kept stay
+    as many as the threads alive no matter how many threads come and go.
+    """
+    _instances = WeakSet()
+    _instances_lock = Lock()
+
+    name: str
+    kind: str
+    _bounds: Tuple[float, ...]
+    _shards: List[list]
+
+    def __init__(self, name: str, kind: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        :param name: Name of the decorator instance the metrics belong to.
+        :param kind: Kind of decorator, e.g. "circuit_breaker".
+        :param buckets: Upper bounds of the latency histogram buckets in seconds. A bucket for anything above the
+        last bound is added automatically.
+        """
+        self.name = name
+        self.kind = kind
+        self._bounds = tuple(sorted(buckets))
+        self._shard_length = _BUCKETS + len(self._bounds) + 1
+        self._shards = []
+        self._retired = self._empty_shard()
+        self._shards_lock = Lock()
+        self._local = local()
+        with Metrics._instances_lock:
+            Metrics._instances.add(self)
+
+    @classmethod
+    def get_all(cls) -> List["Metrics"]:
+        with cls._instances_lock:
+            return list(cls._instances)
+
+    def _empty_shard(self) -> list:
+        shard = [0] * self._shard_length
+        shard[_DURATION_SUM] = 0.0
+        return shard
+
+    def _new_shard(self) -> list:
+        shard = self._empty_shard()
+        with self._shards_lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        # The thread-local values of a thread are dropped when it finishes,
+        # which is when the holder is finalized.
+        holder = self._local.holder = _ShardHolder()
+        finalize(holder, Metrics._retire, ref(self), shard)
+        return shard
+
+    @staticmethod
+    def _retire(metrics_ref: ref, shard: list) -> None:
+        metrics = metrics_ref()
+        if metrics is None:
+            return
+        with metrics._shards_lock:
+            metrics._shards.remove(shard)
+            retired = metrics._retired
+            for i, value in enumerate(shard):
+                retired[i] += value
+
+    def _shard(self) -> list:
+        """
+        The shard of the calling thread.
+        """
+        try:
+            return self._local.shard
+        except AttributeError:
+            return self._new_shard()
+
+    def record_success(self, duration: Optional[float] = None) -> None:
+        """
+        :param duration: Duration of the call in seconds, or None if it wasn't timed.
+        """
+        # Recorded by every successful call, so the shard is looked up inline
+        # rather than through _shard().
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[_SUCCESSES] += 1
+        if duration is not None:
+            shard[_DURATION_SUM] += duration
+            shard[_BUCKETS + bisect_left(self._bounds, duration)] += 1
+
+    def record_failure(self, duration: Optional[float] = None) -> None:
+        """
+        :param duration: Duration of the call in seconds, or None if it wasn't timed.
+        """
+        shard = self._shard()
+        shard[_FAILURES] += 1
+        if duration is not None:
+            shard[_DURATION_SUM] += duration
+            shard[_BUCKETS + bisect_left(self._bounds, duration)] += 1
+
+    def record_rejection(self) -> None:
+        shard = self._shard()
+        shard[_REJECTIONS] += 1
+
+    def record_retry(self) -> None:
+        shard = self._shard()
+        shard[_RETRIES] += 1
+
+    def snapshot(self) -> MetricsSnapshot:
+        # Added up while holding the lock, so that a shard being retired
+        # meanwhile is counted exactly once.
+        with self._shards_lock:
+            totals = list(self._retired)
+            for shard in self._shards:
+                for i, value in enumerate(shard):
+                    totals[i] += value
+        buckets = []
+        cumulative = 0
+        for bound, count in zip(self._bounds + (float("inf"), ), totals[_BUCKETS:]):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return MetricsSnapshot(name=self.name,
+                               kind=self.kind,
+                               successes=totals[_SUCCESSES],
+                               failures=totals[_FAILURES],
+                               rejections=totals[_REJECTIONS],
+                               retries=totals[_RETRIES],
+                               duration_sum=totals[_DURATION_SUM],
+                               duration_count=cumulative,
+                               buckets=tuple(buckets))
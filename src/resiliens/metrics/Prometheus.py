@@ -0,0 +1,50 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from typing import Iterable, List
+
+from .Metrics import Metrics, MetricsSnapshot
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def export_prometheus(snapshots: Iterable[MetricsSnapshot] = None,
+                      prefix: str = "resiliens") -> str:
+    """
+    Render metrics in the Prometheus text exposition format, e.g. to serve from a /metrics endpoint.
+    :param snapshots: The snapshots to render. Defaults to a snapshot of every decorator that keeps metrics.
+    :param prefix: Prefix of every metric name.
+    """
+    if snapshots is None:
+        snapshots = [metrics.snapshot() for metrics in Metrics.get_all()]
+    snapshots = sorted(snapshots, key=lambda s: (s.kind, s.name))
+
+    calls: List[str] = [
+        f"# HELP {prefix}_calls_total Calls made through a decorator by outcome.",
+        f"# TYPE {prefix}_calls_total counter"
+    ]
+    retries: List[str] = [
+        f"# HELP {prefix}_retries_total Retries made by a decorator.",
+        f"# TYPE {prefix}_retries_total counter"
+    ]
+    durations: List[str] = [
+        f"# HELP {prefix}_call_duration_seconds Duration of calls made through a decorator.",
+        f"# TYPE {prefix}_call_duration_seconds histogram"
+    ]
+    for snapshot in snapshots:
+        labels = f"kind=\"{_escape(snapshot.kind)}\",name=\"{_escape(snapshot.name)}\""
+        calls.append(f"{prefix}_calls_total{{{labels},outcome=\"success\"}} {snapshot.successes}")
+        calls.append(f"{prefix}_calls_total{{{labels},outcome=\"failure\"}} {snapshot.failures}")
+        calls.append(f"{prefix}_calls_total{{{labels},outcome=\"rejected\"}} {snapshot.rejections}")
+        retries.append(f"{prefix}_retries_total{{{labels}}} {snapshot.retries}")
+        for bound, count in snapshot.buckets:
+            durations.append(
+                f"{prefix}_call_duration_seconds_bucket{{{labels},le=\"{_format_bound(bound)}\"}} {count}")
+        durations.append(f"{prefix}_call_duration_seconds_sum{{{labels}}} {repr(float(snapshot.duration_sum))}")
+        durations.append(f"{prefix}_call_duration_seconds_count{{{labels}}} {snapshot.duration_count}")
+
+    return "\n".join(calls + retries + durations) + "\n"
@@ -0,0 +1,3 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from .Metrics import Metrics, MetricsSnapshot
+from .Prometheus import export_prometheus
@@ -0,0 +1,12 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+
+
+class RateLimitExceededException(Exception):
+
+    def __init__(self, rate_limiter, *args):
+        super(RateLimitExceededException, self).__init__(*args)
+        self._rate_limiter = rate_limiter
+
+    def __str__(self, *args, **kwargs):
+        return f"[Rate limiter: {self._rate_limiter.name}] Exceeded the rate of {self._rate_limiter.rate} calls" \
+               f" per second (burst {self._rate_limiter.burst})"
@@ -0,0 +1,197 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+import time
+from functools import wraps
+from inspect import isgeneratorfunction, iscoroutinefunction, isasyncgenfunction
+from threading import Lock
+from time import monotonic
+from typing import Callable, Union, Optional, Any
+
+from .RateLimitExceededException import RateLimitExceededException
+from ..utils.Awaitables import await_if_needed, iterate_async
+
+
+class RateLimiterClass:
+    """
+    Keeps calls to the decorated function under a rate using the generic cell rate algorithm (GCRA), which behaves
+    like a token bucket but only needs to store the theoretical arrival time of the next call. Each call costs a
+    couple of arithmetic operations under a lock, and no background thread is needed to refill anything.
+    """
+    _rate: float
+    _burst: int
+    _interval: float
+    _burst_tolerance: float
+    _max_wait: Optional[float]
+    _theoretical_arrival: float
+    _fallback_function: Callable
+    _fallback_function_with_exception: Callable
+
+    def __init__(self,
+                 rate: float = 10,
+                 burst: int = 1,
+                 max_wait: Union[float, int] = 0,
+                 name: str = None,
+                 fallback_function: Callable = None,
+                 fallback_function_with_exception: Callable = None):
+        """
+        :param rate: Number of calls allowed per second.
+        :param burst: Number of calls that may be made back to back before the rate kicks in.
+        :param max_wait: Number of milliseconds a call may be delayed to stay under the rate before it is rejected
+        instead. Default is 0, i.e. reject right away. If None, calls are delayed for as long as it takes.
+        :param name: Name of the rate limiter instance, defaults to the name of the decorated function.
+        :param fallback_function: A function to use as fallback if a call is rejected.
+        :param fallback_function_with_exception: A function to use as fallback if a call is rejected. The first
+        argument supplied to it will be the RateLimitExceededException (i.e. fallback_exception(exception, *args,
+        **kwargs))
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be greater than 0")
+        if burst < 1:
+            raise ValueError("Burst must be at least 1")
+        self._rate = rate
+        self._burst = burst
+        self._interval = 1 / rate
+        self._burst_tolerance = self._interval * (burst - 1)
+        self._max_wait = max_wait / 1000 if max_wait is not None else None  # From milliseconds to seconds
+        self._name = name
+        self._fallback_function = fallback_function
+        self._fallback_function_with_exception = fallback_function_with_exception
+        self._theoretical_arrival = monotonic()
+        self._lock = Lock()
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @property
+    def burst(self) -> int:
+        return self._burst
+
+    def __call__(self, decorated_function):
+        return self.decorate(decorated_function)
+
+    def decorate(self, function_to_decorate: Callable) -> Callable:
+        if self._name is None:
+            self._name = function_to_decorate.__name__
+
+        if iscoroutinefunction(function_to_decorate):
+            return self._decorate_coroutine(function_to_decorate)
+        if isasyncgenfunction(function_to_decorate):
+            return self._decorate_async_generator(function_to_decorate)
+        if isgeneratorfunction(function_to_decorate):
+            return self._decorate_generator(function_to_decorate)
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            wait = self.reserve()
+            if wait is None:
+                return self._handle_rejected_call(*args, **kwargs)
+            if wait > 0:
+                time.sleep(wait)
+            return function_to_decorate(*args, **kwargs)
+
+        return wrapper
+
+    def _decorate_generator(self, function_to_decorate: Callable) -> Callable:
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            wait = self.reserve()
+            if wait is None:
+                for el in self._handle_rejected_call(*args, **kwargs):
+                    yield el
+                return
+            if wait > 0:
+                time.sleep(wait)
+            for el in function_to_decorate(*args, **kwargs):
+                yield el
+
+        return wrapper
+
+    def _decorate_coroutine(self, function_to_decorate: Callable) -> Callable:
+
+        @wraps(function_to_decorate)
+        async def wrapper(*args, **kwargs):
+            wait = self.reserve()
+            if wait is None:
+                return await await_if_needed(
+                    self._handle_rejected_call(*args, **kwargs))
+            if wait > 0:
+                await asyncio.sleep(wait)
+            return await function_to_decorate(*args, **kwargs)
+
+        return wrapper
+
+    def _decorate_async_generator(self,
+                                  function_to_decorate: Callable) -> Callable:
+
+        @wraps(function_to_decorate)
+        async def wrapper(*args, **kwargs):
+            wait = self.reserve()
+            if wait is None:
+                results = self._handle_rejected_call(*args, **kwargs)
+                async for el in iterate_async(results):
+                    yield el
+                return
+            if wait > 0:
+                await asyncio.sleep(wait)
+            async for el in function_to_decorate(*args, **kwargs):
+                yield el
+
+        return wrapper
+
+    def reserve(self) -> Optional[float]:
+        """
+        Reserve a slot for a call. Returns the number of seconds the call has to wait before it may go ahead, or None
+        if it would have to wait longer than "max_wait" and should be rejected. A rejected call doesn't use up a slot.
+        """
+        with self._lock:
+            now = monotonic()
+            arrival = max(self._theoretical_arrival, now)
+            wait = arrival - self._burst_tolerance - now
+            if wait > 0 and self._max_wait is not None and wait > self._max_wait:
+                return None
+            self._theoretical_arrival = arrival + self._interval
+        return max(wait, 0)
+
+    def _handle_rejected_call(self, *args, **kwargs) -> Any:
+        if self._fallback_function:
+            return self._fallback_function(*args, **kwargs)
+        exception = RateLimitExceededException(self)
+        if self._fallback_function_with_exception:
+            return self._fallback_function_with_exception(exception, *args, **kwargs)
+        raise exception
+
+
+def RateLimiter(rate: float = 10,
+                burst: int = 1,
+                max_wait: Union[float, int] = 0,
+                name: str = None,
+                fallback: Callable = None,
+                fallback_exception: Callable = None):
+    """
+    :param rate: Number of calls allowed per second.
+    :param burst: Number of calls that may be made back to back before the rate kicks in.
+    :param max_wait: Number of milliseconds a call may be delayed to stay under the rate before it is rejected
+    instead. Default is 0, i.e. reject right away. If None, calls are delayed for as long as it takes.
+    :param name: Name of the rate limiter instance, defaults to the name of the decorated function.
+    :param fallback: A function to use as fallback if a call is rejected.
+    :param fallback_exception: A function to use as fallback if a call is rejected. The first argument supplied to
+    it will be the RateLimitExceededException (i.e. fallback_exception(exception, *args, **kwargs))
+    """
+
+    # To be able to use decorator without parentheses
+    # if no arguments are provided.
+    if callable(rate):
+        return RateLimiterClass().decorate(rate)
+    else:
+        return RateLimiterClass(rate=rate,
+                                burst=burst,
+                                max_wait=max_wait,
+                                name=name,
+                                fallback_function=fallback,
+                                fallback_function_with_exception=fallback_exception)
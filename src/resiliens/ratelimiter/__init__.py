@@ -0,0 +1,3 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from .RateLimiter import RateLimiter
+from .RateLimitExceededException import RateLimitExceededException
@@ -0,0 +1,120 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import random
+from abc import ABC, abstractmethod
+from typing import Union
+
+
+class Backoff(ABC):
+    """
+    Base class of backoff strategies, which decide how long Retryable waits before each retry. Strategies are
+    stateless, since a single strategy is shared by every call made through a decorator. Everything a strategy needs
+    to know about the call at hand is passed to next_backoff.
+    """
+
+    @abstractmethod
+    def next_backoff(self, attempts: int, previous: float) -> float:
+        """
+        :param attempts: Number of failed attempts so far, i.e. 1 before the first retry.
+        :param previous: The previous backoff time in seconds, or 0 before the first retry.
+        :return: Backoff time in seconds.
+        """
+
+
+class ConstantBackoff(Backoff):
+    """
+    The same backoff time before every retry.
+    """
+
+    def __init__(self, backoff: Union[int, float] = 1000):
+        """
+        :param backoff: Backoff time in milliseconds.
+        """
+        self._backoff = backoff / 1000  # Milliseconds to seconds
+
+    def next_backoff(self, attempts: int, previous: float) -> float:
+        return self._backoff
+
+
+class PolynomialBackoff(Backoff):
+    """
+    Backoff time of backoff * (attempts ** exponent), which is what the "backoff_multiplier" argument of Retryable
+    configures.
+    """
+
+    def __init__(self, backoff: Union[int, float] = 1000, exponent: Union[int, float] = 2):
+        """
+        :param backoff: Backoff time in milliseconds before the first retry.
+        :param exponent: Exponent to make the backoff time increase for every attempt.
+        """
+        self._backoff = backoff / 1000  # Milliseconds to seconds
+        self._exponent = exponent
+
+    def next_backoff(self, attempts: int, previous: float) -> float:
+        return max(attempts**self._exponent, 1) * self._backoff
+
+
+class ExponentialBackoff(Backoff):
+    """
+    Backoff time of base * (multiplier ** (attempts - 1)), capped at "cap".
+    """
+
+    def __init__(self,
+                 base: Union[int, float] = 100,
+                 cap: Union[int, float] = 20_000,
+                 multiplier: Union[int, float] = 2):
+        """
+        :param base: Backoff time in milliseconds before the first retry.
+        :param cap: Max backoff time in milliseconds.
+        :param multiplier: Factor the backoff time grows with for every attempt.
+        """
+        self._base = base / 1000  # Milliseconds to seconds
+        self._cap = cap / 1000
+        self._multiplier = multiplier
+
+    def _exponential(self, attempts: int) -> float:
+        # Stop growing once past the cap, so the power can't overflow after many attempts
+        if self._base * self._multiplier**min(attempts - 1, 64) >= self._cap:
+            return self._cap
+        return self._base * self._multiplier**(attempts - 1)
+
+    def next_backoff(self, attempts: int, previous: float) -> float:
+        return self._exponential(attempts)
+
+
+class FullJitterBackoff(ExponentialBackoff):
+    """
+    Random backoff time between 0 and the capped exponential backoff time. Spreads retries of many clients out the
+    most, at the cost of sometimes retrying right away.
+    """
+
+    def next_backoff(self, attempts: int, previous: float) -> float:
+        return random.uniform(0, self._exponential(attempts))
+
+
+class EqualJitterBackoff(ExponentialBackoff):
+    """
+    Half of the capped exponential backoff time plus a random time up to the other half, so the backoff time never
+    drops below half of the exponential one.
+    """
+
+    def next_backoff(self, attempts: int, previous: float) -> float:
+        half = self._exponential(attempts) / 2
+        return half + random.uniform(0, half)
+
+
+class DecorrelatedJitterBackoff(Backoff):
+    """
+    Random backoff time between base and three times the previous backoff time, capped at "cap". Grows about as
+    fast as the exponential backoff, but each backoff time depends on the previous one rather than the attempt.
+    """
+
+    def __init__(self, base: Union[int, float] = 100, cap: Union[int, float] = 20_000):
+        """
+        :param base: Min backoff time in milliseconds.
+        :param cap: Max backoff time in milliseconds.
+        """
+        self._base = base / 1000  # Milliseconds to seconds
+        self._cap = cap / 1000
+
+    def next_backoff(self, attempts: int, previous: float) -> float:
+        return min(self._cap, random.uniform(self._base, max(previous, self._base) * 3))
@@ -0,0 +1,53 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from threading import Lock
+
+
+class RetryBudget:
+    """
+    A retry budget that can be shared by any number of Retryable decorators, e.g. all decorators calling the same
+    backend. It is a token bucket: every successful call deposits "ratio" tokens and every retry withdraws one. Once
+    the bucket is empty, failed calls are no longer retried, so retries can add at most "ratio" times the successful
+    traffic on top, no matter how many decorators and callers share the budget.
+    """
+    _ratio: float
+    _max_tokens: float
+    _tokens: float
+
+    def __init__(self,
+                 ratio: float = 0.1,
+                 max_tokens: float = 10,
+                 initial_tokens: float = None):
+        """
+        :param ratio: Number of tokens a successful call deposits, i.e. the allowed share of retries to successful
+        calls. 0.1 allows one retry per ten successful calls.
+        :param max_tokens: Max number of tokens the bucket holds, i.e. the max number of retries in a burst.
+        :param initial_tokens: Number of tokens in the bucket to begin with. Defaults to a full bucket.
+        """
+        if ratio < 0:
+            raise ValueError("Retry budget ratio can't be negative")
+        self._ratio = ratio
+        self._max_tokens = max_tokens
+        self._tokens = max_tokens if initial_tokens is None else min(
+            initial_tokens, max_tokens)
+        self._lock = Lock()
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def deposit(self) -> None:
+        """
+        Record a successful call.
+        """
+        with self._lock:
+            self._tokens = min(self._tokens + self._ratio, self._max_tokens)
+
+    def try_withdraw(self) -> bool:
+        """
+        Ask for permission to retry. Returns False if the budget is exhausted.
+        """
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
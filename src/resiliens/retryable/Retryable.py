@@ -1,8 +1,14 @@
 #  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
 import time
 from functools import wraps
-from inspect import isgeneratorfunction
-from typing import Callable, Type, Any, Union
+from inspect import isgeneratorfunction, iscoroutinefunction, isasyncgenfunction
+from typing import Callable, Type, Any, Union, Optional
+
+from .Backoff import Backoff, ConstantBackoff, PolynomialBackoff
+from .RetryBudget import RetryBudget
+from ..metrics.Metrics import Metrics
+from ..utils.Awaitables import await_if_needed, iterate_async
 
 
 class RetryableClass:
@@ -11,9 +17,11 @@ class RetryableClass:
     backoff_exponent: Union[int, float]
     fallback_function: Callable
     fallback_exception: Callable
-
-    _current_attempts: int
-    _last_failure: Exception
+    budget: RetryBudget
+    backoff_strategy: Backoff
+    resume: Union[bool, str]
+    checkpoint: Optional[Callable[[Any], Any]]
+    _metrics: Optional[Metrics]
 
     def __init__(self,
                  max_retries: int = 3,
@@ -21,7 +29,13 @@ class RetryableClass:
                  backoff_multiplier: Union[int, float] = None,
                  fallback: Callable = None,
                  fallback_exception: Callable = None,
-                 expected_exception: Type[BaseException] = Exception):
+                 expected_exception: Type[BaseException] = Exception,
+                 budget: RetryBudget = None,
+                 backoff_strategy: Backoff = None,
+                 name: str = None,
+                 metrics: bool = False,
+                 resume: Union[bool, str] = False,
+                 checkpoint: Callable[[Any], Any] = None):
         """
         :param max_retries: Max number of retries until it should give up.
         :param backoff: Backoff time in MILLISECONDS. If you don't set a backoff_exponent, this
@@ -34,14 +48,48 @@ class RetryableClass:
         if not set the last exception will just get thrown.
         :param expected_exception: For what exceptions should we attempt to retry? Default is any exception, but you may
         want this to be more fine-grained (e.g. ConnectionError, RequestException)
+        :param budget: A RetryBudget shared with other Retryable decorators. Successful calls add to it and every retry
+        draws from it. Once it is exhausted, failed calls are not retried.
+        :param backoff_strategy: A Backoff strategy deciding the backoff time before each retry (e.g. FullJitterBackoff).
+        If set, "backoff" and "backoff_multiplier" are ignored.
+        :param name: Name of the retryable instance, defaults to the name of the decorated function.
+        :param metrics: Whether to count calls, retries and their durations. Off by default.
+        :param resume: How a retried generator resumes its stream. If False, it starts over and yields every item again.
+        If True, it starts over but the items that were already yielded are skipped. If the name of a keyword argument,
+        the generator is called again with that argument set to where to resume: the offset it was first called with
+        plus the number of items yielded, or the cursor of the last item yielded if "checkpoint" is set. Failures only
+        count towards "max_retries" until the stream makes progress again.
+        :param checkpoint: Function that is given each item yielded and returns the cursor to resume after it from, e.g.
+        the token of the next page. Requires "resume" to be the name of a keyword argument.
         """
+        if checkpoint is not None and not isinstance(resume, str):
+            raise TypeError("Argument \"checkpoint\" requires \"resume\" to be the name of a keyword argument")
         self.max_retries = max_retries
         self.backoff = backoff / 1000  # Milliseconds to seconds
         self.fallback_function = fallback
         self.fallback_exception = fallback_exception
-        self._current_attempts = 0
         self.backoff_exponent = backoff_multiplier
         self._expected_exception = expected_exception
+        self.budget = budget
+        if backoff_strategy is None:
+            backoff_strategy = PolynomialBackoff(
+                backoff, backoff_multiplier) if backoff_multiplier else ConstantBackoff(backoff)
+        self.backoff_strategy = backoff_strategy
+        self.resume = resume
+        self.checkpoint = checkpoint
+        self._name = name
+        self._metrics = Metrics(name, "retryable") if metrics else None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def metrics(self) -> Optional[Metrics]:
+        """
+        The metrics of this retryable, or None if it was created with metrics=False.
+        """
+        return self._metrics
 
     def __call__(self, decorated_function=None):
         return self.decorate(decorated_function)
@@ -55,44 +103,227 @@ class RetryableClass:
         for el in func(*args, **kwargs):
             yield el
 
-    def get_backoff_time(self):
-        if self.backoff_exponent:
-            return max(self._current_attempts**self.backoff_exponent,
-                       1) * self.backoff
-        else:
-            return self.backoff
-
     def decorate(self, function_to_decorate: Callable = None) -> Callable:
+        if self.resume and not (isgeneratorfunction(function_to_decorate)
+                                or isasyncgenfunction(function_to_decorate)):
+            raise TypeError("Argument \"resume\" can only be used on generator functions")
+        if self._name is None:
+            self._name = function_to_decorate.__name__
+            if self._metrics is not None:
+                self._metrics.name = self._name
+
+        if iscoroutinefunction(function_to_decorate):
+            return self._decorate_coroutine(function_to_decorate)
+        if isasyncgenfunction(function_to_decorate):
+            return self._decorate_async_generator(function_to_decorate)
         if isgeneratorfunction(function_to_decorate):
-            call = self.call_generator
-        else:
-            call = self.call
+            return self._decorate_generator(function_to_decorate)
 
         @wraps(function_to_decorate)
         def wrapper(*args, **kwargs):
-            self.retry_if_needed(call, function_to_decorate, *args, **kwargs)
+            return self.retry_if_needed(self.call, function_to_decorate, *args,
+                                        **kwargs)
 
         return wrapper
 
     def retry_if_needed(self, call, function_to_decorate, *args, **kwargs):
-        while self._current_attempts < self.max_retries:
+        # Attempts are kept local to the call, so that concurrent and nested
+        # calls through the same decorator don't share counters.
+        attempts = 0
+        last_failure = None
+        backoff_time = 0
+        start = time.monotonic() if self._metrics is not None else None
+        while attempts < self.max_retries:
+            try:
+                result = call(function_to_decorate, *args, **kwargs)
+            except Exception as e:
+                if not isinstance(e, self._expected_exception):
+                    self._failed(start)
+                    raise
+                attempts += 1
+                last_failure = e
+                if attempts < self.max_retries:
+                    if not self._may_retry():
+                        break
+                    backoff_time = self.backoff_strategy.next_backoff(
+                        attempts, backoff_time)
+                    time.sleep(backoff_time)
+            else:
+                self._succeeded(start)
+                return result
+        self._failed(start)
+        return self._call_fallback(call, last_failure, *args, **kwargs)
+
+    def _decorate_generator(self, function_to_decorate: Callable) -> Callable:
+        # The generator fails while it is being iterated, long after calling
+        # it returned, so the iteration itself is retried.
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            attempts = 0
+            backoff_time = 0
+            yielded = 0
+            cursor = None
+            start = time.monotonic() if self._metrics is not None else None
+            while True:
+                skip, attempt_kwargs = self._resume_from(yielded, cursor, kwargs)
+                resumed_at = yielded
+                try:
+                    for el in function_to_decorate(*args, **attempt_kwargs):
+                        if skip:
+                            skip -= 1
+                            continue
+                        yielded += 1
+                        if self.checkpoint is not None:
+                            cursor = self.checkpoint(el)
+                        yield el
+                    self._succeeded(start)
+                    return
+                except Exception as e:
+                    if not isinstance(e, self._expected_exception):
+                        self._failed(start)
+                        raise
+                    if self.resume and yielded > resumed_at:
+                        attempts = 0
+                        backoff_time = 0
+                    attempts += 1
+                    last_failure = e
+                    if attempts >= self.max_retries or not self._may_retry():
+                        break
+                    backoff_time = self.backoff_strategy.next_backoff(
+                        attempts, backoff_time)
+                    time.sleep(backoff_time)
+            self._failed(start)
+            yield from self._call_fallback(self.call_generator, last_failure,
+                                           *args, **kwargs)
+
+        return wrapper
+
+    def _resume_from(self, yielded: int, cursor: Any, kwargs: dict):
+        """
+        The number of items to skip and the keyword arguments to call a generator with, so that its stream resumes
+        after the items already yielded.
+        """
+        if not yielded or not self.resume:
+            return 0, kwargs
+        if self.resume is True:
+            return yielded, kwargs
+        if self.checkpoint is not None:
+            return 0, {**kwargs, self.resume: cursor}
+        return 0, {**kwargs, self.resume: (kwargs.get(self.resume) or 0) + yielded}
+
+    def _decorate_coroutine(self, function_to_decorate: Callable) -> Callable:
+
+        @wraps(function_to_decorate)
+        async def wrapper(*args, **kwargs):
+            return await self.retry_if_needed_async(function_to_decorate,
+                                                    *args, **kwargs)
+
+        return wrapper
+
+    def _decorate_async_generator(self,
+                                  function_to_decorate: Callable) -> Callable:
+
+        @wraps(function_to_decorate)
+        async def wrapper(*args, **kwargs):
+            attempts = 0
+            backoff_time = 0
+            yielded = 0
+            cursor = None
+            start = time.monotonic() if self._metrics is not None else None
+            while True:
+                skip, attempt_kwargs = self._resume_from(yielded, cursor, kwargs)
+                resumed_at = yielded
+                try:
+                    async for el in function_to_decorate(*args, **attempt_kwargs):
+                        if skip:
+                            skip -= 1
+                            continue
+                        yielded += 1
+                        if self.checkpoint is not None:
+                            cursor = self.checkpoint(el)
+                        yield el
+                    self._succeeded(start)
+                    return
+                except Exception as e:
+                    if not isinstance(e, self._expected_exception):
+                        self._failed(start)
+                        raise
+                    if self.resume and yielded > resumed_at:
+                        attempts = 0
+                        backoff_time = 0
+                    attempts += 1
+                    last_failure = e
+                    if attempts >= self.max_retries or not self._may_retry():
+                        break
+                    backoff_time = self.backoff_strategy.next_backoff(
+                        attempts, backoff_time)
+                    await asyncio.sleep(backoff_time)
+            self._failed(start)
+            results = self._call_fallback(self.call, last_failure, *args,
+                                          **kwargs)
+            async for el in iterate_async(results):
+                yield el
+
+        return wrapper
+
+    async def retry_if_needed_async(self, function_to_decorate, *args,
+                                    **kwargs):
+        attempts = 0
+        last_failure = None
+        backoff_time = 0
+        start = time.monotonic() if self._metrics is not None else None
+        while attempts < self.max_retries:
             try:
-                return call(function_to_decorate, *args, **kwargs)
+                result = await function_to_decorate(*args, **kwargs)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                if issubclass(e.__class__, self._expected_exception):
-                    self._current_attempts += 1
-                    self._last_failure = e
-                    if self._current_attempts < self.max_retries:
-                        time.sleep(self.get_backoff_time())
-                else:
-                    raise e
+                if not isinstance(e, self._expected_exception):
+                    self._failed(start)
+                    raise
+                attempts += 1
+                last_failure = e
+                if attempts < self.max_retries:
+                    if not self._may_retry():
+                        break
+                    backoff_time = self.backoff_strategy.next_backoff(
+                        attempts, backoff_time)
+                    # Cancelling the task while it backs off raises
+                    # CancelledError right here and ends the retries.
+                    await asyncio.sleep(backoff_time)
+            else:
+                self._succeeded(start)
+                return result
+        self._failed(start)
+        return await await_if_needed(
+            self._call_fallback(self.call, last_failure, *args, **kwargs))
+
+    def _may_retry(self) -> bool:
+        if self.budget is not None and not self.budget.try_withdraw():
+            return False
+        if self._metrics is not None:
+            self._metrics.record_retry()
+        return True
+
+    def _succeeded(self, start: Optional[float]) -> None:
+        if self.budget is not None:
+            self.budget.deposit()
+        if self._metrics is not None:
+            self._metrics.record_success(time.monotonic() - start)
+
+    def _failed(self, start: Optional[float]) -> None:
+        if self._metrics is not None:
+            self._metrics.record_failure(time.monotonic() - start)
+
+    def _call_fallback(self, call, last_failure, *args, **kwargs):
         if self.fallback_function:
             return call(self.fallback_function, *args, **kwargs)
         elif self.fallback_exception:
-            return call(self.fallback_exception, (self._last_failure, *args),
+            return call(self.fallback_exception, last_failure, *args,
                         **kwargs)
         else:
-            raise self._last_failure
+            raise last_failure
 
 
 # The decorator itself
@@ -101,7 +332,13 @@ def Retryable(max_retries: int = 3,
               backoff_multiplier: Union[int, float] = None,
               fallback: Callable = None,
               fallback_exception: Callable = None,
-              expected_exception: Type[BaseException] = Exception):
+              expected_exception: Type[BaseException] = Exception,
+              budget: RetryBudget = None,
+              backoff_strategy: Backoff = None,
+              name: str = None,
+              metrics: bool = False,
+              resume: Union[bool, str] = False,
+              checkpoint: Callable[[Any], Any] = None):
     """
             :param fallback_exception:
             :param backoff_multiplier:
@@ -116,6 +353,19 @@ def Retryable(max_retries: int = 3,
             if not set the last exception will just get thrown.
             :param expected_exception: For what exceptions should we attempt to retry? Default is any exception, but you may
             want this to be more fine-grained (e.g. ConnectionError, RequestException)
+            :param budget: A RetryBudget shared with other Retryable decorators. Successful calls add to it and every
+            retry draws from it. Once it is exhausted, failed calls are not retried.
+            :param backoff_strategy: A Backoff strategy deciding the backoff time before each retry (e.g.
+            FullJitterBackoff). If set, "backoff" and "backoff_multiplier" are ignored.
+            :param name: Name of the retryable instance, defaults to the name of the decorated function.
+            :param metrics: Whether to count calls, retries and their durations. Off by default.
+            :param resume: How a retried generator resumes its stream. If False, it starts over and yields every item
+            again. If True, it starts over but the items that were already yielded are skipped. If the name of a keyword
+            argument, the generator is called again with that argument set to where to resume: the offset it was first
+            called with plus the number of items yielded, or the cursor of the last item yielded if "checkpoint" is set.
+            Failures only count towards "max_retries" until the stream makes progress again.
+            :param checkpoint: Function that is given each item yielded and returns the cursor to resume after it from,
+            e.g. the token of the next page. Requires "resume" to be the name of a keyword argument.
             """
 
     # To be able to use decorator without parentheses
@@ -128,4 +378,10 @@ def Retryable(max_retries: int = 3,
                               backoff_multiplier=backoff_multiplier,
                               fallback=fallback,
                               fallback_exception=fallback_exception,
-                              expected_exception=expected_exception)
+                              expected_exception=expected_exception,
+                              budget=budget,
+                              backoff_strategy=backoff_strategy,
+                              name=name,
+                              metrics=metrics,
+                              resume=resume,
+                              checkpoint=checkpoint)
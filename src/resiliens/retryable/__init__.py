@@ -1,2 +1,5 @@
 #  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
 from .Retryable import Retryable
+from .RetryBudget import RetryBudget
+from .Backoff import Backoff, ConstantBackoff, PolynomialBackoff, ExponentialBackoff, FullJitterBackoff, \
+    EqualJitterBackoff, DecorrelatedJitterBackoff
@@ -0,0 +1,184 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+from copy import copy
+from functools import wraps
+from inspect import isgeneratorfunction, iscoroutinefunction, isasyncgenfunction
+from threading import Event, Lock
+from typing import Callable, Hashable, Optional, Any
+
+# Separates the positional arguments of a key from the keyword arguments, so
+# that a call with keyword arguments never has the key of a call without.
+_KWARGS_MARK = object()
+
+
+class _Call:
+    __slots__ = ("done", "result", "exception")
+
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.exception = None
+
+
+def _copy_exception(exception: BaseException) -> BaseException:
+    # Raising an exception adds the frames it passes through to its
+    # traceback, so one raised by every caller it is shared with would keep
+    # growing. Each caller raises a copy instead, unless it can't be copied.
+    try:
+        copied = copy(exception)
+    except Exception:
+        return exception
+    copied.__cause__ = exception.__cause__
+    copied.__context__ = exception.__context__
+    copied.__suppress_context__ = exception.__suppress_context__
+    return copied.with_traceback(exception.__traceback__)
+
+
+class SingleFlightClass:
+    """
+    Coalesces concurrent calls with the same arguments into a single execution of the decorated function. The first
+    caller runs it, and every caller arriving while it runs waits for and shares its result or exception. Once it has
+    returned, the next call runs the function again, so nothing is cached. A shared exception is raised to each caller
+    that waited for it as a copy of its own, with the traceback of the execution.
+
+    Coroutines run as a task that all callers await through asyncio.shield, so cancelling one caller doesn't cancel
+    the execution the others are waiting for.
+
+    Placed outside a CircuitBreaker, the coalesced callers count as a single call, so a single failure is recorded
+    once rather than once per caller.
+    """
+    _key_function: Optional[Callable[..., Hashable]]
+
+    def __init__(self, key: Callable[..., Hashable] = None, name: str = None):
+        """
+        :param key: Function that is given the arguments of a call and returns the key calls are coalesced by.
+        Defaults to the arguments themselves. Calls whose key can't be hashed are never coalesced.
+        :param name: Name of the single flight instance, defaults to the name of the decorated function.
+        """
+        self._key_function = key
+        self._name = name
+        self._calls = {}
+        self._tasks = {}
+        self._lock = Lock()
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of distinct keys currently being executed.
+        """
+        return len(self._calls) + len(self._tasks)
+
+    def __call__(self, decorated_function):
+        return self.decorate(decorated_function)
+
+    def _key(self, args: tuple, kwargs: dict) -> Optional[Hashable]:
+        if self._key_function is not None:
+            key = self._key_function(*args, **kwargs)
+        else:
+            key = args + (_KWARGS_MARK, ) + tuple(sorted(kwargs.items())) if kwargs else args
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def decorate(self, function_to_decorate: Callable) -> Callable:
+        if self._name is None:
+            self._name = function_to_decorate.__name__
+
+        if isgeneratorfunction(function_to_decorate) or isasyncgenfunction(
+                function_to_decorate):
+            raise TypeError("SingleFlight can't be used on generator functions")
+
+        if iscoroutinefunction(function_to_decorate):
+
+            @wraps(function_to_decorate)
+            async def async_wrapper(*args, **kwargs):
+                return await self.call_async(function_to_decorate, *args,
+                                             **kwargs)
+
+            return async_wrapper
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            return self.call(function_to_decorate, *args, **kwargs)
+
+        return wrapper
+
+    def call(self, func, *args, **kwargs) -> Any:
+        key = self._key(args, kwargs)
+        if key is None:
+            return func(*args, **kwargs)
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise _copy_exception(call.exception)
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def call_async(self, func, *args, **kwargs) -> Any:
+        key = self._key(args, kwargs)
+        if key is None:
+            return await func(*args, **kwargs)
+
+        # Tasks belong to a loop, so calls are only coalesced within a loop
+        key = (asyncio.get_running_loop(), key)
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(
+                func(*args, **kwargs))
+            task.add_done_callback(lambda done: self._task_done(key, done))
+        try:
+            return await asyncio.shield(task)
+        except Exception as e:
+            shared = e
+        # Raised outside of the except block, so that the shared exception
+        # doesn't become the context of the copy.
+        raise _copy_exception(shared)
+
+    def _task_done(self, key: Hashable, task: asyncio.Future) -> None:
+        del self._tasks[key]
+        if not task.cancelled():
+            # Every waiter may have been cancelled, so mark the exception as
+            # retrieved to keep asyncio from logging it.
+            task.exception()
+
+
+def SingleFlight(function_to_decorate: Callable = None,
+                 *,
+                 key: Callable[..., Hashable] = None,
+                 name: str = None):
+    """
+    Coalesce concurrent calls with the same arguments into a single execution, whose result or exception is shared by
+    every caller.
+    :param key: Function that is given the arguments of a call and returns the key calls are coalesced by. Defaults to
+    the arguments themselves. Calls whose key can't be hashed are never coalesced.
+    :param name: Name of the single flight instance, defaults to the name of the decorated function.
+    """
+
+    # The key is a function as well, so it has to be given as a keyword
+    # argument for the decorator to be usable without parentheses.
+    if function_to_decorate is not None:
+        return SingleFlightClass().decorate(function_to_decorate)
+    return SingleFlightClass(key=key, name=name)
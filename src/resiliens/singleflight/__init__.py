@@ -0,0 +1,2 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from .SingleFlight import SingleFlight
@@ -0,0 +1,16 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+
+
+class TimeLimitExceededException(TimeoutError):
+    """
+    Raised when a call doesn't complete in time. It is a TimeoutError (and thereby an OSError), so CircuitBreaker and
+    Retryable treat it as an expected failure by default or when told to expect TimeoutError.
+    """
+
+    def __init__(self, time_limiter, *args):
+        super(TimeLimitExceededException, self).__init__(*args)
+        self._time_limiter = time_limiter
+
+    def __str__(self, *args, **kwargs):
+        return f"[Time limiter: {self._time_limiter.name}] Call did not complete within" \
+               f" {self._time_limiter.timeout} milliseconds"
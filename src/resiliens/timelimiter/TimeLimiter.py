@@ -0,0 +1,112 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+from concurrent.futures import Executor, TimeoutError as FutureTimeoutError
+from functools import wraps
+from inspect import isgeneratorfunction, iscoroutinefunction, isasyncgenfunction
+from typing import Callable, Union
+
+from .TimeLimitExceededException import TimeLimitExceededException
+from ..utils.Executors import new_executor
+
+
+class TimeLimiterClass:
+    """
+    Bounds how long a call to the decorated function may take. Coroutines are awaited with asyncio.wait_for and
+    cancelled when they run out of time. Regular functions run in an executor while the caller waits for the result.
+    Python can't interrupt a running thread, so a regular function that runs out of time keeps running in the
+    background and holds on to its executor thread until it returns. Only the caller is released.
+
+    Unless an executor is given, every time limiter runs calls in a thread pool of its own with at most "max_workers"
+    threads. Once they are all held by calls that hang, further calls wait in the queue of the pool and time out there,
+    without starting, rather than holding up the calls of other time limiters.
+    """
+    _timeout: float
+    _executor: Executor
+
+    def __init__(self,
+                 timeout: Union[float, int] = 1000,
+                 executor: Executor = None,
+                 name: str = None,
+                 max_workers: int = 10):
+        """
+        :param timeout: Number of milliseconds a call may take before a TimeLimitExceededException is raised.
+        :param executor: Executor to run regular (non-async) functions in. Defaults to a thread pool of the time
+        limiter's own.
+        :param name: Name of the time limiter instance, defaults to the name of the decorated function.
+        :param max_workers: Max number of threads of the time limiter's own thread pool, i.e. of calls to regular
+        functions that may run at once, including the ones that timed out but haven't returned yet. Size it to the
+        calls expected within the timeout plus some headroom for hung ones. Ignored if an executor is given.
+        """
+        if max_workers < 1:
+            raise ValueError("TimeLimiter must allow at least 1 worker")
+        self._timeout = timeout / 1000  # From milliseconds to seconds
+        self._executor = executor if executor is not None else new_executor(max_workers, "timelimiter")
+        self._name = name
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def timeout(self) -> Union[float, int]:
+        """
+        The time limit in milliseconds.
+        """
+        return self._timeout * 1000
+
+    def __call__(self, decorated_function):
+        return self.decorate(decorated_function)
+
+    def decorate(self, function_to_decorate: Callable) -> Callable:
+        if self._name is None:
+            self._name = function_to_decorate.__name__
+
+        if isgeneratorfunction(function_to_decorate) or isasyncgenfunction(
+                function_to_decorate):
+            raise TypeError("TimeLimiter can't be used on generator functions")
+
+        if iscoroutinefunction(function_to_decorate):
+
+            @wraps(function_to_decorate)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    return await asyncio.wait_for(
+                        function_to_decorate(*args, **kwargs), self._timeout)
+                except asyncio.TimeoutError:
+                    raise TimeLimitExceededException(self) from None
+
+            return async_wrapper
+
+        @wraps(function_to_decorate)
+        def wrapper(*args, **kwargs):
+            future = self._executor.submit(function_to_decorate, *args, **kwargs)
+            try:
+                return future.result(self._timeout)
+            except FutureTimeoutError:
+                # Only has an effect if the call hasn't started yet
+                future.cancel()
+                raise TimeLimitExceededException(self) from None
+
+        return wrapper
+
+
+def TimeLimiter(timeout: Union[float, int] = 1000,
+                executor: Executor = None,
+                name: str = None,
+                max_workers: int = 10):
+    """
+    :param timeout: Number of milliseconds a call may take before a TimeLimitExceededException is raised. The exception
+    is a TimeoutError, so you can have CircuitBreaker and Retryable expect it.
+    :param executor: Executor to run regular (non-async) functions in. Defaults to a thread pool of the time limiter's
+    own. Note that a function that runs out of time keeps running in its executor thread until it returns.
+    :param name: Name of the time limiter instance, defaults to the name of the decorated function.
+    :param max_workers: Max number of threads of the time limiter's own thread pool, including the ones held by calls
+    that timed out but haven't returned yet. Ignored if an executor is given.
+    """
+
+    # To be able to use decorator without parentheses
+    # if no arguments are provided.
+    if callable(timeout):
+        return TimeLimiterClass().decorate(timeout)
+    else:
+        return TimeLimiterClass(timeout=timeout, executor=executor, name=name, max_workers=max_workers)
@@ -0,0 +1,3 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from .TimeLimiter import TimeLimiter
+from .TimeLimitExceededException import TimeLimitExceededException
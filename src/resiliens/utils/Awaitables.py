@@ -0,0 +1,25 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from inspect import isawaitable
+from typing import Any
+
+
+async def await_if_needed(result: Any) -> Any:
+    """
+    Await the result if it is awaitable, otherwise return it as is. Lets fallbacks of async functions be
+    either regular or async functions.
+    """
+    if isawaitable(result):
+        return await result
+    return result
+
+
+async def iterate_async(results):
+    """
+    Iterate over either an async iterable or a regular iterable from within an async generator.
+    """
+    if hasattr(results, '__aiter__'):
+        async for el in results:
+            yield el
+    else:
+        for el in results:
+            yield el
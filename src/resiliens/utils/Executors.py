@@ -0,0 +1,11 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+
+def new_executor(max_workers: int, kind: str) -> Executor:
+    """
+    Thread pool of a single decorator that needs to run regular functions in the background. Every decorator gets one
+    of its own, so that calls that hang only hold up other calls to the same decorator, and the number of threads they
+    hold on to is bounded by "max_workers". Threads are started as calls need them.
+    """
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"resiliens-{kind}")
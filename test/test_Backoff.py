@@ -0,0 +1,52 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import unittest
+
+from src.resiliens.retryable import Backoff, ConstantBackoff, PolynomialBackoff, ExponentialBackoff, FullJitterBackoff, \
+    EqualJitterBackoff, DecorrelatedJitterBackoff
+
+
+class TestBackoff(unittest.TestCase):
+    BASE: int = 100
+    CAP: int = 1000
+
+    def test_constantBackoff_isTheSameForEveryAttempt(self):
+        backoff = ConstantBackoff(self.BASE)
+        self.assertEqual([0.1] * 3, [backoff.next_backoff(a, 0) for a in range(1, 4)])
+
+    def test_polynomialBackoff_growsWithAttempts(self):
+        backoff = PolynomialBackoff(self.BASE, 2)
+        self.assertEqual([0.1, 0.4, 0.9], [backoff.next_backoff(a, 0) for a in range(1, 4)])
+
+    def test_exponentialBackoff_doublesUntilCap(self):
+        backoff = ExponentialBackoff(self.BASE, self.CAP)
+        self.assertEqual([0.1, 0.2, 0.4, 0.8, 1.0, 1.0],
+                         [backoff.next_backoff(a, 0) for a in (1, 2, 3, 4, 5, 10_000)])
+
+    def test_fullJitterBackoff_staysBetweenZeroAndExponential(self):
+        backoff = FullJitterBackoff(self.BASE, self.CAP)
+        for attempts in range(1, 10):
+            for _ in range(0, 100):
+                self.assertTrue(0 <= backoff.next_backoff(attempts, 0) <= min(0.1 * 2**(attempts - 1), 1.0))
+
+    def test_equalJitterBackoff_staysAboveHalfOfExponential(self):
+        backoff = EqualJitterBackoff(self.BASE, self.CAP)
+        for attempts in range(1, 10):
+            exponential = min(0.1 * 2**(attempts - 1), 1.0)
+            for _ in range(0, 100):
+                self.assertTrue(exponential / 2 <= backoff.next_backoff(attempts, 0) <= exponential)
+
+    def test_decorrelatedJitterBackoff_staysBetweenBaseAndCap(self):
+        backoff = DecorrelatedJitterBackoff(self.BASE, self.CAP)
+        previous = 0
+        for attempts in range(1, 100):
+            current = backoff.next_backoff(attempts, previous)
+            self.assertTrue(0.1 <= current <= min(max(previous, 0.1) * 3, 1.0))
+            previous = current
+
+    def test_strategyWithoutNextBackoff_cannotBeCreated(self):
+
+        class IncompleteBackoff(Backoff):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteBackoff()
@@ -0,0 +1,166 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+from src.resiliens.bulkhead import Bulkhead, BulkheadFullException
+
+
+class TestBulkhead(unittest.TestCase):
+    MAX_CONCURRENT_CALLS: int = 3
+
+    def test_limitReached_excessCallsAreRejected(self):
+        release = Event()
+        bulkhead = Bulkhead(max_concurrent_calls=self.MAX_CONCURRENT_CALLS)
+
+        @bulkhead
+        def slow_call():
+            release.wait(5)
+            return True
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(slow_call) for _ in range(0, 10)]
+            time.sleep(0.1)
+            self.assertEqual(self.MAX_CONCURRENT_CALLS, bulkhead.in_flight)
+            release.set()
+            results = [future.exception() or future.result() for future in futures]
+
+        self.assertEqual(self.MAX_CONCURRENT_CALLS, results.count(True))
+        self.assertEqual(10 - self.MAX_CONCURRENT_CALLS,
+                         sum(isinstance(r, BulkheadFullException) for r in results))
+        self.assertEqual(0, bulkhead.in_flight)
+
+    def test_callWaitsForFreeSlot_callIsNotRejected(self):
+        bulkhead = Bulkhead(max_concurrent_calls=1, max_wait=1000)
+
+        @bulkhead
+        def slow_call():
+            time.sleep(0.05)
+            return True
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(slow_call) for _ in range(0, 2)]
+            time.sleep(0.01)
+            self.assertEqual(1, bulkhead.queued)
+            results = [future.result() for future in futures]
+
+        self.assertEqual([True, True], results)
+        self.assertEqual(0, bulkhead.queued)
+
+    def test_callIsRejected_fallbackIsCalledWithException(self):
+        release = Event()
+
+        def fallback(exception, foo):
+            return exception, foo
+
+        @Bulkhead(max_concurrent_calls=1, fallback_exception=fallback)
+        def slow_call(foo):
+            release.wait(5)
+            return foo
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(slow_call, "first")
+            time.sleep(0.05)
+            exception, foo = slow_call("second")
+            release.set()
+            self.assertEqual("first", future.result())
+
+        self.assertIsInstance(exception, BulkheadFullException)
+        self.assertEqual("second", foo)
+
+    def test_coroutinesExceedLimit_excessCallsAreRejected(self):
+        bulkhead = Bulkhead(max_concurrent_calls=self.MAX_CONCURRENT_CALLS)
+        running = []
+
+        @bulkhead
+        async def slow_call():
+            running.append(bulkhead.in_flight)
+            await asyncio.sleep(0.05)
+            return True
+
+        async def run():
+            return await asyncio.gather(*[slow_call() for _ in range(0, 10)],
+                                        return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertEqual(self.MAX_CONCURRENT_CALLS, results.count(True))
+        self.assertEqual(self.MAX_CONCURRENT_CALLS, max(running))
+        self.assertEqual(0, bulkhead.in_flight)
+
+    def test_coroutinesWaitForFreeSlot_allCallsComplete(self):
+        bulkhead = Bulkhead(max_concurrent_calls=2, max_wait=None)
+
+        @bulkhead
+        async def slow_call():
+            await asyncio.sleep(0.01)
+            return True
+
+        async def run():
+            return await asyncio.gather(*[slow_call() for _ in range(0, 10)])
+
+        self.assertEqual([True] * 10, asyncio.run(run()))
+        self.assertEqual(0, bulkhead.queued)
+
+    def test_regularAndAsyncFunctions_shareTheLimit(self):
+        release = Event()
+        bulkhead = Bulkhead(max_concurrent_calls=2)
+
+        @bulkhead
+        def slow_call():
+            release.wait(5)
+            return True
+
+        @bulkhead
+        async def async_call():
+            return True
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(slow_call) for _ in range(0, 2)]
+            time.sleep(0.05)
+            with self.assertRaises(BulkheadFullException):
+                asyncio.run(async_call())
+            release.set()
+            self.assertEqual([True, True], [future.result() for future in futures])
+
+        self.assertTrue(asyncio.run(async_call()))
+        self.assertEqual(0, bulkhead.in_flight)
+
+    def test_threadReleasesPermit_waitingCoroutineProceeds(self):
+        started = Event()
+        bulkhead = Bulkhead(max_concurrent_calls=1, max_wait=1000)
+
+        @bulkhead
+        def slow_call():
+            started.set()
+            time.sleep(0.05)
+            return True
+
+        @bulkhead
+        async def async_call():
+            return bulkhead.in_flight
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(slow_call)
+            started.wait(5)
+            self.assertEqual(1, asyncio.run(async_call()))
+            self.assertTrue(future.result())
+        self.assertEqual(0, bulkhead.queued)
+
+    def test_coroutineWaitsLongerThanMaxWait_isRejected(self):
+        bulkhead = Bulkhead(max_concurrent_calls=1, max_wait=20)
+
+        @bulkhead
+        async def slow_call():
+            await asyncio.sleep(0.2)
+            return True
+
+        async def run():
+            return await asyncio.gather(slow_call(), slow_call(), return_exceptions=True)
+
+        first, second = asyncio.run(run())
+        self.assertTrue(first)
+        self.assertIsInstance(second, BulkheadFullException)
+        self.assertEqual(0, bulkhead.queued)
+        self.assertEqual(0, bulkhead.in_flight)
@@ -1,8 +1,16 @@
+import asyncio
+import sys
 import time
+import traceback
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
 
 from src.resiliens.circuit_breaker import CircuitBreaker
+from src.resiliens.circuit_breaker import CircuitBreakerException
+from src.resiliens.circuit_breaker import CircuitBreakerManager
 from src.resiliens.circuit_breaker import CircuitBreakerStatus
+from src.resiliens.circuit_breaker import ResultCache
 
 
 class TestCircuitBreaker(unittest.TestCase):
@@ -16,6 +24,13 @@ class TestCircuitBreaker(unittest.TestCase):
     def setUp(self) -> None:
         self.failed_count = 0
         self.successful_count = 0
+        # Most tests decorate a local function named "test_func", each with a
+        # circuit breaker of its own that replaces the previous one by design.
+        self.name_collision = CircuitBreakerManager.name_collision
+        CircuitBreakerManager.name_collision = CircuitBreakerManager.REPLACE
+
+    def tearDown(self) -> None:
+        CircuitBreakerManager.name_collision = self.name_collision
 
     @CircuitBreaker(failures=MAX_ATTEMPTS, sliding_window_size=WINDOW_SIZE)
     def fake_successful_http_call(self):
@@ -81,3 +96,385 @@ class TestCircuitBreaker(unittest.TestCase):
         actual = self.circuit_breaker.status
 
         self.assertEqual(expected, actual)
+
+    def test_coroutineFails_failuresAreRecordedAndCircuitOpens(self):
+        circuit_breaker = CircuitBreaker(failures=self.MAX_ATTEMPTS)
+
+        @circuit_breaker
+        async def test_func():
+            await asyncio.sleep(0)
+            self.failed_count += 1
+            raise ConnectionError()
+
+        async def run():
+            for _ in range(0, self.MAX_ATTEMPTS * 2):
+                try:
+                    await test_func()
+                except ConnectionError:
+                    pass
+                except CircuitBreakerException:
+                    pass
+
+        asyncio.run(run())
+        self.assertEqual(self.MAX_ATTEMPTS, self.failed_count)
+        self.assertTrue(circuit_breaker.opened)
+
+    def test_coroutineOpenWithAsyncFallback_fallbackIsAwaited(self):
+
+        async def fallback(foo):
+            await asyncio.sleep(0)
+            return "fallback " + foo
+
+        @CircuitBreaker(failures=1, fallback=fallback)
+        async def test_func(foo):
+            raise ConnectionError()
+
+        async def run():
+            return [await test_func("bar") for _ in range(0, 3)]
+
+        self.assertEqual(["fallback bar"] * 3, asyncio.run(run()))
+
+    def test_coroutineIsCancelled_cancellationIsNotRecorded(self):
+        circuit_breaker = CircuitBreaker(failures=1)
+
+        @circuit_breaker
+        async def test_func():
+            await asyncio.sleep(10)
+
+        async def run():
+            task = asyncio.ensure_future(test_func())
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertEqual(0, circuit_breaker.failure_count)
+        self.assertTrue(circuit_breaker.closed)
+
+    def test_asyncGeneratorFailsMidStream_failureIsRecorded(self):
+        circuit_breaker = CircuitBreaker(failures=1)
+
+        @circuit_breaker
+        async def test_gen():
+            yield 1
+            raise ConnectionError()
+
+        async def run():
+            results = []
+            with self.assertRaises(ConnectionError):
+                async for el in test_gen():
+                    results.append(el)
+            return results
+
+        self.assertEqual([1], asyncio.run(run()))
+        self.assertTrue(circuit_breaker.opened)
+
+    def test_manyThreadsFailConcurrently_noFailuresAreLost(self):
+        threads, calls_per_thread = 64, 100
+        total = threads * calls_per_thread
+        circuit_breaker = CircuitBreaker(failures=total + 1,
+                                         sliding_window_size=total)
+
+        @circuit_breaker
+        def test_func():
+            raise ConnectionError()
+
+        def run():
+            for _ in range(0, calls_per_thread):
+                try:
+                    test_func()
+                except ConnectionError:
+                    pass
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                for future in [executor.submit(run) for _ in range(0, threads)]:
+                    future.result()
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        self.assertEqual(total, circuit_breaker.failure_count)
+        self.assertEqual(total,
+                         circuit_breaker._sliding_window.get_failure_count())
+        self.assertTrue(circuit_breaker.closed)
+
+    def test_manyThreadsFailConcurrently_opensOnThreshold(self):
+        threads = 64
+        circuit_breaker = CircuitBreaker(failures=threads)
+
+        @circuit_breaker
+        def test_func():
+            time.sleep(0.01)
+            raise ConnectionError()
+
+        def run():
+            try:
+                test_func()
+            except ConnectionError:
+                pass
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for future in [executor.submit(run) for _ in range(0, threads)]:
+                future.result()
+
+        self.assertEqual(threads, circuit_breaker.failure_count)
+        self.assertTrue(circuit_breaker.opened)
+
+    def test_timeWindowFailureRateReached_circuitOpens(self):
+        circuit_breaker = CircuitBreaker(sliding_window_seconds=60,
+                                         minimum_calls=10,
+                                         failure_rate_threshold=50)
+        should_fail = False
+
+        @circuit_breaker
+        def test_func():
+            if should_fail:
+                raise ConnectionError()
+
+        for _ in range(0, 5):
+            test_func()
+        should_fail = True
+        for _ in range(0, 4):
+            self.assertRaises(ConnectionError, test_func)
+        self.assertTrue(circuit_breaker.closed)
+
+        self.assertRaises(ConnectionError, test_func)
+        self.assertTrue(circuit_breaker.opened)
+
+    def test_belowMinimumCalls_circuitStaysClosed(self):
+        circuit_breaker = CircuitBreaker(failures=1,
+                                         sliding_window_size=self.WINDOW_SIZE,
+                                         minimum_calls=self.WINDOW_SIZE)
+
+        @circuit_breaker
+        def test_func():
+            raise ConnectionError()
+
+        for _ in range(0, self.WINDOW_SIZE - 1):
+            self.assertRaises(ConnectionError, test_func)
+        self.assertTrue(circuit_breaker.closed)
+
+    def test_halfOpenWithConcurrentCallers_onlyPermittedTrialCallsGoThrough(
+            self):
+        permitted = 3
+        circuit_breaker = CircuitBreaker(
+            failures=1,
+            reset_timeout=10,
+            permitted_calls_in_half_open=permitted)
+        release = Event()
+        should_fail = True
+
+        @circuit_breaker
+        def test_func():
+            if should_fail:
+                raise ConnectionError()
+            self.successful_count += 1
+            release.wait(5)
+
+        self.assertRaises(ConnectionError, test_func)
+        self.assertTrue(circuit_breaker.opened)
+        should_fail = False
+        time.sleep(0.02)
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            futures = [executor.submit(test_func) for _ in range(0, 32)]
+            time.sleep(0.2)
+            release.set()
+            rejected = sum(
+                isinstance(future.exception(), CircuitBreakerException)
+                for future in futures)
+
+        self.assertEqual(permitted, self.successful_count)
+        self.assertEqual(32 - permitted, rejected)
+        self.assertTrue(circuit_breaker.closed)
+
+    def test_halfOpenTrialCallFails_circuitOpensAgain(self):
+        circuit_breaker = CircuitBreaker(failures=1,
+                                         reset_timeout=10,
+                                         permitted_calls_in_half_open=2)
+
+        @circuit_breaker
+        def test_func():
+            self.failed_count += 1
+            raise ConnectionError()
+
+        self.assertRaises(ConnectionError, test_func)
+        time.sleep(0.02)
+        self.assertEqual(CircuitBreakerStatus.half_open, circuit_breaker.status)
+
+        self.assertRaises(ConnectionError, test_func)
+        self.assertTrue(circuit_breaker.opened)
+        self.assertRaises(CircuitBreakerException, test_func)
+        self.assertEqual(2, self.failed_count)
+
+    def test_halfOpenGeneratorNeverIterated_trialPermitIsNotTaken(self):
+        circuit_breaker = CircuitBreaker(failures=1, reset_timeout=10)
+        fail = True
+
+        @circuit_breaker
+        def test_gen():
+            if fail:
+                raise ConnectionError()
+            yield 1
+
+        self.assertRaises(ConnectionError, list, test_gen())
+        time.sleep(0.02)
+        test_gen()
+        test_gen()
+        fail = False
+
+        self.assertEqual([1], list(test_gen()))
+        self.assertTrue(circuit_breaker.closed)
+
+    def test_slowCallRateReached_circuitOpensWithoutExceptions(self):
+        circuit_breaker = CircuitBreaker(sliding_window_size=self.WINDOW_SIZE,
+                                         minimum_calls=4,
+                                         slow_call_duration_threshold=20,
+                                         slow_call_rate_threshold=50)
+
+        @circuit_breaker
+        def test_func(delay):
+            time.sleep(delay)
+            self.successful_count += 1
+
+        test_func(0)
+        test_func(0)
+        test_func(0.03)
+        self.assertTrue(circuit_breaker.closed)
+        test_func(0.03)
+        self.assertTrue(circuit_breaker.opened)
+        self.assertRaises(CircuitBreakerException, test_func, 0)
+        self.assertEqual(4, self.successful_count)
+
+    def test_slowCallThresholdWithoutWindow_raisesTypeError(self):
+        self.assertRaises(TypeError,
+                          CircuitBreaker,
+                          slow_call_duration_threshold=100)
+
+    def test_circuitOpenWithCache_lastKnownGoodResultIsServed(self):
+        should_fail = False
+
+        def fallback(key):
+            return "fallback " + key
+
+        @CircuitBreaker(failures=2, cache=ResultCache(), fallback=fallback)
+        def test_func(key):
+            if should_fail:
+                raise ConnectionError()
+            return "fresh " + key
+
+        self.assertEqual("fresh a", test_func("a"))
+        should_fail = True
+        self.assertEqual("fresh a", test_func("a"))
+        self.assertEqual("fallback b", test_func("b"))
+        # Open now, cached results keep flowing
+        self.assertEqual("fresh a", test_func("a"))
+        self.assertEqual("fallback b", test_func("b"))
+
+    def test_coroutineOpenWithCache_lastKnownGoodResultIsServed(self):
+        circuit_breaker = CircuitBreaker(failures=1, cache=ResultCache())
+        should_fail = False
+
+        @circuit_breaker
+        async def test_func(key):
+            if should_fail:
+                raise ConnectionError()
+            return key
+
+        async def run():
+            self.assertEqual("a", await test_func("a"))
+            nonlocal should_fail
+            should_fail = True
+            self.assertEqual("a", await test_func("a"))
+            self.assertTrue(circuit_breaker.opened)
+            self.assertEqual("a", await test_func("a"))
+            with self.assertRaises(CircuitBreakerException):
+                await test_func("b")
+
+        asyncio.run(run())
+
+    def test_callSucceedsAfterOpening_circuitStaysOpen(self):
+        circuit_breaker = CircuitBreaker(failures=1, metrics=False)
+        started = Event()
+        release = Event()
+
+        @circuit_breaker
+        def test_func(block):
+            if block:
+                started.set()
+                release.wait()
+                return True
+            raise ConnectionError()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            in_flight = executor.submit(test_func, True)
+            started.wait()
+            with self.assertRaises(ConnectionError):
+                test_func(False)
+            release.set()
+            self.assertTrue(in_flight.result())
+
+        self.assertTrue(circuit_breaker.opened)
+
+    def test_circuitOpenWithRejectedValue_valueIsReturned(self):
+        circuit_breaker = CircuitBreaker(failures=1, rejected_value=None)
+
+        @circuit_breaker
+        def test_func():
+            raise ConnectionError()
+
+        with self.assertRaises(ConnectionError):
+            test_func()
+        self.assertIsNone(test_func())
+
+    def test_reuseRejectionException_sameExceptionWithFreshTraceback(self):
+        circuit_breaker = CircuitBreaker(reuse_rejection_exception=True)
+        test_func = circuit_breaker(lambda: True)
+        circuit_breaker.force_open()
+
+        rejections = []
+        for _ in range(0, 3):
+            try:
+                test_func()
+            except CircuitBreakerException as e:
+                rejections.append((e, len(traceback.extract_tb(e.__traceback__))))
+
+        self.assertIs(rejections[0][0], rejections[2][0])
+        self.assertEqual(rejections[0][1], rejections[2][1])
+
+    def test_reuseRejectionExceptionWhileHandlingAnother_contextIsNotKept(self):
+        circuit_breaker = CircuitBreaker(reuse_rejection_exception=True)
+        test_func = circuit_breaker(lambda: True)
+        circuit_breaker.force_open()
+
+        try:
+            raise ValueError()
+        except ValueError:
+            with self.assertRaises(CircuitBreakerException):
+                test_func()
+        with self.assertRaises(CircuitBreakerException) as rejection:
+            test_func()
+
+        self.assertIsNone(rejection.exception.__context__)
+        self.assertIsNone(rejection.exception.__cause__)
+
+    def test_rejectedValueWithReusedException_raisesTypeError(self):
+        with self.assertRaises(TypeError):
+            CircuitBreaker(rejected_value=None, reuse_rejection_exception=True)
+
+    def test_rejectedValueOnGenerator_raisesTypeError(self):
+        def generator():
+            yield 1
+
+        with self.assertRaises(TypeError):
+            CircuitBreaker(rejected_value=None)(generator)
+
+    def test_rejectionMessage_isFormattedOnce(self):
+        circuit_breaker = CircuitBreaker()
+        circuit_breaker.force_open()
+        exception = CircuitBreakerException(circuit_breaker)
+
+        self.assertIs(str(exception), str(exception))
@@ -0,0 +1,104 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import gc
+import unittest
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from src.resiliens.circuit_breaker import CircuitBreaker
+from src.resiliens.circuit_breaker import CircuitBreakerManager
+
+
+class TestCircuitBreakerManager(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.name_collision = CircuitBreakerManager.name_collision
+        # Circuit breakers of other tests may still be open
+        CircuitBreakerManager.force_all_reset()
+
+    def tearDown(self) -> None:
+        CircuitBreakerManager.name_collision = self.name_collision
+
+    @staticmethod
+    def _circuit_breaker(name: str, **kwargs):
+        circuit_breaker = CircuitBreaker(name=name, **kwargs)
+        circuit_breaker(lambda: None)
+        return circuit_breaker
+
+    def test_circuitBreakerOpensAndCloses_indexFollows(self):
+        circuit_breaker = self._circuit_breaker("manager_index")
+        self.assertTrue(CircuitBreakerManager.all_closed())
+
+        circuit_breaker.force_open()
+        self.assertFalse(CircuitBreakerManager.all_closed())
+        self.assertIn(circuit_breaker, list(CircuitBreakerManager.get_open()))
+        self.assertNotIn(circuit_breaker, list(CircuitBreakerManager.get_closed()))
+
+        circuit_breaker.force_reset()
+        self.assertTrue(CircuitBreakerManager.all_closed())
+        self.assertNotIn(circuit_breaker, list(CircuitBreakerManager.get_open()))
+
+    def test_halfOpen_isNeitherOpenNorClosed(self):
+        circuit_breaker = self._circuit_breaker("manager_half_open", reset_timeout=0)
+        circuit_breaker.force_open()
+
+        self.assertFalse(CircuitBreakerManager.all_closed())
+        self.assertNotIn(circuit_breaker, list(CircuitBreakerManager.get_open()))
+        self.assertNotIn(circuit_breaker, list(CircuitBreakerManager.get_closed()))
+        circuit_breaker.force_reset()
+
+    def test_circuitBreakerGarbageCollected_isUnregistered(self):
+        circuit_breaker = self._circuit_breaker("manager_collected")
+        circuit_breaker.force_open()
+        self.assertIs(circuit_breaker, CircuitBreakerManager.get("manager_collected"))
+
+        del circuit_breaker
+        gc.collect()
+
+        self.assertIsNone(CircuitBreakerManager.get("manager_collected"))
+        self.assertTrue(CircuitBreakerManager.all_closed())
+
+    def test_circuitBreakers_readOnlyMappingOfRegisteredOnes(self):
+        circuit_breaker = self._circuit_breaker("manager_mapping")
+
+        circuit_breakers = CircuitBreakerManager.circuit_breakers
+        self.assertIs(circuit_breaker, circuit_breakers["manager_mapping"])
+        with self.assertRaises(TypeError):
+            circuit_breakers["manager_mapping"] = None
+
+    def test_nameCollision_followsPolicy(self):
+        first = self._circuit_breaker("manager_collision")
+
+        CircuitBreakerManager.name_collision = CircuitBreakerManager.RAISE
+        with self.assertRaises(ValueError):
+            self._circuit_breaker("manager_collision")
+        self.assertIs(first, CircuitBreakerManager.get("manager_collision"))
+
+        CircuitBreakerManager.name_collision = CircuitBreakerManager.WARN
+        with self.assertWarns(RuntimeWarning):
+            second = self._circuit_breaker("manager_collision")
+        self.assertIs(second, CircuitBreakerManager.get("manager_collision"))
+
+        CircuitBreakerManager.name_collision = CircuitBreakerManager.REPLACE
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            third = self._circuit_breaker("manager_collision")
+        self.assertIs(third, CircuitBreakerManager.get("manager_collision"))
+
+    def test_sameCircuitBreakerDecoratesTwice_isNoCollision(self):
+        CircuitBreakerManager.name_collision = CircuitBreakerManager.RAISE
+        circuit_breaker = self._circuit_breaker("manager_reused")
+        circuit_breaker(lambda: None)
+
+        self.assertIs(circuit_breaker, CircuitBreakerManager.get("manager_reused"))
+
+    def test_concurrentRegistration_noneIsLost(self):
+        names = [f"manager_concurrent_{i}" for i in range(0, 500)]
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            circuit_breakers = list(executor.map(self._circuit_breaker, names))
+
+        for name, circuit_breaker in zip(names, circuit_breakers):
+            self.assertIs(circuit_breaker, CircuitBreakerManager.get(name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+from src.resiliens.concurrencylimiter import ConcurrencyLimiter, ConcurrencyLimitExceededException, AIMDLimit, \
+    GradientLimit, ConcurrencyLimit
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+
+    def test_limitReached_excessCallsAreRejected(self):
+        release = Event()
+        limiter = ConcurrencyLimiter(limit=AIMDLimit(initial_limit=3), metrics=True)
+
+        @limiter
+        def slow_call():
+            release.wait(5)
+            return True
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(slow_call) for _ in range(0, 10)]
+            time.sleep(0.1)
+            self.assertEqual(3, limiter.in_flight)
+            release.set()
+            results = [future.exception() or future.result() for future in futures]
+
+        self.assertEqual(3, results.count(True))
+        self.assertEqual(7, len([r for r in results if isinstance(r, ConcurrencyLimitExceededException)]))
+        self.assertEqual(0, limiter.in_flight)
+        self.assertEqual(7, limiter.metrics.snapshot().rejections)
+
+    def test_callsFail_limitShrinks(self):
+        limiter = ConcurrencyLimiter(limit=AIMDLimit(initial_limit=10, backoff_ratio=0.5),
+                                     expected_exception=ConnectionError)
+
+        @limiter
+        def failed_call():
+            raise ConnectionError()
+
+        with self.assertRaises(ConnectionError):
+            failed_call()
+        self.assertEqual(5, limiter.limit)
+        for _ in range(0, 10):
+            with self.assertRaises(ConnectionError):
+                failed_call()
+        self.assertEqual(1, limiter.limit)
+
+    def test_unexpectedException_countsAsSuccess(self):
+        limiter = ConcurrencyLimiter(limit=AIMDLimit(initial_limit=2), expected_exception=ConnectionError)
+
+        @limiter
+        def invalid_call():
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            invalid_call()
+        self.assertEqual(3, limiter.limit)
+
+    def test_aimdLimitInUse_limitGrows(self):
+        limit = AIMDLimit(initial_limit=10, max_limit=12)
+        limit.update(0.01, in_flight=2, failed=False)
+        self.assertEqual(10, limit.limit)
+        for _ in range(0, 5):
+            limit.update(0.01, in_flight=6, failed=False)
+        self.assertEqual(12, limit.limit)
+
+    def test_aimdCallSlowerThanTimeout_limitShrinks(self):
+        limit = AIMDLimit(initial_limit=10, backoff_ratio=0.5, timeout=100)
+        limit.update(0.2, in_flight=10, failed=False)
+        self.assertEqual(5, limit.limit)
+
+    def test_gradientLatencyRises_limitShrinks(self):
+        limit = GradientLimit(initial_limit=50, smoothing=0.5)
+        for _ in range(0, 20):
+            limit.update(0.01, in_flight=50, failed=False)
+        grown = limit.limit
+        self.assertGreater(grown, 50)
+        for _ in range(0, 10):
+            limit.update(0.1, in_flight=grown, failed=False)
+        self.assertLess(limit.limit, grown / 2)
+
+    def test_gradientLimitNotInUse_limitUnchanged(self):
+        limit = GradientLimit(initial_limit=50)
+        for _ in range(0, 20):
+            limit.update(0.01, in_flight=1, failed=False)
+        self.assertEqual(50, limit.limit)
+
+    def test_coroutinesOverLimit_rejectedWithFallback(self):
+        limiter = ConcurrencyLimiter(limit=AIMDLimit(initial_limit=2), fallback=lambda: "fallback")
+
+        @limiter
+        async def slow_call():
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(*[slow_call() for _ in range(0, 4)])
+
+        self.assertEqual(["result", "result", "fallback", "fallback"], asyncio.run(run()))
+        self.assertEqual(0, limiter.in_flight)
+
+    def test_cancelledCall_limitUnchanged(self):
+        limiter = ConcurrencyLimiter(limit=AIMDLimit(initial_limit=2, backoff_ratio=0.5))
+
+        @limiter
+        async def slow_call():
+            await asyncio.sleep(5)
+
+        async def run():
+            task = asyncio.ensure_future(slow_call())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertEqual(2, limiter.limit)
+        self.assertEqual(0, limiter.in_flight)
+
+    def test_generators_limitedWhileIterated(self):
+        limiter = ConcurrencyLimiter(limit=AIMDLimit(initial_limit=1))
+
+        @limiter
+        def stream():
+            yield 1
+            yield 2
+
+        iterator = stream()
+        next(iterator)
+        self.assertEqual(1, limiter.in_flight)
+        with self.assertRaises(ConcurrencyLimitExceededException):
+            list(stream())
+        self.assertEqual([2], list(iterator))
+        self.assertEqual(0, limiter.in_flight)
+
+        @ConcurrencyLimiter
+        async def async_stream():
+            yield 1
+
+        async def run():
+            return [el async for el in async_stream()]
+
+        self.assertEqual([1], asyncio.run(run()))
+
+    def test_invalidLimits_raiseValueError(self):
+        with self.assertRaises(ValueError):
+            AIMDLimit(initial_limit=0)
+        with self.assertRaises(ValueError):
+            GradientLimit(initial_limit=10, max_limit=5)
+
+    def test_limitWithoutUpdate_cannotBeCreated(self):
+
+        class IncompleteLimit(ConcurrencyLimit):
+
+            @property
+            def limit(self) -> int:
+                return 1
+
+        with self.assertRaises(TypeError):
+            IncompleteLimit()
@@ -0,0 +1,129 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+import time
+import unittest
+
+from src.resiliens.hedge import Hedge
+
+
+class TestHedge(unittest.TestCase):
+    DELAY: int = 20
+
+    attempts: int
+
+    def setUp(self) -> None:
+        self.attempts = 0
+
+    def test_firstAttemptIsSlow_hedgedAttemptResultIsReturned(self):
+
+        @Hedge(delay=self.DELAY, max_hedge_ratio=1)
+        def slow_first_call():
+            self.attempts += 1
+            if self.attempts == 1:
+                time.sleep(0.5)
+                return "slow"
+            return "fast"
+
+        start = time.monotonic()
+        self.assertEqual("fast", slow_first_call())
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(2, self.attempts)
+
+    def test_firstAttemptIsFast_noHedgeIsFired(self):
+
+        @Hedge(delay=self.DELAY * 10)
+        def fast_call():
+            self.attempts += 1
+            return "fast"
+
+        self.assertEqual("fast", fast_call())
+        self.assertEqual(1, self.attempts)
+
+    def test_allAttemptsFail_lastExceptionIsRaised(self):
+
+        @Hedge(delay=self.DELAY, max_hedge_ratio=1)
+        def failing_call():
+            self.attempts += 1
+            time.sleep(0.05)
+            raise ConnectionError()
+
+        self.assertRaises(ConnectionError, failing_call)
+        self.assertEqual(2, self.attempts)
+
+    def test_hedgeRatioExhausted_noMoreHedgesAreFired(self):
+
+        @Hedge(delay=1, max_hedge_ratio=0)
+        async def slow_call():
+            self.attempts += 1
+            await asyncio.sleep(0.02)
+
+        async def run():
+            for _ in range(0, 5):
+                await slow_call()
+
+        asyncio.run(run())
+        # Only the initial hedge token is available
+        self.assertEqual(6, self.attempts)
+
+    def test_coroutineFirstAttemptIsSlow_slowAttemptIsCancelled(self):
+        cancelled = []
+
+        @Hedge(delay=self.DELAY, max_hedge_ratio=1)
+        async def slow_first_call():
+            self.attempts += 1
+            if self.attempts == 1:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+            return "fast"
+
+        self.assertEqual("fast", asyncio.run(slow_first_call()))
+        self.assertEqual([True], cancelled)
+
+    def test_delayPercentile_delayFollowsObservedDurations(self):
+        hedge = Hedge(delay=1000, delay_percentile=95)
+
+        @hedge
+        async def call():
+            await asyncio.sleep(0.01)
+
+        async def run():
+            for _ in range(0, 30):
+                await call()
+
+        asyncio.run(run())
+        self.assertLess(hedge.delay, 100)
+
+    def test_delayPercentile_followsFirstAttemptsThatFail(self):
+        hedge = Hedge(delay=1000, delay_percentile=50)
+
+        @hedge
+        async def call():
+            await asyncio.sleep(0.05)
+            raise ConnectionError()
+
+        async def run():
+            for _ in range(0, 30):
+                with self.assertRaises(ConnectionError):
+                    await call()
+
+        asyncio.run(run())
+        self.assertGreaterEqual(hedge.delay, 50)
+        self.assertLess(hedge.delay, 1000)
+
+    def test_delayPercentile_hedgesWinning_delayFollowsFirstAttempts(self):
+        hedge = Hedge(delay=5, delay_percentile=50, max_hedge_ratio=1)
+        attempts = []
+
+        @hedge
+        def call():
+            attempts.append(None)
+            # Only first attempts are slow, so hedges win every call
+            time.sleep(0.1 if len(attempts) % 2 else 0)
+
+        for _ in range(0, 30):
+            call()
+        time.sleep(0.3)
+        self.assertGreaterEqual(hedge.delay, 100)
@@ -0,0 +1,124 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+import time
+import unittest
+
+from src.resiliens.circuit_breaker import KeyedCircuitBreaker, CircuitBreakerException, CircuitBreakerManager
+
+
+class TestKeyedCircuitBreaker(unittest.TestCase):
+
+    def test_oneKeyFails_otherKeysStayClosed(self):
+        circuit_breaker = KeyedCircuitBreaker(key=lambda host, fail: host, failures=2)
+
+        @circuit_breaker
+        def call(host, fail):
+            if fail:
+                raise ValueError(host)
+            return host
+
+        for _ in range(0, 2):
+            with self.assertRaises(ValueError):
+                call("a", True)
+        with self.assertRaises(CircuitBreakerException):
+            call("a", False)
+        self.assertEqual("b", call("b", False))
+        self.assertTrue(circuit_breaker.get("a").opened)
+        self.assertTrue(circuit_breaker.get("b").closed)
+        self.assertEqual("call[a]", circuit_breaker.get("a").name)
+
+    def test_moreKeysThanMaxKeys_leastRecentlyUsedEvicted(self):
+        circuit_breaker = KeyedCircuitBreaker(key=lambda key: key, max_keys=3)
+        call = circuit_breaker(lambda key: key)
+
+        for key in ("a", "b", "c"):
+            call(key)
+        call("a")
+        call("d")
+        self.assertEqual(3, len(circuit_breaker))
+        self.assertIsNone(circuit_breaker.get("b"))
+        for key in ("a", "c", "d"):
+            self.assertIsNotNone(circuit_breaker.get(key))
+
+        for key in range(0, 1000):
+            call(key)
+        self.assertEqual(3, len(circuit_breaker))
+
+    def test_openCircuitBreaker_evictedLast(self):
+        circuit_breaker = KeyedCircuitBreaker(key=lambda key: key, max_keys=2, failures=1)
+
+        @circuit_breaker
+        def call(key):
+            if key == "failing":
+                raise ValueError(key)
+            return key
+
+        with self.assertRaises(ValueError):
+            call("failing")
+        call("b")
+        call("c")
+        self.assertTrue(circuit_breaker.get("failing").opened)
+        self.assertIsNone(circuit_breaker.get("b"))
+
+    def test_idleForLongerThanTtl_closedCircuitBreakersEvicted(self):
+        circuit_breaker = KeyedCircuitBreaker(key=lambda key: key, idle_ttl=50, failures=1)
+
+        @circuit_breaker
+        def call(key):
+            if key == "failing":
+                raise ValueError(key)
+            return key
+
+        call("a")
+        with self.assertRaises(ValueError):
+            call("failing")
+        time.sleep(0.1)
+        call("b")
+        self.assertIsNone(circuit_breaker.get("a"))
+        self.assertTrue(circuit_breaker.get("failing").opened)
+        self.assertEqual(2, len(circuit_breaker))
+
+    def test_asyncFunctions_keyedToo(self):
+        circuit_breaker = KeyedCircuitBreaker(key=lambda host, fail: host, failures=1)
+
+        @circuit_breaker
+        async def call(host, fail):
+            if fail:
+                raise ValueError(host)
+            return host
+
+        @KeyedCircuitBreaker(key=lambda host: host)
+        async def stream(host):
+            yield host
+            yield host
+
+        async def run():
+            with self.assertRaises(ValueError):
+                await call("a", True)
+            with self.assertRaises(CircuitBreakerException):
+                await call("a", False)
+            self.assertEqual("b", await call("b", False))
+            self.assertEqual(["c", "c"], [el async for el in stream("c")])
+
+        asyncio.run(run())
+
+    def test_metrics_recordedAcrossKeys(self):
+        circuit_breaker = KeyedCircuitBreaker(key=lambda key: key, name="keyed_metrics", metrics=True)
+        call = circuit_breaker(lambda key: key)
+        for key in range(0, 5):
+            call(key)
+        snapshot = circuit_breaker.metrics.snapshot()
+        self.assertEqual("keyed_metrics", snapshot.name)
+        self.assertEqual(5, snapshot.successes)
+
+    def test_circuitBreakersOfKeys_notRegistered(self):
+        call = KeyedCircuitBreaker(key=lambda key: key, name="keyed_unregistered")(lambda key: key)
+        call("a")
+        self.assertIsNone(CircuitBreakerManager.get("keyed_unregistered[a]"))
+        self.assertIsNone(CircuitBreakerManager.get("keyed_unregistered"))
+
+    def test_sharedStateOptions_raiseTypeError(self):
+        with self.assertRaises(TypeError):
+            KeyedCircuitBreaker(key=lambda key: key, shared_memory_path="/dev/shm/keyed")
+        with self.assertRaises(TypeError):
+            KeyedCircuitBreaker(key=lambda key: key, unknown_option=1)
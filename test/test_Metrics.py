@@ -0,0 +1,162 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+import unittest
+from threading import Thread
+
+from src.resiliens.circuit_breaker import CircuitBreaker
+from src.resiliens.circuit_breaker import CircuitBreakerException
+from src.resiliens.circuit_breaker.manager.CircuitBreakerManager import CircuitBreakerManager
+from src.resiliens.metrics import Metrics, export_prometheus
+from src.resiliens.retryable import Retryable
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_durationsRecorded_bucketsAreCumulative(self):
+        metrics = Metrics("test", "test", buckets=(0.1, 1))
+        metrics.record_success(0.05)
+        metrics.record_success(0.5)
+        metrics.record_failure(5)
+        metrics.record_rejection()
+        metrics.record_retry()
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(2, snapshot.successes)
+        self.assertEqual(1, snapshot.failures)
+        self.assertEqual(1, snapshot.rejections)
+        self.assertEqual(1, snapshot.retries)
+        self.assertEqual(3, snapshot.calls)
+        self.assertEqual(3, snapshot.duration_count)
+        self.assertAlmostEqual(5.55, snapshot.duration_sum)
+        self.assertEqual(((0.1, 1), (1, 2), (float("inf"), 3)), snapshot.buckets)
+
+    def test_recordedFromManyThreads_snapshotAddsUpShards(self):
+        metrics = Metrics("test", "test")
+
+        def record():
+            for _ in range(0, 1000):
+                metrics.record_success(0.001)
+
+        threads = [Thread(target=record) for _ in range(0, 8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(8000, metrics.snapshot().successes)
+
+    def test_threadsFinish_theirShardsAreRetired(self):
+        metrics = Metrics("test", "test")
+
+        for _ in range(0, 200):
+            thread = Thread(target=metrics.record_success, args=(0.001, ))
+            thread.start()
+            thread.join()
+
+        self.assertLessEqual(len(metrics._shards), 1)
+        self.assertEqual(200, metrics.snapshot().successes)
+        self.assertEqual(200, metrics.snapshot().duration_count)
+
+    def test_circuitBreaker_countsOutcomesAndRejections(self):
+        circuit_breaker = CircuitBreaker(failures=2, name="metrics_cb", metrics=True)
+
+        @circuit_breaker
+        def call(fail):
+            if fail:
+                raise ValueError()
+            return True
+
+        call(False)
+        for _ in range(0, 2):
+            with self.assertRaises(ValueError):
+                call(True)
+        with self.assertRaises(CircuitBreakerException):
+            call(False)
+
+        snapshot = CircuitBreakerManager.snapshot()["metrics_cb"]
+        self.assertEqual("circuit_breaker", snapshot.kind)
+        self.assertEqual(1, snapshot.successes)
+        self.assertEqual(2, snapshot.failures)
+        self.assertEqual(1, snapshot.rejections)
+        # Only the first of every 16 calls is timed
+        self.assertEqual(1, snapshot.duration_count)
+
+    def test_circuitBreakerClosed_sampleOfCallsIsTimed(self):
+        circuit_breaker = CircuitBreaker(name="metrics_cb_sampled", metrics=True)
+        call = circuit_breaker(lambda: True)
+        for _ in range(0, 64):
+            call()
+
+        snapshot = circuit_breaker.metrics.snapshot()
+        self.assertEqual(64, snapshot.successes)
+        self.assertEqual(4, snapshot.duration_count)
+
+    def test_circuitBreakerWithSlowCallThreshold_everyCallIsTimed(self):
+        circuit_breaker = CircuitBreaker(name="metrics_cb_slow", metrics=True, sliding_window_size=10,
+                                         slow_call_duration_threshold=1000)
+        call = circuit_breaker(lambda: True)
+        for _ in range(0, 20):
+            call()
+
+        self.assertEqual(20, circuit_breaker.metrics.snapshot().duration_count)
+
+    def test_metricsDisabled_nothingIsRecorded(self):
+        circuit_breaker = CircuitBreaker(name="no_metrics_cb", metrics=False)
+        retryable = Retryable(metrics=False)
+
+        self.assertIsNone(circuit_breaker.metrics)
+        self.assertIsNone(retryable.metrics)
+        self.assertNotIn("no_metrics_cb", CircuitBreakerManager.snapshot())
+
+    def test_retryable_countsRetriesAndOutcome(self):
+        retryable = Retryable(max_retries=3, backoff=0, metrics=True)
+        attempts = []
+
+        @retryable
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ValueError()
+            return True
+
+        self.assertTrue(flaky())
+
+        snapshot = retryable.metrics.snapshot()
+        self.assertEqual("flaky", snapshot.name)
+        self.assertEqual("retryable", snapshot.kind)
+        self.assertEqual(1, snapshot.successes)
+        self.assertEqual(0, snapshot.failures)
+        self.assertEqual(2, snapshot.retries)
+
+    def test_retryableCoroutineGivesUp_failureIsCounted(self):
+        retryable = Retryable(max_retries=2, backoff=0, metrics=True)
+
+        @retryable
+        async def failing():
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            asyncio.run(failing())
+
+        snapshot = retryable.metrics.snapshot()
+        self.assertEqual(1, snapshot.failures)
+        self.assertEqual(1, snapshot.retries)
+
+    def test_exportPrometheus_rendersTextFormat(self):
+        metrics = Metrics("exported", "test", buckets=(0.1, ))
+        metrics.record_success(0.05)
+        metrics.record_failure(0.5)
+
+        text = export_prometheus([metrics.snapshot()])
+
+        self.assertIn("# TYPE resiliens_calls_total counter\n", text)
+        self.assertIn('resiliens_calls_total{kind="test",name="exported",outcome="success"} 1\n', text)
+        self.assertIn('resiliens_calls_total{kind="test",name="exported",outcome="failure"} 1\n', text)
+        self.assertIn('resiliens_call_duration_seconds_bucket{kind="test",name="exported",le="0.1"} 1\n', text)
+        self.assertIn('resiliens_call_duration_seconds_bucket{kind="test",name="exported",le="+Inf"} 2\n', text)
+        self.assertIn('resiliens_call_duration_seconds_count{kind="test",name="exported"} 2\n', text)
+        self.assertTrue(text.endswith("\n"))
+
+
+if __name__ == '__main__':
+    unittest.main()
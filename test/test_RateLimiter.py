@@ -0,0 +1,93 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+import time
+import unittest
+
+from src.resiliens.ratelimiter import RateLimiter, RateLimitExceededException
+
+
+class TestRateLimiter(unittest.TestCase):
+    RATE: int = 20
+    BURST: int = 5
+
+    call_count: int
+
+    def setUp(self) -> None:
+        self.call_count = 0
+
+    def test_burstExhausted_excessCallsAreRejected(self):
+
+        @RateLimiter(rate=self.RATE, burst=self.BURST)
+        def limited_call():
+            self.call_count += 1
+
+        for _ in range(0, self.BURST):
+            limited_call()
+        self.assertRaises(RateLimitExceededException, limited_call)
+        self.assertEqual(self.BURST, self.call_count)
+
+    def test_timePasses_callsAreAllowedAgain(self):
+
+        @RateLimiter(rate=self.RATE)
+        def limited_call():
+            self.call_count += 1
+
+        limited_call()
+        self.assertRaises(RateLimitExceededException, limited_call)
+        time.sleep(1 / self.RATE)
+        limited_call()
+        self.assertEqual(2, self.call_count)
+
+    def test_blockingWithMaxWait_callsAreDelayedToRate(self):
+
+        @RateLimiter(rate=self.RATE, max_wait=1000)
+        def limited_call():
+            self.call_count += 1
+
+        start = time.monotonic()
+        for _ in range(0, 5):
+            limited_call()
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(5, self.call_count)
+        self.assertGreaterEqual(elapsed, 4 / self.RATE * 0.9)
+
+    def test_callIsRejected_fallbackIsCalled(self):
+
+        def fallback(foo):
+            return "fallback " + foo
+
+        @RateLimiter(rate=self.RATE, fallback=fallback)
+        def limited_call(foo):
+            return foo
+
+        self.assertEqual("bar", limited_call("bar"))
+        self.assertEqual("fallback bar", limited_call("bar"))
+
+    def test_coroutines_areDelayedWithoutBlockingTheLoop(self):
+
+        @RateLimiter(rate=self.RATE, burst=2, max_wait=None)
+        async def limited_call():
+            self.call_count += 1
+            return time.monotonic()
+
+        async def run():
+            return await asyncio.gather(*[limited_call() for _ in range(0, 6)])
+
+        start = time.monotonic()
+        times = asyncio.run(run())
+        self.assertEqual(6, self.call_count)
+        self.assertGreaterEqual(max(times) - start, 4 / self.RATE * 0.9)
+
+    def test_coroutineOverRate_isRejected(self):
+
+        @RateLimiter(rate=self.RATE)
+        async def limited_call():
+            self.call_count += 1
+
+        async def run():
+            await limited_call()
+            await limited_call()
+
+        self.assertRaises(RateLimitExceededException, asyncio.run, run())
+        self.assertEqual(1, self.call_count)
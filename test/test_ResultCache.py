@@ -0,0 +1,59 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import time
+import unittest
+
+from src.resiliens.circuit_breaker import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_resultIsCached_sameArgumentsHit(self):
+        cache = ResultCache()
+        cache.put((1, 2), {"foo": "bar"}, "result")
+
+        self.assertEqual((True, "result"), cache.get((1, 2), {"foo": "bar"}))
+        self.assertEqual((False, None), cache.get((1, 3), {"foo": "bar"}))
+
+    def test_keywordArgumentsLookLikePositionalOnes_keysDoNotCollide(self):
+        cache = ResultCache()
+        cache.put(((1, ), (("a", 2), )), {}, "positional")
+
+        self.assertEqual((False, None), cache.get((1, ), {"a": 2}))
+        cache.put((1, ), {"a": 2}, "keyword")
+        self.assertEqual((True, "positional"), cache.get(((1, ), (("a", 2), )), {}))
+        self.assertEqual((True, "keyword"), cache.get((1, ), {"a": 2}))
+
+    def test_maxEntriesReached_leastRecentlyUsedIsEvicted(self):
+        cache = ResultCache(max_entries=2)
+        cache.put((1,), {}, 1)
+        cache.put((2,), {}, 2)
+        cache.get((1,), {})
+        cache.put((3,), {}, 3)
+
+        self.assertEqual(2, len(cache))
+        self.assertTrue(cache.get((1,), {})[0])
+        self.assertFalse(cache.get((2,), {})[0])
+
+    def test_ttlExpired_resultIsNotServed(self):
+        cache = ResultCache(ttl=10)
+        cache.put((1,), {}, 1)
+        time.sleep(0.02)
+
+        self.assertFalse(cache.get((1,), {})[0])
+        self.assertEqual(0, len(cache))
+
+    def test_maxMemoryReached_entriesAreEvicted(self):
+        value = "x" * 1000
+        cache = ResultCache(max_memory=2500)
+        for i in range(0, 5):
+            cache.put((i,), {}, value)
+
+        self.assertEqual(2, len(cache))
+        self.assertTrue(cache.get((4,), {})[0])
+
+    def test_unhashableArguments_areNotCached(self):
+        cache = ResultCache()
+        cache.put(([1, 2],), {}, "result")
+
+        self.assertEqual(0, len(cache))
+        self.assertFalse(cache.get(([1, 2],), {})[0])
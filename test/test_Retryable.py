@@ -1,7 +1,10 @@
 #  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
-from src.resiliens.retryable import Retryable
+from src.resiliens.retryable import Retryable, RetryBudget, ConstantBackoff
 
 
 class TestRetryable(unittest.TestCase):
@@ -62,3 +65,262 @@ class TestRetryable(unittest.TestCase):
         expected = 3
         actual = self.failed_count
         self.assertEqual(expected, actual)
+
+    def test_coroutineFails_retryIsDoneRightNumberOfTimes(self):
+
+        @Retryable(max_retries=self.MAX_ATTEMPTS, backoff=1)
+        async def failed_http_call():
+            self.failed_count += 1
+            raise ConnectionError()
+
+        with self.assertRaises(ConnectionError):
+            asyncio.run(failed_http_call())
+        self.assertEqual(self.MAX_ATTEMPTS, self.failed_count)
+
+    def test_coroutineSucceedsAfterRetry_resultIsReturned(self):
+
+        @Retryable(max_retries=self.MAX_ATTEMPTS, backoff=1)
+        async def flaky_http_call():
+            self.failed_count += 1
+            if self.failed_count < 3:
+                raise ConnectionError()
+            return "ok"
+
+        self.assertEqual("ok", asyncio.run(flaky_http_call()))
+        self.assertEqual(3, self.failed_count)
+
+    def test_concurrentCoroutinesBackOff_eventLoopIsNotBlocked(self):
+
+        @Retryable(max_retries=2, backoff=self.BACKOFF)
+        async def failed_http_call():
+            raise ConnectionError()
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            ticking = asyncio.ensure_future(ticker())
+            results = await asyncio.gather(
+                *[failed_http_call() for _ in range(0, 100)],
+                return_exceptions=True)
+            ticking.cancel()
+            return ticks, results
+
+        start = time.monotonic()
+        ticks, results = asyncio.run(run())
+        elapsed = time.monotonic() - start
+
+        self.assertTrue(all(isinstance(r, ConnectionError) for r in results))
+        self.assertLess(elapsed, 10 * self.BACKOFF / 1000)
+        self.assertGreater(ticks, 2)
+
+    def test_coroutineCancelledDuringBackoff_retriesStop(self):
+
+        @Retryable(max_retries=self.MAX_ATTEMPTS, backoff=10_000)
+        async def failed_http_call():
+            self.failed_count += 1
+            raise ConnectionError()
+
+        async def run():
+            task = asyncio.ensure_future(failed_http_call())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertEqual(1, self.failed_count)
+
+    def test_asyncGeneratorFails_isRetriedAndFallbackIsIterated(self):
+
+        async def fallback():
+            yield "fallback"
+
+        @Retryable(max_retries=2, backoff=1, fallback=fallback)
+        async def failed_stream():
+            self.failed_count += 1
+            yield self.failed_count
+            raise ConnectionError()
+
+        async def run():
+            return [el async for el in failed_stream()]
+
+        self.assertEqual([1, 2, "fallback"], asyncio.run(run()))
+
+    def test_sharedBudgetExhausted_callsAreNotRetried(self):
+        budget = RetryBudget(ratio=0.5, max_tokens=2)
+
+        @Retryable(max_retries=self.MAX_ATTEMPTS, backoff=1, budget=budget)
+        def failed_http_call():
+            self.failed_count += 1
+            raise ConnectionError()
+
+        @Retryable(max_retries=self.MAX_ATTEMPTS, backoff=1, budget=budget)
+        def other_failed_http_call():
+            self.failed_count += 1
+            raise ConnectionError()
+
+        self.assertRaises(ConnectionError, failed_http_call)
+        self.assertEqual(3, self.failed_count)
+        self.assertRaises(ConnectionError, other_failed_http_call)
+        self.assertEqual(4, self.failed_count)
+
+    def test_successfulCallsRefillBudget_retriesResume(self):
+        budget = RetryBudget(ratio=0.5, max_tokens=10, initial_tokens=0)
+
+        @Retryable(max_retries=2, backoff=1, budget=budget)
+        async def http_call(fail):
+            if fail:
+                self.failed_count += 1
+                raise ConnectionError()
+            self.successful_count += 1
+
+        async def run():
+            with self.assertRaises(ConnectionError):
+                await http_call(True)
+            await http_call(False)
+            await http_call(False)
+            with self.assertRaises(ConnectionError):
+                await http_call(True)
+
+        asyncio.run(run())
+        self.assertEqual(3, self.failed_count)
+        self.assertEqual(0, budget.tokens)
+
+    def test_callFailsTwice_secondCallIsRetriedAsWell(self):
+
+        @Retryable(max_retries=self.MAX_ATTEMPTS, backoff=1)
+        def failed_http_call():
+            self.failed_count += 1
+            raise ConnectionError()
+
+        self.assertRaises(ConnectionError, failed_http_call)
+        self.assertRaises(ConnectionError, failed_http_call)
+        self.assertEqual(self.MAX_ATTEMPTS * 2, self.failed_count)
+
+    def test_callSucceedsAfterRetry_resultIsReturned(self):
+
+        @Retryable(max_retries=self.MAX_ATTEMPTS, backoff=1)
+        def flaky_http_call():
+            self.failed_count += 1
+            if self.failed_count < 3:
+                raise ConnectionError()
+            return "ok"
+
+        self.assertEqual("ok", flaky_http_call())
+
+    def test_concurrentThreadsFail_eachCallGetsAllRetries(self):
+        attempts = []
+
+        @Retryable(max_retries=self.MAX_ATTEMPTS,
+                   backoff_strategy=ConstantBackoff(5))
+        def failed_http_call(thread):
+            attempts.append(thread)
+            raise ConnectionError()
+
+        def run(thread):
+            try:
+                failed_http_call(thread)
+            except ConnectionError:
+                pass
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(run, range(0, 16)))
+
+        for thread in range(0, 16):
+            self.assertEqual(self.MAX_ATTEMPTS, attempts.count(thread))
+
+    def test_generatorFailsWhileIterated_isRetried(self):
+
+        @Retryable(max_retries=2, backoff=1)
+        def stream():
+            self.failed_count += 1
+            yield self.failed_count
+            if self.failed_count < 2:
+                raise ConnectionError()
+
+        self.assertEqual([1, 2], list(stream()))
+
+    def test_resumeTrue_itemsAlreadyYieldedAreSkipped(self):
+
+        @Retryable(max_retries=2, backoff=1, resume=True)
+        def stream():
+            self.failed_count += 1
+            for i in range(0, 5):
+                if i == 3 and self.failed_count < 2:
+                    raise ConnectionError()
+                yield i
+
+        self.assertEqual([0, 1, 2, 3, 4], list(stream()))
+        self.assertEqual(2, self.failed_count)
+
+    def test_resumeArgument_retryResumesAtOffset(self):
+        offsets = []
+
+        @Retryable(max_retries=2, backoff=1, resume="offset")
+        def stream(offset=0):
+            offsets.append(offset)
+            for i in range(offset, 10):
+                if i == 7 and len(offsets) < 2:
+                    raise ConnectionError()
+                yield i
+
+        self.assertEqual(list(range(2, 10)), list(stream(offset=2)))
+        self.assertEqual([2, 7], offsets)
+
+    def test_checkpoint_retryResumesFromCursor(self):
+        pages = {None: ([1, 2], "b"), "b": ([3, 4], "c"), "c": ([5], None)}
+        cursors = []
+
+        @Retryable(max_retries=2, backoff=1, resume="cursor", checkpoint=lambda page: page[1])
+        def paginate(cursor=None):
+            cursors.append(cursor)
+            while True:
+                if cursor == "c" and len(cursors) < 2:
+                    raise ConnectionError()
+                page = pages[cursor]
+                yield page
+                cursor = page[1]
+                if cursor is None:
+                    return
+
+        self.assertEqual([[1, 2], [3, 4], [5]], [items for items, _ in paginate()])
+        self.assertEqual([None, "c"], cursors)
+
+    def test_resumedStreamMakesProgress_attemptsStartOver(self):
+
+        @Retryable(max_retries=2, backoff=1, resume="offset")
+        def stream(offset=0):
+            self.failed_count += 1
+            yield offset
+            if offset < 5:
+                raise ConnectionError()
+
+        self.assertEqual([0, 1, 2, 3, 4, 5], list(stream()))
+        self.assertEqual(6, self.failed_count)
+
+    def test_asyncGeneratorResumed_itemsNotRepeated(self):
+
+        @Retryable(max_retries=2, backoff=1, resume="offset")
+        async def stream(offset=0):
+            self.failed_count += 1
+            for i in range(offset, 4):
+                if i == 2 and self.failed_count < 2:
+                    raise ConnectionError()
+                yield i
+
+        async def run():
+            return [el async for el in stream()]
+
+        self.assertEqual([0, 1, 2, 3], asyncio.run(run()))
+
+    def test_resumeOnRegularFunction_raisesTypeError(self):
+        with self.assertRaises(TypeError):
+            Retryable(resume=True)(lambda: None)
+        with self.assertRaises(TypeError):
+            Retryable(resume=True, checkpoint=lambda el: el)
@@ -0,0 +1,102 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from src.resiliens.circuit_breaker import CircuitBreaker
+from src.resiliens.circuit_breaker import CircuitBreakerException
+from src.resiliens.circuit_breaker import CircuitBreakerStatus
+
+
+def fail_through_shared_circuit_breaker(path: str, times: int) -> None:
+    circuit_breaker = CircuitBreaker(failures=3, name="shared_child", shared_memory_path=path)
+
+    @circuit_breaker
+    def failing():
+        raise ValueError()
+
+    for _ in range(0, times):
+        try:
+            failing()
+        except (ValueError, CircuitBreakerException):
+            pass
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "Shared state requires a POSIX system")
+class TestSharedCircuitBreakerState(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "circuit_breaker")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_otherProcessFails_circuitBreakerOpensHere(self):
+        circuit_breaker = CircuitBreaker(failures=3, name="shared_parent", shared_memory_path=self.path)
+        process = multiprocessing.get_context("spawn").Process(
+            target=fail_through_shared_circuit_breaker, args=(self.path, 3))
+        process.start()
+        process.join()
+
+        self.assertEqual(0, process.exitcode)
+        self.assertEqual(CircuitBreakerStatus.open, circuit_breaker.status)
+        self.assertEqual(3, circuit_breaker.failure_count)
+
+    def test_forkedChildrenFail_failuresAddUp(self):
+        circuit_breaker = CircuitBreaker(failures=4, name="shared_forked", shared_memory_path=self.path)
+
+        @circuit_breaker
+        def failing():
+            raise ValueError()
+
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=self._call_ignoring_failures, args=(failing, )) for _ in range(0, 4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        self.assertEqual(CircuitBreakerStatus.open, circuit_breaker.status)
+
+    @staticmethod
+    def _call_ignoring_failures(function) -> None:
+        try:
+            function()
+        except ValueError:
+            pass
+
+    def test_slidingWindow_isShared(self):
+        first = CircuitBreaker(failures=2, sliding_window_size=4, name="shared_window_1", shared_memory_path=self.path)
+        second = CircuitBreaker(failures=2, sliding_window_size=4, name="shared_window_2", shared_memory_path=self.path)
+
+        first.__exit__(ValueError, ValueError(), None)
+        self.assertTrue(second.closed)
+        second.__exit__(ValueError, ValueError(), None)
+
+        self.assertTrue(first.opened)
+        first.force_reset()
+        self.assertTrue(second.closed)
+
+    def test_halfOpen_trialCallsArePermittedOnce(self):
+        first = CircuitBreaker(reset_timeout=0, name="shared_half_open_1", shared_memory_path=self.path)
+        second = CircuitBreaker(reset_timeout=0, name="shared_half_open_2", shared_memory_path=self.path)
+        first.force_open()
+
+        self.assertTrue(first._acquire_permission())
+        self.assertFalse(second._acquire_permission())
+
+    def test_differentWindowLength_raisesValueError(self):
+        CircuitBreaker(sliding_window_size=4, name="shared_length_1", shared_memory_path=self.path)
+
+        with self.assertRaises(ValueError):
+            CircuitBreaker(sliding_window_size=8, name="shared_length_2", shared_memory_path=self.path)
+
+    def test_timeSlidingWindow_raisesTypeError(self):
+        with self.assertRaises(TypeError):
+            CircuitBreaker(sliding_window_seconds=10, shared_memory_path=self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+import time
+import traceback
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+from src.resiliens.circuit_breaker import CircuitBreaker
+from src.resiliens.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    CALLERS: int = 50
+
+    call_count: int
+
+    def setUp(self) -> None:
+        self.call_count = 0
+
+    def test_concurrentCallsWithSameArguments_functionRunsOnce(self):
+
+        @SingleFlight
+        def slow_call(key):
+            self.call_count += 1
+            time.sleep(0.2)
+            return "value " + key
+
+        with ThreadPoolExecutor(max_workers=self.CALLERS) as executor:
+            results = list(executor.map(slow_call, ["a"] * self.CALLERS))
+
+        self.assertEqual(["value a"] * self.CALLERS, results)
+        self.assertEqual(1, self.call_count)
+
+    def test_concurrentCallsWithDifferentArguments_functionRunsPerKey(self):
+
+        @SingleFlight
+        def slow_call(key):
+            self.call_count += 1
+            time.sleep(0.2)
+            return key
+
+        with ThreadPoolExecutor(max_workers=self.CALLERS) as executor:
+            results = list(executor.map(slow_call, ["a", "b"] * (self.CALLERS // 2)))
+
+        self.assertEqual(["a", "b"] * (self.CALLERS // 2), results)
+        self.assertEqual(2, self.call_count)
+
+    def test_keyFunction_callsAreCoalescedByKey(self):
+
+        @SingleFlight(key=lambda url, attempt: url)
+        def slow_call(url, attempt):
+            self.call_count += 1
+            time.sleep(0.2)
+            return url
+
+        with ThreadPoolExecutor(max_workers=self.CALLERS) as executor:
+            results = list(executor.map(slow_call, ["a"] * self.CALLERS, range(0, self.CALLERS)))
+
+        self.assertEqual(["a"] * self.CALLERS, results)
+        self.assertEqual(1, self.call_count)
+
+    def test_keywordArgumentsLookLikePositionalOnes_callsAreNotCoalesced(self):
+        started = Event()
+
+        @SingleFlight
+        def slow_call(*args, **kwargs):
+            self.call_count += 1
+            started.wait(1)
+            return args, kwargs
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            positional = executor.submit(slow_call, (1, ), (("a", 2), ))
+            time.sleep(0.05)
+            keyword = executor.submit(slow_call, 1, a=2)
+            time.sleep(0.05)
+            started.set()
+
+            self.assertEqual((((1, ), (("a", 2), )), {}), positional.result())
+            self.assertEqual(((1, ), {"a": 2}), keyword.result())
+        self.assertEqual(2, self.call_count)
+
+    def test_sharedFailure_circuitBreakerCountsItOnce(self):
+        circuit_breaker = CircuitBreaker(failures=self.CALLERS)
+
+        @SingleFlight
+        @circuit_breaker
+        def failing_call(key):
+            time.sleep(0.2)
+            raise ConnectionError()
+
+        def run(key):
+            try:
+                failing_call(key)
+            except ConnectionError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.CALLERS) as executor:
+            results = list(executor.map(run, ["a"] * self.CALLERS))
+
+        self.assertTrue(all(isinstance(r, ConnectionError) for r in results))
+        self.assertEqual(1, circuit_breaker.failure_count)
+
+    def test_concurrentCallsShareFailure_tracebacksDoNotGrow(self):
+        started = Event()
+
+        @SingleFlight
+        def failing_call(key):
+            started.wait(1)
+            raise ConnectionError(key)
+
+        def run(key):
+            try:
+                failing_call(key)
+            except ConnectionError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.CALLERS) as executor:
+            futures = [executor.submit(run, "a") for _ in range(0, self.CALLERS)]
+            time.sleep(0.1)
+            started.set()
+            exceptions = [future.result() for future in futures]
+
+        self.assertEqual([("a", )] * self.CALLERS, [e.args for e in exceptions])
+        self.assertLessEqual(max(len(traceback.extract_tb(e.__traceback__)) for e in exceptions), 10)
+
+    def test_sequentialCalls_functionRunsEachTime(self):
+
+        @SingleFlight
+        def call(key):
+            self.call_count += 1
+            return key
+
+        call("a")
+        call("a")
+        self.assertEqual(2, self.call_count)
+
+    def test_concurrentCoroutines_functionRunsOnce(self):
+
+        @SingleFlight
+        async def slow_call(key):
+            self.call_count += 1
+            await asyncio.sleep(0.05)
+            return "value " + key
+
+        async def run():
+            return await asyncio.gather(*[slow_call("a") for _ in range(0, self.CALLERS)])
+
+        self.assertEqual(["value a"] * self.CALLERS, asyncio.run(run()))
+        self.assertEqual(1, self.call_count)
+
+    def test_concurrentCoroutinesShareFailure_eachCallerRaisesCopy(self):
+
+        @SingleFlight
+        async def failing_call(key):
+            self.call_count += 1
+            await asyncio.sleep(0.05)
+            raise ConnectionError(key)
+
+        async def run():
+            return await asyncio.gather(*[failing_call("a") for _ in range(0, self.CALLERS)], return_exceptions=True)
+
+        exceptions = asyncio.run(run())
+        self.assertEqual([("a", )] * self.CALLERS, [e.args for e in exceptions])
+        self.assertEqual(self.CALLERS, len(set(map(id, exceptions))))
+        self.assertEqual(1, self.call_count)
+
+    def test_firstCoroutineCallerIsCancelled_otherCallersGetResult(self):
+
+        @SingleFlight
+        async def slow_call(key):
+            self.call_count += 1
+            await asyncio.sleep(0.05)
+            return key
+
+        async def run():
+            first = asyncio.ensure_future(slow_call("a"))
+            second = asyncio.ensure_future(slow_call("a"))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+
+        self.assertEqual("a", asyncio.run(run()))
+        self.assertEqual(1, self.call_count)
@@ -0,0 +1,80 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import random
+import unittest
+
+from src.resiliens.circuit_breaker.SlidingWindow import SlidingWindow
+from src.resiliens.circuit_breaker.TimeSlidingWindow import TimeSlidingWindow
+
+
+class TestSlidingWindow(unittest.TestCase):
+    WINDOW_SIZE: int = 10
+
+    def test_windowNotFull_failuresAreCounted(self):
+        window = SlidingWindow(self.WINDOW_SIZE)
+        for result in (True, False, False, True):
+            window.add(result)
+
+        self.assertEqual(2, window.get_failure_count())
+        self.assertEqual(4, window.size)
+
+    def test_windowWrapsAround_oldestResultsAreDropped(self):
+        window = SlidingWindow(self.WINDOW_SIZE)
+        for _ in range(0, self.WINDOW_SIZE):
+            window.add(False)
+        for _ in range(0, self.WINDOW_SIZE - 3):
+            window.add(True)
+
+        self.assertEqual(3, window.get_failure_count())
+        self.assertEqual(self.WINDOW_SIZE, window.size)
+
+    def test_randomResults_failureCountMatchesLastResults(self):
+        window = SlidingWindow(self.WINDOW_SIZE)
+        results = [random.random() < 0.5 for _ in range(0, 1000)]
+        for i, result in enumerate(results):
+            window.add(result)
+            expected = sum(not r for r in results[max(0, i + 1 - self.WINDOW_SIZE):i + 1])
+            self.assertEqual(expected, window.get_failure_count())
+
+    def test_invalidWindowLength_raisesValueError(self):
+        self.assertRaises(ValueError, SlidingWindow, 0)
+
+
+class TestTimeSlidingWindow(unittest.TestCase):
+    WINDOW_SECONDS: int = 10
+
+    now: float
+
+    def setUp(self) -> None:
+        self.now = 1000.0
+
+    def clock(self) -> float:
+        return self.now
+
+    def test_resultsWithinWindow_callsAndFailuresAreCounted(self):
+        window = TimeSlidingWindow(self.WINDOW_SECONDS, clock=self.clock)
+        for result in (True, False, False):
+            window.add(result)
+            self.now += 1
+
+        self.assertEqual(3, window.get_call_count())
+        self.assertEqual(2, window.get_failure_count())
+
+    def test_timePasses_expiredSecondsAreDropped(self):
+        window = TimeSlidingWindow(self.WINDOW_SECONDS, clock=self.clock)
+        window.add(False)
+        self.now += 5
+        window.add(False)
+        window.add(True)
+        self.now += self.WINDOW_SECONDS - 1
+
+        self.assertEqual(2, window.get_call_count())
+        self.assertEqual(1, window.get_failure_count())
+
+    def test_idleLongerThanWindow_windowIsEmpty(self):
+        window = TimeSlidingWindow(self.WINDOW_SECONDS, clock=self.clock)
+        for _ in range(0, 1000):
+            window.add(False)
+        self.now += self.WINDOW_SECONDS * 100
+
+        self.assertEqual(0, window.get_call_count())
+        self.assertEqual(0, window.get_failure_count())
@@ -0,0 +1,241 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import gc
+import multiprocessing
+import os
+import socket
+import sys
+import time
+import unittest
+
+from src.resiliens.circuit_breaker import CircuitBreaker
+from src.resiliens.circuit_breaker import InMemoryStateStore
+from src.resiliens.circuit_breaker import TcpStateStore
+from src.resiliens.circuit_breaker import TcpStateStoreServer
+from src.resiliens.circuit_breaker.store import StateUpdate
+
+
+class TestStateStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        # Synced by hand in the tests
+        self.store = InMemoryStateStore(sync_interval=60_000)
+
+    def tearDown(self) -> None:
+        self.store.close()
+
+    def _circuit_breaker(self, name: str, **kwargs):
+        circuit_breaker = CircuitBreaker(name=name, state_store=self.store, **kwargs)
+
+        @circuit_breaker
+        def call(fail: bool):
+            if fail:
+                raise ValueError()
+            return True
+
+        return circuit_breaker, call
+
+    def test_inMemoryStore_sumsLatestUpdateOfEveryNode(self):
+        self.store.sync("cb", StateUpdate(node="a", successes=1, failures=2, opened_at=None))
+        self.store.sync("cb", StateUpdate(node="b", successes=3, failures=4, opened_at=10.0))
+        remote = self.store.sync("cb", StateUpdate(node="a", successes=5, failures=0, opened_at=5.0))
+
+        self.assertEqual(8, remote.successes)
+        self.assertEqual(4, remote.failures)
+        self.assertEqual(10.0, remote.opened_at)
+
+    def test_inMemoryStore_nodeStopsSyncing_itsOutcomesExpire(self):
+        store = InMemoryStateStore(node_ttl=10)
+        store.sync("cb", StateUpdate(node="a", successes=0, failures=2, opened_at=None))
+        time.sleep(0.02)
+
+        self.assertEqual(0, store.sync("cb", StateUpdate(node="b", successes=1, failures=0, opened_at=None)).failures)
+
+    def test_otherNodeOpened_circuitBreakerOpensOnSync(self):
+        circuit_breaker, _ = self._circuit_breaker("store_remote_open")
+        self.store.sync("store_remote_open", StateUpdate(node="other", successes=0, failures=0, opened_at=time.time()))
+
+        self.assertTrue(circuit_breaker.closed)
+        self.store.sync_all()
+        self.assertTrue(circuit_breaker.opened)
+
+    def test_otherNodeOpenedLongAgo_circuitBreakerStaysClosed(self):
+        circuit_breaker, _ = self._circuit_breaker("store_remote_expired", reset_timeout=1000)
+        self.store.sync("store_remote_expired",
+                        StateUpdate(node="other", successes=0, failures=0, opened_at=time.time() - 5))
+        self.store.sync_all()
+
+        self.assertTrue(circuit_breaker.closed)
+
+    def test_openedLocally_openingIsSentToStore(self):
+        circuit_breaker, call = self._circuit_breaker("store_local_open", failures=2)
+        for _ in range(0, 2):
+            with self.assertRaises(ValueError):
+                call(True)
+        self.store.sync_all()
+
+        remote = self.store.sync("store_local_open", StateUpdate(node="other", successes=0, failures=0, opened_at=None))
+        self.assertIsNotNone(remote.opened_at)
+        self.assertEqual(2, remote.failures)
+        # Getting its own opening back doesn't open it anew
+        circuit_breaker.force_reset()
+        self.store.sync_all()
+        self.assertTrue(circuit_breaker.closed)
+
+    def test_circuitBreakerNoLongerUsed_isNoLongerSynced(self):
+        self._circuit_breaker("store_dropped")
+        gc.collect()
+
+        self.store.sync_all()
+        self.assertEqual(0, len(self.store._circuit_breakers))
+        self.assertNotIn("store_dropped", self.store._entries)
+
+    def test_storeFails_failureIsLogged(self):
+
+        class FailingStateStore(InMemoryStateStore):
+
+            def sync(self, name: str, update: StateUpdate):
+                raise ValueError("Not a valid update")
+
+        store = FailingStateStore(sync_interval=60_000)
+        circuit_breaker = CircuitBreaker(name="store_failing", state_store=store)
+        call = circuit_breaker(lambda: True)
+
+        with self.assertLogs("src.resiliens.circuit_breaker.store.StateStore", level="WARNING") as logs:
+            store.sync_all()
+        self.assertIn("store_failing", logs.output[0])
+        self.assertTrue(call())
+        store.close()
+
+    def test_storeUnreachableForOneSync_updateIsSentWithNextSync(self):
+
+        class FlakyStateStore(InMemoryStateStore):
+            reachable = False
+
+            def sync(self, name: str, update: StateUpdate):
+                if not self.reachable:
+                    raise ConnectionError()
+                return super().sync(name, update)
+
+        store = FlakyStateStore(sync_interval=60_000)
+        circuit_breaker = CircuitBreaker(name="store_flaky", failures=2, state_store=store)
+
+        @circuit_breaker
+        def call(fail: bool):
+            if fail:
+                raise ValueError()
+            return True
+
+        call(False)
+        for _ in range(0, 2):
+            with self.assertRaises(ValueError):
+                call(True)
+        store.sync_all()
+        store.reachable = True
+        store.sync_all()
+
+        remote = store.sync("store_flaky", StateUpdate(node="other", successes=0, failures=0, opened_at=None))
+        self.assertEqual(1, remote.successes)
+        self.assertEqual(2, remote.failures)
+        self.assertIsNotNone(remote.opened_at)
+        store.close()
+
+    def test_fleetFailuresReachThreshold_circuitBreakerOpens(self):
+        circuit_breaker, call = self._circuit_breaker("store_fleet_failures", failures=3)
+        with self.assertRaises(ValueError):
+            call(True)
+        self.store.sync("store_fleet_failures", StateUpdate(node="other", successes=0, failures=2, opened_at=None))
+
+        self.assertTrue(circuit_breaker.closed)
+        self.store.sync_all()
+        self.assertTrue(circuit_breaker.opened)
+
+    def test_fleetFailuresBelowThresholdOfWindow_circuitBreakerStaysClosed(self):
+        circuit_breaker, call = self._circuit_breaker("store_fleet_window", failures=5, sliding_window_size=10)
+        with self.assertRaises(ValueError):
+            call(True)
+        self.store.sync_all()
+        self.assertTrue(circuit_breaker.closed)
+
+        self.store.sync("store_fleet_window", StateUpdate(node="other", successes=2, failures=5, opened_at=None))
+        self.store.sync_all()
+        self.assertTrue(circuit_breaker.opened)
+
+    def test_fleetFailureRateBelowThreshold_circuitBreakerStaysClosed(self):
+        circuit_breaker, _ = self._circuit_breaker("store_fleet_rate",
+                                                   sliding_window_size=10,
+                                                   failure_rate_threshold=50,
+                                                   minimum_calls=10)
+        self.store.sync("store_fleet_rate", StateUpdate(node="other", successes=60, failures=40, opened_at=None))
+        self.store.sync_all()
+        self.assertTrue(circuit_breaker.closed)
+
+        self.store.sync("store_fleet_rate", StateUpdate(node="other", successes=40, failures=60, opened_at=None))
+        self.store.sync_all()
+        self.assertTrue(circuit_breaker.opened)
+
+
+class TestTcpStateStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.server = TcpStateStoreServer(port=0).start()
+        self.store = TcpStateStore(port=self.server.port, sync_interval=60_000)
+
+    def tearDown(self) -> None:
+        self.store.close()
+        self.server.close()
+
+    def test_syncThroughServer_updatesOfNodesAddUp(self):
+        self.store.sync("cb", StateUpdate(node="a", successes=1, failures=1, opened_at=None))
+        remote = self.store.sync("cb", StateUpdate(node="b", successes=2, failures=0, opened_at=1.5))
+
+        self.assertEqual(3, remote.successes)
+        self.assertEqual(1, remote.failures)
+        self.assertEqual(1.5, remote.opened_at)
+
+    def test_otherNodeOpened_circuitBreakerOpensOnSync(self):
+        circuit_breaker = CircuitBreaker(name="tcp_remote_open", state_store=self.store)
+        circuit_breaker(lambda: None)
+        self.server.store.sync("tcp_remote_open",
+                               StateUpdate(node="other", successes=0, failures=0, opened_at=time.time()))
+        self.store.sync_all()
+
+        self.assertTrue(circuit_breaker.opened)
+
+    def test_serverUnreachable_circuitBreakerKeepsWorkingLocally(self):
+        with socket.socket() as unused:
+            unused.bind(("127.0.0.1", 0))
+            port = unused.getsockname()[1]
+        store = TcpStateStore(port=port, sync_interval=60_000, timeout=100)
+        circuit_breaker = CircuitBreaker(name="tcp_unreachable", state_store=store)
+        call = circuit_breaker(lambda: True)
+
+        store.sync_all()
+        self.assertTrue(call())
+        self.assertTrue(circuit_breaker.closed)
+        store.close()
+
+    @unittest.skipUnless(hasattr(os, "fork"), "Forking requires a POSIX system")
+    def test_forkedChild_syncsOverConnectionOfItsOwn(self):
+        self.store.sync("tcp_fork", StateUpdate(node="parent", successes=1, failures=0, opened_at=None))
+        connection = self.store._connection
+
+        process = multiprocessing.get_context("fork").Process(target=self._sync_in_child, args=(self.store, ))
+        process.start()
+        process.join()
+
+        self.assertEqual(0, process.exitcode)
+        self.assertIs(connection, self.store._connection)
+        remote = self.store.sync("tcp_fork", StateUpdate(node="parent", successes=1, failures=0, opened_at=None))
+        self.assertEqual(1, remote.failures)
+
+    @staticmethod
+    def _sync_in_child(store: TcpStateStore) -> None:
+        if store._connection is not None or store._connection_lock.locked():
+            sys.exit(1)
+        remote = store.sync("tcp_fork", StateUpdate(node="child", successes=0, failures=1, opened_at=None))
+        if remote.failures != 1:
+            sys.exit(2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#  Copyright (c) 2022 - Thumos - Jon Cavallie Mester
+import asyncio
+import time
+import unittest
+from threading import Event
+
+from src.resiliens.circuit_breaker import CircuitBreaker
+from src.resiliens.retryable import Retryable
+from src.resiliens.timelimiter import TimeLimiter, TimeLimitExceededException
+
+
+class TestTimeLimiter(unittest.TestCase):
+    TIMEOUT: int = 50
+
+    call_count: int
+
+    def setUp(self) -> None:
+        self.call_count = 0
+
+    def test_callCompletesInTime_resultIsReturned(self):
+
+        @TimeLimiter(timeout=self.TIMEOUT)
+        def fast_call(foo):
+            return foo
+
+        self.assertEqual("bar", fast_call("bar"))
+
+    def test_callExceedsTimeout_exceptionIsRaised(self):
+
+        @TimeLimiter(timeout=self.TIMEOUT)
+        def hung_call():
+            time.sleep(0.5)
+
+        start = time.monotonic()
+        self.assertRaises(TimeLimitExceededException, hung_call)
+        self.assertLess(time.monotonic() - start, 0.4)
+
+    def test_callRaises_exceptionIsPropagated(self):
+
+        @TimeLimiter(timeout=self.TIMEOUT)
+        def failing_call():
+            raise ConnectionError()
+
+        self.assertRaises(ConnectionError, failing_call)
+
+    def test_coroutineExceedsTimeout_isCancelledAndExceptionIsRaised(self):
+        cancelled = []
+
+        @TimeLimiter(timeout=self.TIMEOUT)
+        async def hung_call():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        self.assertRaises(TimeLimitExceededException, asyncio.run, hung_call())
+        self.assertEqual([True], cancelled)
+
+    def test_timeoutExceeded_circuitBreakerCountsItAsFailure(self):
+        circuit_breaker = CircuitBreaker(failures=2,
+                                         expected_exception=TimeoutError)
+
+        @circuit_breaker
+        @TimeLimiter(timeout=self.TIMEOUT)
+        async def hung_call():
+            await asyncio.sleep(10)
+
+        async def run():
+            for _ in range(0, 2):
+                with self.assertRaises(TimeLimitExceededException):
+                    await hung_call()
+
+        asyncio.run(run())
+        self.assertTrue(circuit_breaker.opened)
+
+    def test_timeoutExceeded_retryableRetriesIt(self):
+
+        @Retryable(max_retries=3, backoff=1, expected_exception=TimeoutError)
+        @TimeLimiter(timeout=self.TIMEOUT)
+        def hung_call():
+            self.call_count += 1
+            time.sleep(0.1)
+
+        self.assertRaises(TimeLimitExceededException, hung_call)
+        self.assertEqual(3, self.call_count)
+
+    def test_threadsOfOneTimeLimiterHang_otherTimeLimiterStillGetsThreads(self):
+        released = Event()
+
+        @TimeLimiter(timeout=self.TIMEOUT, max_workers=2)
+        def hung_call():
+            released.wait(5)
+
+        @TimeLimiter(timeout=self.TIMEOUT)
+        def fast_call():
+            return True
+
+        try:
+            for _ in range(0, 3):
+                self.assertRaises(TimeLimitExceededException, hung_call)
+            self.assertTrue(fast_call())
+        finally:
+            released.set()
+
+    def test_generatorFunction_raisesTypeError(self):
+
+        def generator():
+            yield 1
+
+        self.assertRaises(TypeError, TimeLimiter(timeout=self.TIMEOUT), generator)